@@ -0,0 +1,137 @@
+# benchmarks/bench_callback_dispatch.py
+"""
+Стоимость маршрутизации callback_query через настоящий Dispatcher при большом числе видов кнопок.
+
+Сравниваются:
+- цепочка фильтров-лямбд, как было в хендлерах: startswith + split на каждый хендлер;
+- CallbackRouter (utils/callback_data.py): разбор префиксным деревом и поиск хендлера по типу —
+  для кнопок нового формата и для кнопок старого формата (legacy).
+Хендлеры ничего не отправляют, поэтому замеряется только путь обновления до хендлера.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_callback_dispatch --types 120 --updates 20000
+"""
+import argparse
+import asyncio
+import random
+import string
+import time
+from dataclasses import dataclass
+from typing import List
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import CallbackQuery, Update
+
+from benchmarks.fake_telegram import FAKE_TOKEN
+from utils.callback_data import CallbackPayload, CallbackRegistry, CallbackRouter
+
+
+def type_name(i: int) -> str:
+    """Буквенное имя вида кнопки: префиксы схем допускают только латинские буквы."""
+    letters = ""
+    i += 26
+    while i:
+        i, rest = divmod(i, 26)
+        letters = string.ascii_lowercase[rest] + letters
+    return letters
+
+
+def make_callback_update(update_id: int, data: str) -> dict:
+    user = {"id": 1000, "is_bot": False, "first_name": "User"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": "bench",
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": 1000, "type": "private"},
+                "from": user,
+                "text": "menu",
+            },
+        },
+    }
+
+
+def build_lambda_router(types: int) -> Router:
+    router = Router()
+
+    async def handler(callback: CallbackQuery):
+        return None
+
+    for i in range(types):
+        prefix = f"kind_{type_name(i)}_"
+        # Тот же вид фильтров, что был в coffee_handlers.py
+        router.callback_query.register(
+            handler, lambda c, prefix=prefix: c.data.startswith(prefix) and c.data.split("_")[2].isdigit()
+        )
+    return router
+
+
+def build_schema_router(types: int) -> tuple[Router, List[type]]:
+    router = Router()
+    registry = CallbackRegistry()
+    callbacks = CallbackRouter(router, registry=registry)
+    schemas = []
+
+    async def handler(callback: CallbackQuery, callback_data: CallbackPayload):
+        return None
+
+    for i in range(types):
+        name = type_name(i)
+        schema = dataclass(frozen=True)(type(
+            f"Kind{name.capitalize()}", (CallbackPayload,),
+            {"__annotations__": {"item": int, "variant": str}},
+            prefix=name, legacy=f"kind_{name}_", registry=registry,
+        ))
+        callbacks(schema)(handler)
+        schemas.append(schema)
+    return router, schemas
+
+
+async def measure(router: Router, payloads: List[str]) -> float:
+    """Среднее время feed_update на одно обновление, мкс."""
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot(token=FAKE_TOKEN)
+    updates = [Update.model_validate(make_callback_update(i, data), context={"bot": bot}) for i, data in enumerate(payloads)]
+    for update in updates[:500]:  # прогрев
+        await dp.feed_update(bot, update)
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return elapsed / len(updates) * 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Стоимость маршрутизации callback_query")
+    parser.add_argument("--types", type=int, default=120, help="сколько видов кнопок зарегистрировано")
+    parser.add_argument("--updates", type=int, default=20000, help="сколько обновлений прогнать")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    picks = [(rng.randrange(args.types), rng.randrange(100)) for _ in range(args.updates)]
+    legacy = [f"kind_{type_name(kind)}_{item}_250" for kind, item in picks]
+
+    schema_router, schemas = build_schema_router(args.types)
+    packed = [schemas[kind](item, "250").pack() for kind, item in picks]
+
+    lambda_us = await measure(build_lambda_router(args.types), legacy)
+    # Router можно подключить к диспетчеру только один раз
+    legacy_router, _ = build_schema_router(args.types)
+    schema_us = await measure(schema_router, packed)
+    schema_legacy_us = await measure(legacy_router, legacy)
+
+    print(f"видов кнопок: {args.types}, обновлений: {args.updates}")
+    print(f"{'лямбда-фильтры':<32} {lambda_us:8.1f} мкс/обновление")
+    print(f"{'CallbackRouter, новый формат':<32} {schema_us:8.1f} мкс/обновление")
+    print(f"{'CallbackRouter, старый формат':<32} {schema_legacy_us:8.1f} мкс/обновление")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+# benchmarks/bench_checkout_latency.py
+"""
+Задержка оформления заказа с самовывозом: от сообщения с комментарием до момента,
+когда хендлер вернул управление, и до прихода уведомления «Заказ оформлен» покупателю.
+
+Обновления прогоняются через настоящий Dispatcher и order_router, запросы бота уходят
+в поддельный Bot API (benchmarks/fake_telegram.py) с искусственной задержкой ответа.
+Каждый заказ оформляет новый пользователь. Два прогона:
+- «get_chat» — без UserProfileMiddleware, профиль покупателя запрашивается у Telegram;
+- «кэш профиля» — профиль берётся из user_info, который наполняет middleware.
+Заказы пишутся во временный каталог, рабочие файлы бота не затрагиваются.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_checkout_latency --orders 300 --rate 50 --latency 0.03
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import Update
+
+import services.order_service as order_service
+from benchmarks.fake_telegram import FakeTelegram, make_message_update
+from handlers.order_handlers import OrderStatesGroup, router as order_router
+from middlewares.user_profile import UserProfileMiddleware
+from services.order_pipeline import OrderPipeline
+from services.outbox_service import OutboxWorker
+from storage.conversations_storage import conversations_cache
+from storage.pending_orders_storage import PendingOrdersRepository
+from utils.stats import percentile
+
+CART = [{"coffee_index": 0, "name": "Brazil Serrado", "weight": "250", "price": "18.00 руб."}]
+
+
+class SwitchableMiddleware(BaseMiddleware):
+    """Позволяет включать middleware между прогонами: роутер подключается к диспетчеру один раз."""
+
+    def __init__(self, middleware: BaseMiddleware):
+        self.middleware = middleware
+        self.enabled = False
+
+    async def __call__(self, handler, event, data):
+        if self.enabled:
+            return await self.middleware(handler, event, data)
+        return await handler(event, data)
+
+
+async def run(dp: Dispatcher, profiles: SwitchableMiddleware, use_cache: bool, orders: int, rate: float,
+              latency: float, first_user: int) -> Dict[str, float]:
+    fake = FakeTelegram(latency=latency)
+    await fake.start()
+    bot = fake.make_bot()
+    profiles.enabled = use_cache
+    conversations_cache.clear()
+
+    notice_sent: Dict[str, float] = {}
+
+    def on_call(method: str, params: dict) -> None:
+        if method == "sendmessage" and str(params.get("text", "")).startswith("✅"):
+            notice_sent[str(params.get("chat_id"))] = time.perf_counter()
+
+    fake.on_call = on_call
+
+    with tempfile.TemporaryDirectory() as directory:
+        repository = PendingOrdersRepository(
+            os.path.join(directory, "pending_orders.json"),
+            os.path.join(directory, "pending_orders.journal"),
+        )
+        pipeline = OrderPipeline(repository, os.path.join(directory, "order_number.json"))
+        worker = OutboxWorker(repository)
+        pipeline.add_commit_listener(worker.wake)
+        order_service.order_pipeline = pipeline
+        await pipeline.start()
+        worker.start(bot)
+
+        handler_latency: List[float] = []
+        started_at: Dict[str, float] = {}
+
+        async def checkout(i: int) -> None:
+            user_id = first_user + i
+            state = dp.fsm.get_context(bot=bot, chat_id=user_id, user_id=user_id)
+            await state.set_state(OrderStatesGroup.waiting_for_comment)
+            await state.update_data(cart=CART, total=18.0, user_id=user_id)
+            conversations_cache.setdefault(str(user_id), {"user_info": {}, "messages": [], "cart": list(CART)})
+            update = Update.model_validate(make_message_update(i + 1, user_id, "нет"), context={"bot": bot})
+            started = started_at[str(user_id)] = time.perf_counter()
+            await dp.feed_update(bot, update)
+            handler_latency.append(time.perf_counter() - started)
+
+        tasks = []
+        started = time.perf_counter()
+        for i in range(orders):
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(checkout(i)))
+        await asyncio.gather(*tasks)
+        deadline = time.perf_counter() + 30
+        while len(notice_sent) < orders and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+
+        await pipeline.stop()
+        await worker.stop()
+
+    notice_latency = [notice_sent[chat] - started_at[chat] for chat in started_at if chat in notice_sent]
+    await bot.session.close()
+    await fake.stop()
+    return {
+        "orders": len(handler_latency),
+        "get_chat": fake.count("getChat"),
+        "handler_p50_ms": percentile(handler_latency, 50) * 1000,
+        "handler_p95_ms": percentile(handler_latency, 95) * 1000,
+        "notice_p50_ms": percentile(notice_latency, 50) * 1000,
+        "notice_p95_ms": percentile(notice_latency, 95) * 1000,
+    }
+
+
+def print_result(title: str, result: Dict[str, float]) -> None:
+    values = ", ".join(f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}" for key, value in result.items())
+    print(f"{title:<14} {values}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Задержка оформления заказа: get_chat против кэша профиля")
+    parser.add_argument("--orders", type=int, default=300, help="сколько заказов оформить в каждом прогоне")
+    parser.add_argument("--rate", type=float, default=50, help="заказов в секунду")
+    parser.add_argument("--latency", type=float, default=0.03, help="задержка ответа поддельного Bot API, с")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    profiles = SwitchableMiddleware(UserProfileMiddleware())
+    dp = Dispatcher()
+    dp.update.outer_middleware(profiles)
+    dp.include_router(order_router)
+
+    print_result("get_chat", await run(dp, profiles, False, args.orders, args.rate, args.latency, 500000))
+    print_result("кэш профиля", await run(dp, profiles, True, args.orders, args.rate, args.latency, 600000))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
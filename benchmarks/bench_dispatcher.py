@@ -0,0 +1,404 @@
+# benchmarks/bench_dispatcher.py
+"""
+Реплей синтетических обновлений через настоящий Dispatcher бота (main.create_dispatcher:
+все middleware и роутеры coffee/order/admin/user). Запросы бота не уходят в сеть:
+RecordingSession (benchmarks/fake_telegram.py) записывает их и сразу отвечает.
+Нейросеть заменена заглушкой с задержкой --llm-latency.
+
+Сценарии (каждый пользователь проходит свой сценарий по шагам, пользователи — параллельно):
+- browse   — каталог, карточки кофе, выбор веса и возврат;
+- cart     — добавление в корзину, просмотр и очистка корзины;
+- checkout — добавление в корзину и оформление самовывоза с комментарием;
+- chat     — /start и три вопроса нейросети;
+- mixed    — все сценарии одновременно.
+Кнопки нажимаются на последнем экране, который бот показал пользователю: если нужной
+кнопки нет, это ошибка сценария. Перед замерами каждый сценарий один раз проходится для прогрева.
+
+Для каждого сценария выводятся обновления в секунду, p50/p95/p99 задержки обработки
+обновления, число запросов к Bot API на обновление (фоновые запросы outbox — отдельно),
+p99 опоздания цикла событий и число его блокировок дольше --block-threshold
+(utils/loop_monitor.py) с местами в коде, где цикл простоял дольше всего.
+--save сохраняет результаты в JSON, --baseline сравнивает с сохранёнными ранее и
+завершается с ошибкой при регрессии: p95 или пропускная способность хуже более чем на
+--tolerance, p99 опоздания цикла или число его блокировок хуже более чем на --tolerance
+(и на LOOP_LAG_SLACK_MS / LOOP_BLOCKS_SLACK), выросло число запросов к API на обновление
+или появились ошибки.
+
+Все файлы данных бота пишутся во временный каталог (BOT_DATA_DIR и рабочий каталог процесса).
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_dispatcher --users 200 --save bench_dispatcher.json
+    python -m benchmarks.bench_dispatcher --users 200 --baseline bench_dispatcher.json
+"""
+import os
+import shutil
+import tempfile
+
+# Подменяем каталог данных до импорта модулей бота: пути к файлам вычисляются при импорте config
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = tempfile.mkdtemp(prefix="bench-dispatcher-")
+os.environ["BOT_DATA_DIR"] = DATA_DIR
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import itertools  # noqa: E402
+import json  # noqa: E402
+import logging  # noqa: E402
+import random  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from dataclasses import dataclass  # noqa: E402
+from typing import Any, Callable, Dict, List, Optional, Tuple  # noqa: E402
+
+from aiogram import Bot, Dispatcher  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+
+import handlers.user_handlers as user_handlers  # noqa: E402
+from benchmarks.fake_telegram import FAKE_TOKEN, RecordingSession, call_origin, make_message_update  # noqa: E402
+from main import create_dispatcher  # noqa: E402
+from middlewares.metrics import telegram_metrics  # noqa: E402
+from middlewares.throttling import ThrottlingMiddleware  # noqa: E402
+from models.callbacks import (  # noqa: E402
+    AddToCart, BackToDetails, Checkout, ClearCart, CoffeeCatalog, CoffeeDetails, PickupCash, SelectWeight, ViewCart,
+)
+from services.order_pipeline import order_pipeline  # noqa: E402
+from services.outbox_service import outbox_worker  # noqa: E402
+from services.send_scheduler import send_scheduler  # noqa: E402
+from storage.fsm_storage import fsm_storage, load_fsm_states  # noqa: E402
+from storage.order_history_storage import load_order_history_index  # noqa: E402
+from storage.pending_orders_storage import load_pending_orders_to_cache  # noqa: E402
+from utils.loop_monitor import LoopMonitor  # noqa: E402
+from utils.stats import percentile  # noqa: E402
+
+# Шаг сценария: ("text", текст сообщения) или ("press", callback_data кнопки на текущем экране)
+Step = Tuple[str, str]
+
+# Запас товара в копии bot_mind.json, чтобы сценарии не упирались в остатки
+STOCK = 10 ** 6
+
+# Шаг пульса контроля цикла событий во время сценария, с
+LOOP_PULSE = 0.01
+# Опоздание цикла и число блокировок в пределах шума регрессией не считаются
+LOOP_LAG_SLACK_MS = 5.0
+LOOP_BLOCKS_SLACK = 3
+# Сколько мест блокировки цикла печатать по сценарию
+TOP_BLOCK_SITES = 5
+
+
+class ScenarioError(Exception):
+    pass
+
+
+def browse(rng: random.Random, coffees: int) -> List[Step]:
+    first, second = rng.randrange(coffees), rng.randrange(coffees)
+    return [
+        ("text", "/coffeeshop"),
+        ("press", CoffeeDetails(first).pack()),
+        ("press", CoffeeCatalog().pack()),
+        ("press", CoffeeDetails(second).pack()),
+        ("press", SelectWeight(second, "250").pack()),
+        ("press", BackToDetails(second).pack()),
+        ("press", CoffeeCatalog().pack()),
+    ]
+
+
+def cart(rng: random.Random, coffees: int) -> List[Step]:
+    index = rng.randrange(coffees)
+    return [
+        ("text", "/coffeeshop"),
+        ("press", CoffeeDetails(index).pack()),
+        ("press", SelectWeight(index, "250").pack()),
+        ("press", AddToCart(index, "250").pack()),
+        ("press", BackToDetails(index).pack()),
+        ("press", ViewCart().pack()),
+        ("press", ClearCart().pack()),
+        ("press", CoffeeCatalog().pack()),
+    ]
+
+
+def checkout(rng: random.Random, coffees: int) -> List[Step]:
+    index = rng.randrange(coffees)
+    return [
+        ("text", "/coffeeshop"),
+        ("press", CoffeeDetails(index).pack()),
+        ("press", SelectWeight(index, "250").pack()),
+        ("press", AddToCart(index, "250").pack()),
+        ("press", ViewCart().pack()),
+        ("press", Checkout().pack()),
+        ("press", PickupCash().pack()),
+        ("text", "Заберу после 18:00"),
+    ]
+
+
+def chat(rng: random.Random, coffees: int) -> List[Step]:
+    questions = ["Кофемашина не греет воду", "Как удалить накипь?", "Какой кофе подходит для эспрессо?",
+                 "Почему кофе получается кислым?", "Капучинатор не взбивает молоко"]
+    return [("text", "/start")] + [("text", question) for question in rng.sample(questions, 3)]
+
+
+SCENARIOS: Dict[str, Callable[[random.Random, int], List[Step]]] = {
+    "browse": browse, "cart": cart, "checkout": checkout, "chat": chat,
+}
+
+
+@dataclass
+class ScenarioResult:
+    updates: int
+    seconds: float
+    latencies: List[float]
+    api_calls: int
+    background_calls: int
+    errors: int
+    loop_lag_p99: float = 0.0
+    loop_blocks: int = 0
+    block_sites: Optional[List[Tuple[str, int]]] = None
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "updates": self.updates,
+            "updates_per_sec": round(self.updates / self.seconds, 1) if self.seconds else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 3),
+            "api_calls_per_update": round(self.api_calls / self.updates, 3) if self.updates else 0.0,
+            "background_calls": self.background_calls,
+            "errors": self.errors,
+            "loop_lag_p99_ms": round(self.loop_lag_p99 * 1000, 3),
+            "loop_blocks": self.loop_blocks,
+        }
+
+
+class Replayer:
+    """Строит обновления от имени пользователей и скармливает их диспетчеру."""
+
+    def __init__(self, dp: Dispatcher, bot: Bot, session: RecordingSession, block_threshold: float = 0.02):
+        self.dp = dp
+        self.bot = bot
+        self.session = session
+        self.block_threshold = block_threshold
+        self._update_ids = itertools.count(1)
+
+    def _callback_update(self, user_id: int, data: str) -> Dict[str, Any]:
+        screen = self.session.last_message.get(user_id)
+        buttons = [
+            button.get("callback_data")
+            for row in ((screen or {}).get("reply_markup") or {}).get("inline_keyboard", [])
+            for button in row
+        ]
+        if data not in buttons:
+            raise ScenarioError(f"пользователь {user_id}: на экране нет кнопки {data} (есть: {buttons})")
+        update_id = next(self._update_ids)
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+        return {
+            "update_id": update_id,
+            "callback_query": {"id": str(update_id), "from": user, "chat_instance": str(user_id),
+                               "message": screen, "data": data},
+        }
+
+    async def step(self, user_id: int, step: Step) -> float:
+        kind, payload = step
+        if kind == "text":
+            raw = make_message_update(next(self._update_ids), user_id, payload)
+        else:
+            raw = self._callback_update(user_id, payload)
+        update = Update.model_validate(raw, context={"bot": self.bot})
+        started = time.perf_counter()
+        await self.dp.feed_update(self.bot, update)
+        return time.perf_counter() - started
+
+    async def run_user(self, scenario: str, user_id: int, steps: List[Step], result: ScenarioResult) -> None:
+        call_origin.set(scenario)
+        for step in steps:
+            try:
+                result.latencies.append(await self.step(user_id, step))
+            except Exception as e:
+                result.errors += 1
+                logging.getLogger(__name__).error("Сценарий %s, шаг %s: %s", scenario, step, e)
+                return
+            result.updates += 1
+
+    async def run(self, label: str, plan: List[Tuple[str, int, List[Step]]]) -> ScenarioResult:
+        result = ScenarioResult(updates=0, seconds=0.0, latencies=[], api_calls=0, background_calls=0, errors=0)
+        calls_before = len(self.session.calls)
+        monitor = LoopMonitor(interval=LOOP_PULSE, threshold=self.block_threshold, window=10 ** 6)
+        monitor.start()
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(self.run_user(label, user_id, steps, result) for _, user_id, steps in plan))
+            result.seconds = time.perf_counter() - started
+            await wait_background()
+        finally:
+            await monitor.stop()
+        result.loop_lag_p99 = monitor.percentiles()["p99"]
+        result.loop_blocks = monitor.blocks
+        result.block_sites = monitor.sites.most_common(TOP_BLOCK_SITES)
+        new_calls = self.session.calls[calls_before:]
+        result.api_calls = sum(1 for call in new_calls if call["origin"] == label)
+        result.background_calls = sum(1 for call in new_calls if call["origin"] is None)
+        return result
+
+
+async def wait_background(timeout: float = 10.0) -> None:
+    """Дожидается, пока outbox доставит уведомления о заказах, созданных сценарием."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not await outbox_worker.repository.outbox_pending():
+            return
+        await asyncio.sleep(0.05)
+
+
+def prepare_data_dir() -> int:
+    """Копия bot_mind.json с большим запасом товара во временном каталоге; возвращает число позиций."""
+    with open(os.path.join(PROJECT_ROOT, "bot_mind.json"), encoding="utf-8") as f:
+        mind = json.load(f)
+    for coffee in mind.get("coffee_shop", []):
+        for weight in ("250", "1000"):
+            if coffee.get(f"price_{weight}g"):
+                coffee[f"quantity_{weight}g"] = STOCK
+    with open(os.path.join(DATA_DIR, "bot_mind.json"), "w", encoding="utf-8") as f:
+        json.dump(mind, f, ensure_ascii=False)
+    with open(os.path.join(DATA_DIR, "conversations.json"), "w", encoding="utf-8") as f:
+        f.write("{}")
+    os.chdir(DATA_DIR)  # bot_mind.json и conversations.json бот открывает по относительному пути
+    return len(mind.get("coffee_shop", []))
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if current["errors"]:
+            regressions.append(f"{name}: ошибок в сценарии: {current['errors']}")
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']:.2f} мс против {base['p95_ms']:.2f} мс")
+        if current["updates_per_sec"] < base["updates_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['updates_per_sec']:.0f} обн/с против {base['updates_per_sec']:.0f} обн/с")
+        if "loop_lag_p99_ms" in base:  # в старых файлах результатов замеров цикла нет
+            if current["loop_lag_p99_ms"] > max(base["loop_lag_p99_ms"] * (1 + tolerance),
+                                                base["loop_lag_p99_ms"] + LOOP_LAG_SLACK_MS):
+                regressions.append(f"{name}: p99 опоздания цикла {current['loop_lag_p99_ms']:.1f} мс "
+                                   f"против {base['loop_lag_p99_ms']:.1f} мс")
+            if current["loop_blocks"] > base["loop_blocks"] * (1 + tolerance) + LOOP_BLOCKS_SLACK:
+                regressions.append(f"{name}: блокировок цикла {current['loop_blocks']} против {base['loop_blocks']}")
+        if current["api_calls_per_update"] > base["api_calls_per_update"] + 0.001:
+            regressions.append(f"{name}: запросов к API на обновление {current['api_calls_per_update']:.3f} "
+                               f"против {base['api_calls_per_update']:.3f}")
+    return regressions
+
+
+def report(name: str, summary: Dict[str, float], base: Optional[Dict[str, float]],
+           block_sites: Optional[List[Tuple[str, int]]] = None) -> None:
+    line = (f"{name:<9} {summary['updates']:>6} обн  {summary['updates_per_sec']:>8.0f} обн/с  "
+            f"p50={summary['p50_ms']:.2f} p95={summary['p95_ms']:.2f} p99={summary['p99_ms']:.2f} мс  "
+            f"API/обн={summary['api_calls_per_update']:.2f} фоновых={summary['background_calls']} "
+            f"ошибок={summary['errors']}  цикл: p99={summary['loop_lag_p99_ms']:.1f} мс "
+            f"блокировок={summary['loop_blocks']}")
+    if base:
+        line += (f"  (база: {base['updates_per_sec']:.0f} обн/с, p95={base['p95_ms']:.2f} мс, "
+                 f"API/обн={base['api_calls_per_update']:.2f})")
+    print(line)
+    for site, count in block_sites or []:
+        print(f"{'':<9} цикл занят (снимков: {count}): {site}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Реплей обновлений через настоящий диспетчер бота")
+    parser.add_argument("--users", type=int, default=200, help="пользователей в каждом сценарии")
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "mixed", "all"], default="all")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="задержка заглушки нейросети, с")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа Bot API, с")
+    parser.add_argument("--with-scheduler", action="store_true",
+                        help="пропускать отправки через планировщик с лимитами Telegram (тогда меряются и лимиты)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--save", help="сохранить результаты в JSON")
+    parser.add_argument("--baseline", help="JSON с результатами для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустимое ухудшение p95 и обн/с (доля)")
+    parser.add_argument("--block-threshold", type=float, default=0.02,
+                        help="с какой длительности занятость цикла событий считается блокировкой, с")
+    parser.add_argument("--block-stacks", action="store_true", help="писать полный стек каждой блокировки цикла")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if not args.block_stacks:
+        # Места блокировок и так печатаются в сводке сценария
+        logging.getLogger("utils.loop_monitor").setLevel(logging.ERROR)
+    coffees = prepare_data_dir()
+
+    async def fake_ai_response(messages: List[Dict[str, str]], user_id: Optional[int] = None) -> str:
+        await asyncio.sleep(args.llm_latency)
+        return "Попробуйте очистить систему от накипи и проверить уплотнители."
+
+    user_handlers.get_ai_response = fake_ai_response
+
+    session = RecordingSession(latency=args.api_latency)
+    bot = Bot(token=FAKE_TOKEN, session=session)
+    if args.with_scheduler:
+        bot.session.middleware(send_scheduler)
+    bot.session.middleware(telegram_metrics)
+    # Лимиты частоты остаются в цепочке, но не срабатывают: сценарии нажимают кнопки без пауз
+    unlimited = ThrottlingMiddleware(budgets={"llm": (1e9, 1e9), "shop": (1e9, 1e9)}, exempt=())
+    dp = create_dispatcher(throttle=unlimited)
+
+    await load_pending_orders_to_cache()
+    await load_order_history_index()
+    await load_fsm_states()
+    await order_pipeline.start()
+    order_pipeline.add_commit_listener(outbox_worker.wake)
+    outbox_worker.start(bot)
+
+    rng = random.Random(args.seed)
+    names = list(SCENARIOS) + ["mixed"] if args.scenario == "all" else [args.scenario]
+    replayer = Replayer(dp, bot, session, block_threshold=args.block_threshold)
+    baseline = None
+    if args.baseline:
+        with open(os.path.join(PROJECT_ROOT, args.baseline) if not os.path.isabs(args.baseline) else args.baseline,
+                  encoding="utf-8") as f:
+            baseline = json.load(f)["scenarios"]
+
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        # Прогрев: первый вызов каждого метода API строит модели ответа pydantic (десятки мс),
+        # это разовая цена процесса, а не обработки обновления
+        await replayer.run("warmup", [(name, 100 + i, scenario(rng, coffees)) for i, (name, scenario) in enumerate(SCENARIOS.items())])
+        for number, name in enumerate(names, start=1):
+            first_user = number * 1_000_000
+            if name == "mixed":
+                kinds = list(SCENARIOS)
+                plan = [(kinds[i % len(kinds)], first_user + i, SCENARIOS[kinds[i % len(kinds)]](rng, coffees))
+                        for i in range(args.users)]
+            else:
+                plan = [(name, first_user + i, SCENARIOS[name](rng, coffees)) for i in range(args.users)]
+            result = await replayer.run(name, plan)
+            results[name] = result.summary()
+            report(name, results[name], baseline.get(name) if baseline else None, result.block_sites)
+    finally:
+        await order_pipeline.stop()
+        await outbox_worker.stop()
+        await fsm_storage.close()
+        await bot.session.close()
+        os.chdir(PROJECT_ROOT)
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+    if args.save:
+        path = args.save if os.path.isabs(args.save) else os.path.join(PROJECT_ROOT, args.save)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"meta": {"users": args.users, "llm_latency": args.llm_latency, "api_latency": args.api_latency,
+                                "with_scheduler": args.with_scheduler, "seed": args.seed,
+                                "python": sys.version.split()[0]},
+                       "scenarios": results}, f, ensure_ascii=False, indent=2)
+        print(f"результаты сохранены в {path}")
+
+    failures = [f"{name}: ошибок в сценарии: {summary['errors']}" for name, summary in results.items()
+                if summary["errors"] and not baseline]
+    if baseline:
+        failures = compare(results, baseline, args.tolerance)
+    if failures:
+        print("РЕГРЕССИЯ:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
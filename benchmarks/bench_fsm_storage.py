@@ -0,0 +1,100 @@
+# benchmarks/bench_fsm_storage.py
+"""
+Задержка операций FSM-хранилища: MemoryStorage aiogram против JournalFSMStorage (storage/fsm_storage.py).
+
+Имитируется оформление заказа множеством пользователей: set_state + update_data с корзиной,
+затем чтения get_state/get_data, как их делает диспетчер на каждое обновление.
+После прогона журнальное хранилище закрывается и открывается заново — проверяется,
+что состояния пережили «перезапуск», а просроченные удаляются.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_fsm_storage --users 5000 --ops 50000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from handlers.order_handlers import OrderStatesGroup
+from storage.fsm_storage import JournalFSMStorage
+from utils.stats import percentile
+
+BOT_ID = 123456
+CART = [
+    {"coffee_index": 0, "name": "Brazil Serrado", "weight": "250", "price": "18.00 руб."},
+    {"coffee_index": 2, "name": "Ethiopia Sidamo", "weight": "1000", "price": "62.00 руб."},
+]
+
+
+def storage_key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=BOT_ID, chat_id=user_id, user_id=user_id)
+
+
+async def timed(samples: List[float], operation: Callable) -> None:
+    started = time.perf_counter()
+    await operation()
+    samples.append(time.perf_counter() - started)
+
+
+async def run(storage: BaseStorage, users: int, ops: int) -> Dict[str, List[float]]:
+    rng = random.Random(7)
+    samples: Dict[str, List[float]] = {"set_state": [], "update_data": [], "get_state": [], "get_data": []}
+    for user_id in range(users):
+        key = storage_key(user_id)
+        await timed(samples["set_state"], lambda: storage.set_state(key, OrderStatesGroup.waiting_for_comment))
+        await timed(samples["update_data"], lambda: storage.update_data(key, {"cart": CART, "total": 80.0, "user_id": user_id}))
+        await asyncio.sleep(0)  # между обновлениями цикл событий успевает выполнить фоновую запись
+    for _ in range(ops):
+        key = storage_key(rng.randrange(users))
+        await timed(samples["get_state"], lambda: storage.get_state(key))
+        await timed(samples["get_data"], lambda: storage.get_data(key))
+    return samples
+
+
+def report(title: str, samples: Dict[str, List[float]]) -> None:
+    parts = [
+        f"{name} p50={percentile(values, 50) * 1e6:.1f} p99={percentile(values, 99) * 1e6:.1f}"
+        for name, values in samples.items()
+    ]
+    print(f"{title:<20} " + ", ".join(parts) + " мкс")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Задержка операций FSM-хранилища")
+    parser.add_argument("--users", type=int, default=5000, help="пользователей в середине оформления заказа")
+    parser.add_argument("--ops", type=int, default=50000, help="чтений состояния")
+    args = parser.parse_args()
+
+    report("MemoryStorage", await run(MemoryStorage(), args.users, args.ops))
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot, journal = os.path.join(directory, "fsm_states.json"), os.path.join(directory, "fsm_states.journal")
+        storage = JournalFSMStorage(snapshot, journal)
+        samples = await run(storage, args.users, args.ops)
+        report("JournalFSMStorage", samples)
+        await storage.close()
+        print(f"групповых записей в журнал: {storage.flushes}")
+
+        started = time.perf_counter()
+        restarted = JournalFSMStorage(snapshot, journal)
+        await restarted.load()
+        print(f"перезапуск: загружено {len(restarted)} состояний за {(time.perf_counter() - started) * 1000:.0f} мс")
+        assert len(restarted) == args.users, "после перезапуска потеряны состояния"
+        assert await restarted.get_state(storage_key(0)) == OrderStatesGroup.waiting_for_comment.state
+        assert (await restarted.get_data(storage_key(0)))["cart"] == CART
+
+        expiring = JournalFSMStorage(snapshot, journal, ttl=0)
+        await expiring.load()
+        await expiring.close()
+        assert len(expiring) == 0, "просроченные состояния не удалены"
+        print("TTL: просроченные состояния удалены при загрузке")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
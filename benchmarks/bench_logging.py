@@ -0,0 +1,121 @@
+# benchmarks/bench_logging.py
+"""
+Время цикла событий, которое уходит на логирование одного сообщения в чате с нейросетью.
+
+На сообщение приходится два вызова update_chat_history (вопрос и ответ) и строка
+«Ответ отправлен» — как в message_handler. История пользователя — 20 сообщений.
+Три прогона с одним и тем же приёмником (файл во временном каталоге):
+- «до» — прежние строки лога: f-строки с полной историей на INFO, синхронный FileHandler;
+- «%-формат, синхронно» — текущие функции (история только на DEBUG), синхронный FileHandler;
+- «%-формат, очередь» — текущие функции, LazyQueueHandler + поток QueueListener.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_logging --messages 20000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+import storage.conversations_storage as conversations_storage
+from storage.conversations_storage import update_chat_history
+from utils.logging_setup import LOG_FORMAT, attach_queued, shutdown_logging
+from utils.stats import percentile
+
+USERS = 200
+HISTORY = 20
+TEXT = "Подскажите, почему кофемашина Saeco перестала взбивать молоко и капает вода из-под капучинатора? " * 3
+
+logger = logging.getLogger("handlers.user_handlers")
+storage_logger = logging.getLogger(conversations_storage.__name__)
+
+
+def fill_conversations() -> None:
+    conversations_storage.conversations_cache.clear()
+    for user_id in range(USERS):
+        conversations_storage.conversations_cache[str(user_id)] = {
+            "user_info": {"full_name": f"User {user_id}", "username": f"user{user_id}", "language_code": "ru"},
+            "messages": [{"role": "user", "message": TEXT, "timestamp": "2026-01-01T00:00:00"}] * HISTORY,
+            "cart": [],
+        }
+
+
+async def legacy_message(user_id: int) -> None:
+    """Строки лога, которые писались на каждое сообщение до перевода на %-формат и DEBUG."""
+    for text, role in ((TEXT, "user"), ("Проверьте клапан капучинатора и уплотнители.", "assistant")):
+        await update_chat_history(user_id, text, role)
+        conversation = conversations_storage.conversations_cache[str(user_id)]
+        storage_logger.info(f"Данные сохранены в кэш для пользователя {user_id}")
+        storage_logger.info(f"Обновлена история для пользователя {user_id}: {conversation}")
+    logger.info(f"Ответ отправлен пользователю {user_id}")
+
+
+async def current_message(user_id: int) -> None:
+    for text, role in ((TEXT, "user"), ("Проверьте клапан капучинатора и уплотнители.", "assistant")):
+        await update_chat_history(user_id, text, role)
+    logger.info("Ответ отправлен пользователю %s", user_id)
+
+
+async def run(handle: Callable[[int], Awaitable[None]], messages: int) -> List[float]:
+    fill_conversations()
+    samples = []
+    for i in range(messages):
+        started = time.perf_counter()
+        await handle(i % USERS)
+        samples.append(time.perf_counter() - started)
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    return samples
+
+
+def reset_root() -> logging.Logger:
+    shutdown_logging()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(logging.INFO)
+    return root
+
+
+def file_handler(path: str) -> logging.Handler:
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def report(title: str, samples: List[float], log_path: str) -> float:
+    mean = sum(samples) / len(samples)
+    print(f"{title:<24} среднее={mean * 1e6:7.1f} p50={percentile(samples, 50) * 1e6:7.1f} "
+          f"p99={percentile(samples, 99) * 1e6:7.1f} мкс/сообщение, лог {os.path.getsize(log_path) / 1024:.0f} КБ")
+    return mean
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Время цикла событий на логирование сообщения")
+    parser.add_argument("--messages", type=int, default=20000, help="сообщений в каждом прогоне")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, f"bot{i}.log") for i in range(3)]
+
+        reset_root().addHandler(file_handler(paths[0]))
+        before = report("до", await run(legacy_message, args.messages), paths[0])
+
+        reset_root().addHandler(file_handler(paths[1]))
+        sync = report("%-формат, синхронно", await run(current_message, args.messages), paths[1])
+
+        attach_queued(reset_root(), file_handler(paths[2]))
+        samples = await run(current_message, args.messages)
+        reset_root()  # дописывает очередь, чтобы размер лога был полным
+        queued = report("%-формат, очередь", samples, paths[2])
+
+    print(f"экономия времени цикла: {(before - queued) * 1e6:.1f} мкс на сообщение "
+          f"(из них очередь: {(sync - queued) * 1e6:.1f} мкс)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
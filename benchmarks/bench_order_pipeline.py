@@ -0,0 +1,118 @@
+# benchmarks/bench_order_pipeline.py
+"""
+Нагрузочный тест конвейера заказов (services/order_pipeline.py).
+
+Оформляет синтетические заказы во временном каталоге двумя способами:
+- open-loop с заданной частотой (по умолчанию 50 заказов/с) — задержка оформления p50/p95/p99;
+- залпом N одновременных заказов — пропускная способность.
+Для сравнения те же сценарии гоняются с коммитом по одному заказу (max_batch_size=1).
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_order_pipeline --rate 50 --duration 10 --burst 500
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List
+
+from services.order_pipeline import OrderPipeline
+from storage.pending_orders_storage import PendingOrdersRepository
+from utils.stats import percentile
+
+
+def make_order(i: int) -> dict:
+    return {
+        "order_number": "",
+        "user_id": 100000 + i,
+        "full_name": f"Покупатель {i}",
+        "username": None,
+        "cart": [{"coffee_index": 0, "name": "Brazil Serrado", "weight": "1000", "price": "60.00 руб."}],
+        "payment_method": "Самовывоз (оплата при получении)",
+        "total": 60.0,
+        "comment": "Без комментария",
+        "issued": False,
+        "issue_date": None,
+    }
+
+
+def new_pipeline(directory: str, max_batch_size: int) -> OrderPipeline:
+    repository = PendingOrdersRepository(
+        os.path.join(directory, "pending_orders.json"),
+        os.path.join(directory, "pending_orders.journal"),
+    )
+    return OrderPipeline(repository, os.path.join(directory, "order_number.json"), max_batch_size=max_batch_size)
+
+
+async def timed_order(pipeline: OrderPipeline, i: int, latencies: List[float]) -> None:
+    started = time.perf_counter()
+    await pipeline.place_order(make_order(i))
+    latencies.append(time.perf_counter() - started)
+
+
+async def run_open_loop(max_batch_size: int, rate: float, duration: float) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        pipeline = new_pipeline(directory, max_batch_size)
+        await pipeline.start()
+        latencies: List[float] = []
+        tasks = []
+        started = time.perf_counter()
+        for i in range(int(rate * duration)):
+            # Заказы приходят по расписанию, независимо от того, успевает ли конвейер
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(timed_order(pipeline, i, latencies)))
+        await asyncio.gather(*tasks)
+        await pipeline.stop()
+        return {
+            "orders": len(latencies),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "commits": pipeline.commits,
+            "avg_batch": pipeline.committed_orders / max(pipeline.commits, 1),
+        }
+
+
+async def run_burst(max_batch_size: int, count: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        pipeline = new_pipeline(directory, max_batch_size)
+        await pipeline.start()
+        latencies: List[float] = []
+        started = time.perf_counter()
+        await asyncio.gather(*(timed_order(pipeline, i, latencies) for i in range(count)))
+        elapsed = time.perf_counter() - started
+        await pipeline.stop()
+        numbers = [order["order_number"] for order in await pipeline.repository.all()]
+        assert len(set(numbers)) == count, "номера заказов повторяются"
+        return {
+            "orders": count,
+            "orders_per_s": count / elapsed,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "commits": pipeline.commits,
+            "avg_batch": pipeline.committed_orders / max(pipeline.commits, 1),
+        }
+
+
+def print_result(title: str, result: dict) -> None:
+    values = ", ".join(f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}" for key, value in result.items())
+    print(f"{title:<40} {values}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера заказов")
+    parser.add_argument("--rate", type=float, default=50, help="заказов в секунду в open-loop сценарии")
+    parser.add_argument("--duration", type=float, default=10, help="длительность open-loop сценария, с")
+    parser.add_argument("--burst", type=int, default=500, help="заказов в залповом сценарии")
+    parser.add_argument("--batch", type=int, default=64, help="максимальный размер группового коммита")
+    args = parser.parse_args()
+
+    for label, batch in (("групповой коммит", args.batch), ("коммит по одному заказу", 1)):
+        print_result(f"{label}: {args.rate:g} заказов/с", await run_open_loop(batch, args.rate, args.duration))
+        print_result(f"{label}: залп {args.burst}", await run_burst(batch, args.burst))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+# benchmarks/bench_webhook_latency.py
+"""
+Сравнение сквозной задержки обработки обновления: long polling против вебхука.
+
+Поднимается поддельный Bot API (benchmarks/fake_telegram.py) и бот с эхо-хендлером.
+Задержка — от момента, когда «Telegram» получил обновление (положил в getUpdates
+или начал POST на вебхук), до момента, когда к нему пришёл ответный sendMessage.
+Перед замером проверяется, что вебхук отклоняет запрос с неверным секретом.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_webhook_latency --updates 500 --rate 100
+"""
+import argparse
+import asyncio
+import socket
+import time
+from typing import Dict, List
+
+from aiogram import Dispatcher, Router, types
+
+from benchmarks.fake_telegram import FakeTelegram, make_message_update
+from utils.stats import percentile
+from utils.webhook_server import WebhookServer
+
+SECRET = "bench-secret"
+
+
+def build_dispatcher() -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def echo(msg: types.Message):
+        await msg.answer(msg.text)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LatencyProbe:
+    """Сопоставляет отправленные обновления с ответами бота по тексту."""
+
+    def __init__(self, expected: int):
+        self.sent_at: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self.expected = expected
+        self.done = asyncio.Event()
+
+    def on_call(self, method: str, params: dict) -> None:
+        if method == "sendmessage" and params.get("text") in self.sent_at:
+            self.latencies.append(time.perf_counter() - self.sent_at.pop(params["text"]))
+            if len(self.latencies) == self.expected:
+                self.done.set()
+
+
+async def run_polling(updates: int, rate: float) -> List[float]:
+    fake = FakeTelegram()
+    await fake.start()
+    probe = LatencyProbe(updates)
+    fake.on_call = probe.on_call
+    bot = fake.make_bot()
+    dp = build_dispatcher()
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=10))
+    await asyncio.sleep(0.3)
+    for i in range(updates):
+        text = f"poll-{i}"
+        probe.sent_at[text] = time.perf_counter()
+        fake.push_update(make_message_update(i + 1, 1000 + i % 50, text))
+        await asyncio.sleep(1 / rate)
+    await asyncio.wait_for(probe.done.wait(), timeout=60)
+    await dp.stop_polling()
+    await polling
+    await bot.session.close()
+    await fake.stop()
+    return probe.latencies
+
+
+async def run_webhook(updates: int, rate: float) -> List[float]:
+    fake = FakeTelegram()
+    await fake.start()
+    probe = LatencyProbe(updates)
+    fake.on_call = probe.on_call
+    bot = fake.make_bot()
+    port = free_port()
+    server = WebhookServer(build_dispatcher(), bot, base_url=f"http://127.0.0.1:{port}", path="/webhook",
+                           secret=SECRET, host="127.0.0.1", port=port)
+    await server.start()
+    url = f"http://127.0.0.1:{port}/webhook"
+
+    assert await fake.send_to_webhook(url, make_message_update(10 ** 6, 1, "bad"), secret="wrong") == 401, \
+        "вебхук принял запрос с неверным секретом"
+
+    async def deliver(i: int) -> None:
+        text = f"hook-{i}"
+        probe.sent_at[text] = time.perf_counter()
+        assert await fake.send_to_webhook(url, make_message_update(i + 1, 1000 + i % 50, text), secret=SECRET) == 200
+
+    senders = []
+    for i in range(updates):
+        senders.append(asyncio.create_task(deliver(i)))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*senders)
+    await asyncio.wait_for(probe.done.wait(), timeout=60)
+    await server.stop()
+    await bot.session.close()
+    await fake.stop()
+    return probe.latencies
+
+
+def report(title: str, latencies: List[float]) -> None:
+    print(f"{title:<10} n={len(latencies)} p50={percentile(latencies, 50) * 1000:.1f} мс "
+          f"p95={percentile(latencies, 95) * 1000:.1f} мс p99={percentile(latencies, 99) * 1000:.1f} мс")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Задержка обработки обновлений: polling против вебхука")
+    parser.add_argument("--updates", type=int, default=300, help="сколько обновлений отправить")
+    parser.add_argument("--rate", type=float, default=50, help="обновлений в секунду")
+    args = parser.parse_args()
+
+    report("polling", await run_polling(args.updates, args.rate))
+    report("webhook", await run_webhook(args.updates, args.rate))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
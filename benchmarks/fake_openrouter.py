@@ -0,0 +1,198 @@
+# benchmarks/fake_openrouter.py
+"""
+Локальный мок OpenRouter (OpenAI-совместимый POST /api/v1/chat/completions) для
+нагрузочных прогонов и настройки таймаутов без ключа и сети.
+
+Что настраивается:
+- задержка ответа — распределение (parse_latency): fixed:0.5, uniform:0.2:3,
+  lognormal:1.5:0.6 (медиана 1.5 с), exp:2 (среднее 2 с);
+- доля ответов с ошибкой (429 и 500 поровну) и доля «зависших» запросов,
+  которые отвечают только через hang секунд (проверка таймаута клиента);
+- потоковые ответы (stream=true): SSE-чанки, первый — через 30% задержки,
+  остальные равномерно, в последнем — usage, как у OpenRouter;
+- поле usage: prompt_tokens оценивается по длине сообщений (4 символа на токен).
+
+Запуск отдельно (бот подключается через OPENROUTER_BASE_URL=http://127.0.0.1:8090/api/v1):
+    python -m benchmarks.fake_openrouter --port 8090 --latency lognormal:1.5:0.6 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from typing import Any, Callable, Dict, Optional
+
+from aiohttp import web
+
+LatencySampler = Callable[[random.Random], float]
+
+DEFAULT_RESPONSE = ("Похоже, в системе скопилась накипь. Проведите декальцинацию по инструкции к кофемашине "
+                    "и проверьте уплотнители заварочного блока. Если не поможет — приносите на диагностику.")
+
+
+def parse_latency(spec: str) -> LatencySampler:
+    """Строка вида «вид:параметры» -> функция, выдающая задержку в секундах."""
+    kind, _, raw = spec.partition(":")
+    params = [float(value) for value in raw.split(":") if value]
+    if kind == "fixed" and len(params) == 1:
+        return lambda rng: params[0]
+    if kind == "uniform" and len(params) == 2:
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "lognormal" and len(params) == 2:
+        mu = math.log(params[0])
+        return lambda rng: rng.lognormvariate(mu, params[1])
+    if kind == "exp" and len(params) == 1:
+        return lambda rng: rng.expovariate(1 / params[0])
+    raise ValueError(f"неизвестное распределение задержки: {spec!r} (fixed:S, uniform:A:B, lognormal:MEDIAN:SIGMA, exp:MEAN)")
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeOpenRouter:
+    """Мок chat completions; stats() — сколько запросов пришло, сколько одновременно и чем ответили."""
+
+    def __init__(self, latency: str = "fixed:0.5", error_rate: float = 0.0, hang_rate: float = 0.0,
+                 hang: float = 120.0, chunks: int = 8, response: str = DEFAULT_RESPONSE, seed: Optional[int] = None):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self.chunks = chunks
+        self.response = response
+        self.rng = random.Random(seed)
+        self.host: Optional[str] = None
+        self.port: Optional[int] = None
+        self._ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self.requests = 0
+        self.errors = 0
+        self.hung = 0
+        self.streamed = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/v1"
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "errors": self.errors, "hung": self.hung, "streamed": self.streamed,
+                "in_flight": self.in_flight, "peak_in_flight": self.peak_in_flight}
+
+    def _usage(self, body: Dict[str, Any]) -> Dict[str, int]:
+        prompt = count_tokens("".join(str(message.get("content") or "") for message in body.get("messages", [])))
+        completion = count_tokens(self.response)
+        return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+    @staticmethod
+    def _error(status: int, message: str) -> web.Response:
+        return web.json_response({"error": {"message": message, "code": status}}, status=status)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            body = await request.json()
+            latency = self.sample_latency(self.rng)
+            roll = self.rng.random()
+            if roll < self.hang_rate:
+                self.hung += 1
+                latency = self.hang
+            elif roll < self.hang_rate + self.error_rate:
+                self.errors += 1
+                await asyncio.sleep(latency * self.rng.random())
+                if self.rng.random() < 0.5:
+                    return self._error(429, "Rate limit exceeded: free-models-per-min")
+                return self._error(500, "Internal Server Error")
+
+            completion_id = f"gen-{next(self._ids)}"
+            model = body.get("model", "mock")
+            if body.get("stream"):
+                self.streamed += 1
+                return await self._stream(request, body, completion_id, model, latency)
+            await asyncio.sleep(latency)
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.response},
+                             "finish_reason": "stop"}],
+                "usage": self._usage(body),
+            })
+        finally:
+            self.in_flight -= 1
+
+    async def _stream(self, request: web.Request, body: Dict[str, Any], completion_id: str, model: str,
+                      latency: float) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        size = math.ceil(len(self.response) / self.chunks)
+        parts = [self.response[i:i + size] for i in range(0, len(self.response), size)]
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra: Any) -> bytes:
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                       **extra}
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode()
+
+        await asyncio.sleep(latency * 0.3)
+        for number, part in enumerate(parts):
+            if number:
+                await asyncio.sleep(latency * 0.7 / max(1, len(parts) - 1))
+            await response.write(chunk({"role": "assistant", "content": part} if number == 0 else {"content": part}))
+        await response.write(chunk({}, "stop", usage=self._usage(body)))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        app = web.Application()
+        for prefix in ("/api/v1", "/v1"):
+            app.router.add_post(f"{prefix}/chat/completions", self.handle)
+        self._runner = web.AppRunner(app, shutdown_timeout=1.0)  # «зависшие» запросы не держат остановку
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.host = host
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальный мок OpenRouter chat completions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="lognormal:1.5:0.6", help="распределение задержки ответа")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 429/500")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="доля запросов, отвечающих через --hang секунд")
+    parser.add_argument("--hang", type=float, default=120.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = FakeOpenRouter(latency=args.latency, error_rate=args.error_rate, hang_rate=args.hang_rate,
+                            hang=args.hang, seed=args.seed)
+    await server.start(args.host, args.port)
+    print(f"мок OpenRouter: OPENROUTER_BASE_URL={server.base_url}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(server.stats())
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,219 @@
+# benchmarks/fake_telegram.py
+"""
+Локальный поддельный Bot API для бенчмарков: отвечает на запросы бота как Telegram,
+отдаёт обновления через getUpdates (long polling) или сам отправляет их на вебхук.
+Все вызовы методов записываются в calls, на каждый можно повесить обработчик on_call.
+
+RecordingSession — то же без HTTP: сессия бота, которая не ходит в сеть, а записывает
+вызовы и отвечает сразу. Она же помнит последнее сообщение бота в каждом чате,
+чтобы следующее нажатие кнопки можно было построить на реальном экране.
+"""
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+from aiohttp import ClientSession, web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.base import BaseSession
+from aiogram.client.telegram import TelegramAPIServer
+
+FAKE_TOKEN = "123456:TEST-fake-token"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Coffee Master", "username": "coffee_master_bot"}
+
+# Методы, которые возвращают отправленное/изменённое сообщение
+MESSAGE_METHODS = {
+    "sendmessage", "sendphoto", "senddocument", "sendanimation", "sendvideo", "sendvoice",
+    "copymessage", "forwardmessage", "editmessagetext", "editmessagecaption", "editmessagemedia",
+    "editmessagereplymarkup",
+}
+
+
+def make_message_update(update_id: int, chat_id: int, text: str) -> Dict[str, Any]:
+    user = {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}", "username": f"user{chat_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text,
+        },
+    }
+
+
+def make_message(params: Dict[str, Any], message_id: int) -> Dict[str, Any]:
+    """Сообщение бота, которое Telegram вернул бы на отправку или правку с такими параметрами."""
+    message = {
+        "message_id": int(params.get("message_id") or message_id),
+        "date": int(time.time()),
+        "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+        "from": BOT_USER,
+    }
+    media = params.get("media")
+    if "photo" in params or media:
+        message["photo"] = [{"file_id": "photo", "file_unique_id": "photo", "width": 100, "height": 100}]
+        message["caption"] = params.get("caption") or (media.get("caption") if isinstance(media, dict) else None) or ""
+    else:
+        message["text"] = params.get("text") or params.get("caption") or ""
+    if params.get("reply_markup"):
+        message["reply_markup"] = params["reply_markup"]
+    return message
+
+
+def fake_result(method: str, params: Dict[str, Any], message_id: int) -> Any:
+    """Результат метода Bot API (method — имя в нижнем регистре)."""
+    if method == "getme":
+        return BOT_USER
+    if method == "getchat":
+        chat_id = int(params.get("chat_id") or 0)
+        return {"id": chat_id, "type": "private", "first_name": f"User{chat_id}", "username": f"user{chat_id}",
+                "accent_color_id": 0, "max_reaction_count": 11, "accepted_gift_types": {
+                    "unlimited_gifts": False, "limited_gifts": False, "unique_gifts": False, "premium_subscription": False}}
+    if method in MESSAGE_METHODS:
+        return make_message(params, message_id)
+    return True
+
+
+class FakeTelegram:
+    def __init__(self, token: str = FAKE_TOKEN, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.token = token
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.calls: List[Dict[str, Any]] = []
+        self.on_call: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        self._updates: List[Dict[str, Any]] = []
+        self._new_updates = asyncio.Event()
+        self._message_id = 1000
+        self._runner: Optional[web.AppRunner] = None
+        self._client: Optional[ClientSession] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def make_bot(self) -> Bot:
+        """Бот, все запросы которого идут в этот поддельный сервер."""
+        return Bot(token=self.token, session=AiohttpSession(api=TelegramAPIServer.from_base(self.base_url)))
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def push_update(self, update: Dict[str, Any]) -> None:
+        """Кладёт обновление в очередь getUpdates."""
+        self._updates.append(update)
+        self._new_updates.set()
+
+    async def send_to_webhook(self, url: str, update: Dict[str, Any], secret: Optional[str] = None) -> int:
+        """Поддельный отправитель Telegram: POST обновления на вебхук, возвращает HTTP-статус."""
+        if self._client is None:
+            self._client = ClientSession()
+        headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+        async with self._client.post(url, json=update, headers=headers) as response:
+            return response.status
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(self._updates)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params: Dict[str, Any] = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            else:
+                form = await request.post()
+                params.update({key: value for key, value in form.items() if isinstance(value, str)})
+                if "photo" in form:
+                    params["photo"] = "attached"
+                # В form-data сложные поля приходят JSON-строкой, а в ответе Telegram это объекты
+                for key in ("reply_markup", "media"):
+                    if isinstance(params.get(key), str):
+                        try:
+                            params[key] = json.loads(params[key])
+                        except json.JSONDecodeError:
+                            pass
+
+        if method == "getupdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+
+        self.calls.append({"method": method, "params": params, "time": time.perf_counter()})
+        if self.on_call is not None:
+            self.on_call(method, params)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        self._message_id += 1
+        return web.json_response({"ok": True, "result": fake_result(method, params, self._message_id)})
+
+    def count(self, method: str) -> int:
+        return sum(1 for call in self.calls if call["method"] == method.lower())
+
+
+# Метка вызовов: бенчмарк выставляет её на время обработки обновления,
+# вызовы без метки сделаны фоновыми задачами (outbox, планировщик)
+call_origin: ContextVar[Optional[str]] = ContextVar("call_origin", default=None)
+
+
+class RecordingSession(BaseSession):
+    """
+    Сессия бота без сети: каждый запрос записывается в calls и сразу получает ответ
+    как от Telegram (ответ проходит обычную проверку check_response aiogram).
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: List[Dict[str, Any]] = []
+        self.last_message: Dict[int, Dict[str, Any]] = {}
+        self._message_id = 1000
+
+    async def make_request(self, bot: Bot, method, timeout: Optional[int] = None) -> Any:
+        name = method.__api_method__.lower()
+        params = method.model_dump(exclude_none=True, exclude_unset=True)
+        self.calls.append({"method": name, "origin": call_origin.get(), "chat_id": params.get("chat_id"),
+                           "text": params.get("text") or params.get("caption")})
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self._message_id += 1
+        result = fake_result(name, params, self._message_id)
+        if name in MESSAGE_METHODS and params.get("chat_id") is not None:
+            self.last_message[int(params["chat_id"])] = result
+        response = self.check_response(bot=bot, method=method, status_code=200,
+                                       content=json.dumps({"ok": True, "result": result}))
+        return response.result
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        return None
+
+    def count(self, method: str, origin: Optional[str] = None) -> int:
+        return sum(1 for call in self.calls if call["method"] == method.lower() and (origin is None or call["origin"] == origin))
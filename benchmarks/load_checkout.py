@@ -0,0 +1,293 @@
+# benchmarks/load_checkout.py
+"""
+Нагрузочный прогон оформления заказов с проверкой согласованности данных.
+
+N покупателей одновременно охотятся за ограниченным остатком одной позиции coffee_shop
+(250 г): открывают карточку, несколько раз добавляют товар в корзину (add_to_cart_handler),
+часть покупателей очищает корзину, остальные оформляют самовывоз или Европочту.
+Обновления идут через настоящий Dispatcher (main.create_dispatcher), Bot API —
+RecordingSession из benchmarks/fake_telegram.py, всё без сети, данные во временном каталоге.
+
+После прогона проверяются инварианты:
+- остаток + продано + осталось в корзинах = начальный остаток, остаток не отрицательный;
+- номера заказов уникальны, каждый покупатель, дошедший до конца, получил свой номер,
+  состав заказа совпадает с тем, что покупатель положил в корзину, счётчик номеров на диске
+  не меньше последнего номера;
+- на каждый ожидающий заказ администратору пришло уведомление, в outbox ничего не осталось;
+- журнал pending_orders, перечитанный с диска, содержит те же заказы, что и память.
+При нарушении любого инварианта скрипт завершается с кодом 1.
+
+Запуск из корня проекта:
+    python -m benchmarks.load_checkout --customers 300 --stock 100
+"""
+# Импорт bench_dispatcher первым: он подменяет BOT_DATA_DIR до импорта модулей бота
+from benchmarks.bench_dispatcher import (
+    DATA_DIR, PROJECT_ROOT, Replayer, ScenarioError, wait_background,
+)
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+
+from benchmarks.fake_telegram import FAKE_TOKEN, RecordingSession, call_origin
+from config import ORDER_NUMBER_FILE, PENDING_ORDERS_FILE, PENDING_ORDERS_JOURNAL_FILE
+from config.config import ADMIN_ID, BOT_MIND_FILE
+from main import create_dispatcher
+from middlewares.throttling import ThrottlingMiddleware
+from models.callbacks import (
+    AddToCart, BackToDetails, Checkout, ClearCart, CoffeeDetails, EuropochtaSend, PickupCash, SelectWeight, ViewCart,
+)
+from services.order_pipeline import order_pipeline
+from services.outbox_service import outbox_worker
+from storage.conversations_storage import conversations_cache
+from storage.fsm_storage import fsm_storage, load_fsm_states
+from storage.orders_storage import load_last_order_number
+from storage.pending_orders_storage import PendingOrdersRepository, load_pending_orders_to_cache
+from utils.stats import percentile
+
+WEIGHT = "250"
+ORDER_CONFIRMED = re.compile(r"Заказ №(\d+) оформлен")
+NEW_ORDER = re.compile(r"Новый заказ №(\d+)")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Customer:
+    user_id: int
+    added: int = 0
+    outcome: str = "started"  # sold_out / abandoned / pickup / europochta / error
+    order_number: Optional[str] = None
+    latencies: List[float] = field(default_factory=list)
+
+
+class Shopper:
+    """Проводит покупателя по экранам бота; кнопки нажимаются только те, что есть на текущем экране."""
+
+    def __init__(self, replayer: Replayer, session: RecordingSession, sku: int):
+        self.replayer = replayer
+        self.session = session
+        self.sku = sku
+
+    async def _send(self, customer: Customer, kind: str, payload: str) -> None:
+        customer.latencies.append(await self.replayer.step(customer.user_id, (kind, payload)))
+
+    def _buttons(self, user_id: int) -> List[str]:
+        screen = self.session.last_message.get(user_id) or {}
+        return [button.get("callback_data")
+                for row in (screen.get("reply_markup") or {}).get("inline_keyboard", []) for button in row]
+
+    async def _open_card(self, customer: Customer) -> None:
+        await self._send(customer, "text", "/coffeeshop")
+        await self._send(customer, "press", CoffeeDetails(self.sku).pack())
+
+    async def run(self, customer: Customer, rng: random.Random, max_items: int, abandon: float, europochta: float) -> None:
+        call_origin.set("load")
+        try:
+            await self._open_card(customer)
+            for _ in range(rng.randint(1, max_items)):
+                await self._send(customer, "press", SelectWeight(self.sku, WEIGHT).pack())
+                await self._send(customer, "press", AddToCart(self.sku, WEIGHT).pack())
+                if ViewCart().pack() not in self._buttons(customer.user_id):
+                    # «Товар отсутствует в наличии» — экран без кнопок, возвращаемся к карточке
+                    await self._open_card(customer)
+                    break
+                customer.added += 1
+                await self._send(customer, "press", BackToDetails(self.sku).pack())
+
+            if not customer.added:
+                customer.outcome = "sold_out"
+                return
+            await self._send(customer, "press", ViewCart().pack())
+            if rng.random() < abandon:
+                await self._send(customer, "press", ClearCart().pack())
+                customer.outcome = "abandoned"
+                return
+            await self._send(customer, "press", Checkout().pack())
+            if rng.random() < europochta:
+                await self._send(customer, "press", EuropochtaSend().pack())
+                await self._send(customer, "text", f"Покупатель {customer.user_id}")
+                await self._send(customer, "text", f"ул. Неждановой {customer.user_id % 100}, {customer.user_id % 300}")
+                customer.outcome = "europochta"
+            else:
+                await self._send(customer, "press", PickupCash().pack())
+                await self._send(customer, "text", "Заберу после обеда")
+                customer.outcome = "pickup"
+        except Exception as e:
+            customer.outcome = "error"
+            logger.error("Покупатель %s: %s", customer.user_id, e if isinstance(e, ScenarioError) else repr(e))
+
+
+def prepare_data_dir(sku: int, stock: int) -> str:
+    """Копия bot_mind.json во временном каталоге: у выбранной позиции остаток stock. Возвращает её название."""
+    with open(os.path.join(PROJECT_ROOT, BOT_MIND_FILE), encoding="utf-8") as f:
+        mind = json.load(f)
+    coffee = mind["coffee_shop"][sku]
+    if not coffee.get(f"price_{WEIGHT}g"):
+        raise SystemExit(f"у позиции {sku} нет фасовки {WEIGHT} г")
+    coffee[f"quantity_{WEIGHT}g"] = stock
+    with open(os.path.join(DATA_DIR, BOT_MIND_FILE), "w", encoding="utf-8") as f:
+        json.dump(mind, f, ensure_ascii=False)
+    with open(os.path.join(DATA_DIR, "conversations.json"), "w", encoding="utf-8") as f:
+        f.write("{}")
+    os.chdir(DATA_DIR)  # bot_mind.json и conversations.json бот открывает по относительному пути
+    return coffee["name"]
+
+
+def count_sku(cart: List[Dict], sku: int) -> int:
+    return sum(1 for item in cart if item.get("coffee_index") == sku and item.get("weight") == WEIGHT)
+
+
+async def verify(customers: List[Customer], session: RecordingSession, sku: int, stock: int) -> List[str]:
+    """Проверяет инварианты магазина после прогона; возвращает список нарушений."""
+    problems: List[str] = []
+    repository = outbox_worker.repository
+
+    with open(BOT_MIND_FILE, encoding="utf-8") as f:
+        left = json.load(f)["coffee_shop"][sku][f"quantity_{WEIGHT}g"]
+    orders = await repository.all()
+    sold = sum(count_sku(order["cart"], sku) for order in orders)
+    in_carts = sum(count_sku(conversation.get("cart", []), sku) for conversation in conversations_cache.values())
+    print(f"остаток {left} + продано {sold} + в корзинах {in_carts} = {left + sold + in_carts} (начальный {stock})")
+    if left + sold + in_carts != stock:
+        problems.append(f"остаток не сходится: {left} + {sold} + {in_carts} != {stock}")
+    if left < 0:
+        problems.append(f"отрицательный остаток: {left}")
+
+    # Номера заказов: из подтверждений покупателям и из самих заказов
+    confirmed: Dict[int, List[str]] = {}
+    admin_numbers: Counter = Counter()
+    for call in session.calls:
+        text = call.get("text") or ""
+        if call["chat_id"] == ADMIN_ID:
+            admin_numbers.update(NEW_ORDER.findall(text))
+        elif call["chat_id"] is not None:
+            confirmed.setdefault(int(call["chat_id"]), []).extend(ORDER_CONFIRMED.findall(text))
+    numbers = [order["order_number"] for order in orders]
+    all_confirmed = [number for found in confirmed.values() for number in found]
+    duplicates = [number for number, count in Counter(all_confirmed).items() if count > 1]
+    if duplicates:
+        problems.append(f"один номер подтверждён нескольким покупателям или дважды: {duplicates[:10]}")
+    by_number = {order["order_number"]: order for order in orders}
+    if len(by_number) != len(numbers):
+        problems.append("повторяющиеся номера среди ожидающих заказов")
+
+    for customer in customers:
+        found = confirmed.get(customer.user_id, [])
+        if customer.outcome in ("pickup", "europochta"):
+            if len(found) != 1:
+                problems.append(f"покупатель {customer.user_id}: подтверждений заказа {len(found)} вместо 1")
+                continue
+            customer.order_number = found[0]
+            order = by_number.get(customer.order_number)
+            if order is None:
+                problems.append(f"заказ №{customer.order_number} покупателя {customer.user_id} не найден")
+            elif order["user_id"] != customer.user_id or count_sku(order["cart"], sku) != customer.added:
+                problems.append(f"заказ №{customer.order_number}: покупатель {order['user_id']}, "
+                                f"позиций {count_sku(order['cart'], sku)}, ожидалось {customer.user_id} и {customer.added}")
+        elif found:
+            problems.append(f"покупатель {customer.user_id} ({customer.outcome}) получил подтверждение заказа {found}")
+
+    last_number = await load_last_order_number(ORDER_NUMBER_FILE)
+    if numbers and last_number < max(int(number) for number in numbers):
+        problems.append(f"счётчик номеров {last_number} меньше последнего заказа {max(numbers)}")
+
+    # Уведомления администратору: ровно по одному на каждый ожидающий заказ
+    missing = [number for number in numbers if admin_numbers[number] == 0]
+    if missing:
+        problems.append(f"нет уведомления администратору о заказах: {missing[:10]} (всего {len(missing)})")
+    repeated = [number for number, count in admin_numbers.items() if count > 1]
+    if repeated:
+        problems.append(f"повторные уведомления администратору: {repeated[:10]}")
+    pending = await repository.outbox_pending()
+    if pending:
+        problems.append(f"недоставленных уведомлений в outbox: {len(pending)}")
+
+    # Журнал на диске: перечитанный с нуля репозиторий должен совпасть с памятью
+    reloaded = PendingOrdersRepository(PENDING_ORDERS_FILE, PENDING_ORDERS_JOURNAL_FILE)
+    await reloaded.load()
+    on_disk = {order["order_number"] for order in await reloaded.all()}
+    if on_disk != set(numbers):
+        problems.append(f"журнал расходится с памятью: только на диске {sorted(on_disk - set(numbers))[:10]}, "
+                        f"только в памяти {sorted(set(numbers) - on_disk)[:10]}")
+    if await reloaded.outbox_pending():
+        problems.append(f"после перечитывания журнала в outbox {len(await reloaded.outbox_pending())} уведомлений")
+    return problems
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Гонка покупателей за остатком и проверка согласованности")
+    parser.add_argument("--customers", type=int, default=200, help="одновременных покупателей")
+    parser.add_argument("--stock", type=int, default=50, help="начальный остаток позиции (250 г)")
+    parser.add_argument("--sku", type=int, default=0, help="индекс позиции в coffee_shop")
+    parser.add_argument("--max-items", type=int, default=3, help="сколько раз покупатель добавляет товар (максимум)")
+    parser.add_argument("--abandon", type=float, default=0.1, help="доля покупателей, очищающих корзину")
+    parser.add_argument("--europochta", type=float, default=0.5, help="доля заказов с доставкой Европочтой")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="задержка ответа Bot API, с")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    name = prepare_data_dir(args.sku, args.stock)
+
+    session = RecordingSession(latency=args.api_latency)
+    bot = Bot(token=FAKE_TOKEN, session=session)
+    unlimited = ThrottlingMiddleware(budgets={"llm": (1e9, 1e9), "shop": (1e9, 1e9)}, exempt=())
+    dp = create_dispatcher(throttle=unlimited)
+
+    await load_pending_orders_to_cache()
+    await load_fsm_states()
+    await order_pipeline.start()
+    order_pipeline.add_commit_listener(outbox_worker.wake)
+    outbox_worker.start(bot)
+
+    rng = random.Random(args.seed)
+    customers = [Customer(user_id=5_000_000 + i) for i in range(args.customers)]
+    shopper = Shopper(Replayer(dp, bot, session), session, args.sku)
+    problems: List[str] = []
+    try:
+        print(f"{args.customers} покупателей, «{name}» {WEIGHT} г, остаток {args.stock}")
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            shopper.run(customer, random.Random(rng.random()), args.max_items, args.abandon, args.europochta)
+            for customer in customers
+        ))
+        elapsed = time.perf_counter() - started
+        await wait_background()
+
+        latencies = sorted(latency for customer in customers for latency in customer.latencies)
+        outcomes = Counter(customer.outcome for customer in customers)
+        print(f"{len(latencies)} обновлений за {elapsed:.2f} с ({len(latencies) / elapsed:.0f} обн/с), "
+              f"p95={percentile(latencies, 95) * 1000:.1f} мс")
+        print("итоги: " + ", ".join(f"{outcome}={count}" for outcome, count in sorted(outcomes.items())))
+        if outcomes["error"]:
+            problems.append(f"покупателей с ошибкой сценария: {outcomes['error']}")
+        problems += await verify(customers, session, args.sku, args.stock)
+    finally:
+        await order_pipeline.stop()
+        await outbox_worker.stop()
+        await fsm_storage.close()
+        await bot.session.close()
+        os.chdir(PROJECT_ROOT)
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+    if problems:
+        print("НАРУШЕНЫ ИНВАРИАНТЫ:\n  " + "\n  ".join(problems), file=sys.stderr)
+        sys.exit(1)
+    print("инварианты выполнены")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
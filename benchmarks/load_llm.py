@@ -0,0 +1,193 @@
+# benchmarks/load_llm.py
+"""
+Поведение бота при медленной или сбоящей нейросети — без ключа OpenRouter и сети.
+
+Поднимает мок OpenRouter (benchmarks/fake_openrouter.py) в отдельном потоке со своим
+циклом событий, направляет на него бота через OPENROUTER_BASE_URL и прогоняет вопросы
+пользователей через настоящий Dispatcher (Bot API — RecordingSession). Пользователи
+подключаются равномерно за --ramp секунд, каждый задаёт --questions вопросов подряд.
+
+Что выводится:
+- отзывчивость цикла событий: на сколько опаздывает таймер с шагом 10 мс (p50/p99/max) —
+  если цикл блокируется на время запроса к нейросети, это видно сразу;
+- задержка ответа пользователю (обработка обновления с вопросом) p50/p95/max;
+- очередь к нейросети: сколько запросов максимум ждало слота LLM_MAX_CONCURRENCY
+  и сколько одновременно дошло до мока;
+- сколько пользователей получили запасной ответ вместо ответа нейросети.
+
+Таймаут, число повторов и лимит одновременных запросов берутся из окружения, как у бота
+(LLM_TIMEOUT, LLM_MAX_RETRIES, LLM_MAX_CONCURRENCY), или из --timeout/--retries/--concurrency.
+
+Запуск из корня проекта:
+    python -m benchmarks.load_llm --users 50 --latency lognormal:2:0.5 --error-rate 0.05
+    python -m benchmarks.load_llm --users 30 --hang-rate 0.1 --timeout 10 --retries 0
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import threading
+import time
+from typing import List, Optional
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузка на бота при медленной или сбоящей нейросети")
+    parser.add_argument("--users", type=int, default=30, help="пользователей")
+    parser.add_argument("--questions", type=int, default=3, help="вопросов от каждого пользователя")
+    parser.add_argument("--ramp", type=float, default=2.0, help="за сколько секунд подключаются все пользователи")
+    parser.add_argument("--latency", default="lognormal:1:0.5", help="распределение задержки мока (см. fake_openrouter)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов мока 429/500")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="доля «зависших» запросов")
+    parser.add_argument("--hang", type=float, default=120.0, help="через сколько отвечает «зависший» запрос, с")
+    parser.add_argument("--timeout", type=float, help="LLM_TIMEOUT, с")
+    parser.add_argument("--retries", type=int, help="LLM_MAX_RETRIES")
+    parser.add_argument("--concurrency", type=int, help="LLM_MAX_CONCURRENCY")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Настройки нейросети читаются из окружения при импорте config, поэтому задаются до импорта модулей бота
+ARGS = parse_args()
+PORT = free_port()
+os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{PORT}/api/v1"
+os.environ.setdefault("OPENROUTER_API_KEY", "mock")
+for name, value in (("LLM_TIMEOUT", ARGS.timeout), ("LLM_MAX_RETRIES", ARGS.retries),
+                    ("LLM_MAX_CONCURRENCY", ARGS.concurrency)):
+    if value is not None:
+        os.environ[name] = str(value)
+
+from benchmarks.bench_dispatcher import DATA_DIR, PROJECT_ROOT, Replayer, prepare_data_dir  # noqa: E402
+
+import logging  # noqa: E402
+import shutil  # noqa: E402
+
+from aiogram import Bot  # noqa: E402
+
+import services.ai_service as ai_service  # noqa: E402
+from benchmarks.fake_openrouter import FakeOpenRouter  # noqa: E402
+from benchmarks.fake_telegram import FAKE_TOKEN, RecordingSession, call_origin  # noqa: E402
+from config.config import LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES, LLM_TIMEOUT  # noqa: E402
+from main import create_dispatcher  # noqa: E402
+from middlewares.throttling import ThrottlingMiddleware  # noqa: E402
+from storage.fsm_storage import fsm_storage, load_fsm_states  # noqa: E402
+from storage.llm_usage_storage import llm_usage_store  # noqa: E402
+from utils.stats import percentile  # noqa: E402
+
+QUESTIONS = ["Кофемашина не греет воду", "Как удалить накипь?", "Какой кофе подходит для эспрессо?",
+             "Почему кофе получается кислым?", "Капучинатор не взбивает молоко", "Из-под поддона течёт вода"]
+
+
+class MockThread:
+    """Мок OpenRouter в отдельном потоке: блокировки цикла бота не искажают задержки мока."""
+
+    def __init__(self, server: FakeOpenRouter):
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="fake-openrouter", daemon=True)
+
+    def start(self, port: int) -> None:
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(port=port), self.loop).result()
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result(timeout=10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=10)
+
+
+class LagMonitor:
+    """Таймер с шагом interval: насколько позже срабатывает, настолько цикл был занят."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def run_user(replayer: Replayer, user_id: int, delay: float, rng: random.Random, latencies: List[float]) -> None:
+    call_origin.set("llm")
+    await asyncio.sleep(delay)
+    await replayer.step(user_id, ("text", "/start"))
+    for question in rng.sample(QUESTIONS, min(ARGS.questions, len(QUESTIONS))):
+        latencies.append(await replayer.step(user_id, ("text", question)))
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.CRITICAL)
+    prepare_data_dir()
+
+    mock = MockThread(FakeOpenRouter(latency=ARGS.latency, error_rate=ARGS.error_rate, hang_rate=ARGS.hang_rate,
+                                     hang=ARGS.hang, seed=ARGS.seed))
+    mock.start(PORT)
+
+    session = RecordingSession()
+    bot = Bot(token=FAKE_TOKEN, session=session)
+    unlimited = ThrottlingMiddleware(budgets={"llm": (1e9, 1e9), "shop": (1e9, 1e9)}, exempt=())
+    dp = create_dispatcher(throttle=unlimited)
+    await load_fsm_states()
+
+    replayer = Replayer(dp, bot, session)
+    rng = random.Random(ARGS.seed)
+    latencies: List[float] = []
+    monitor = LagMonitor()
+    print(f"мок: {ARGS.latency}, ошибок {ARGS.error_rate:.0%}, зависаний {ARGS.hang_rate:.0%}; "
+          f"бот: LLM_TIMEOUT={LLM_TIMEOUT} LLM_MAX_RETRIES={LLM_MAX_RETRIES} LLM_MAX_CONCURRENCY={LLM_MAX_CONCURRENCY}")
+    try:
+        monitor.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            run_user(replayer, 7_000_000 + i, ARGS.ramp * i / max(1, ARGS.users), random.Random(rng.random()), latencies)
+            for i in range(ARGS.users)
+        ))
+        elapsed = time.perf_counter() - started
+        await monitor.stop()
+    finally:
+        await fsm_storage.close()
+        await llm_usage_store.close()
+        await bot.session.close()
+        mock.stop()
+        os.chdir(PROJECT_ROOT)
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+    replies = [call for call in session.calls if call["method"] == "sendmessage" and call["origin"] == "llm"
+               and call["text"] and not call["text"].startswith("Привет")]
+    fallbacks = sum(1 for call in replies if call["text"] == ai_service.FALLBACK_RESPONSE)
+    stats = mock.server.stats()
+    llm = ai_service.stats()
+    print(f"{len(latencies)} вопросов за {elapsed:.1f} с")
+    print(f"цикл событий: опоздание таймера p50={percentile(monitor.lags, 50) * 1000:.1f} "
+          f"p99={percentile(monitor.lags, 99) * 1000:.1f} max={max(monitor.lags, default=0) * 1000:.1f} мс")
+    print(f"ответ пользователю: p50={percentile(latencies, 50):.2f} p95={percentile(latencies, 95):.2f} "
+          f"max={max(latencies, default=0):.2f} с")
+    print(f"очередь к нейросети: ждали слота максимум {llm['peak_waiting']}, "
+          f"одновременно у мока максимум {stats['peak_in_flight']}")
+    print(f"мок: запросов {stats['requests']} (с повторами), ошибок {stats['errors']}, зависших {stats['hung']}; "
+          f"запасной ответ получили {fallbacks} из {len(replies)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
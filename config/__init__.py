@@ -1,9 +1,20 @@
 # config/__init__.py
 import os
 
-# Пути к файлам в корне проекта
+# Пути к файлам данных (по умолчанию в корне проекта)
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # Поднимаемся на уровень выше (из config в корень)
+# Каталог с файлами данных; бенчмарки и нагрузочные прогоны подменяют его, чтобы не трогать рабочие данные
+DATA_DIR = os.getenv("BOT_DATA_DIR", BASE_DIR)
 
-PENDING_ORDERS_FILE = os.path.join(BASE_DIR, 'pending_orders.json')
-ORDER_NUMBER_FILE = os.path.join(BASE_DIR, 'order_number.json')
-ORDER_HISTORY_FILE = os.path.join(BASE_DIR, 'order_history.json')
\ No newline at end of file
+PENDING_ORDERS_FILE = os.path.join(DATA_DIR, 'pending_orders.json')
+ORDER_NUMBER_FILE = os.path.join(DATA_DIR, 'order_number.json')
+ORDER_HISTORY_FILE = os.path.join(DATA_DIR, 'order_history.json')  # Старый формат, переносится в сегменты
+ORDER_HISTORY_LOG_FILE = os.path.join(DATA_DIR, 'order_history.jsonl')  # Старый формат, переносится в сегменты
+ORDER_HISTORY_INDEX_FILE = os.path.join(DATA_DIR, 'order_history.idx')
+ORDER_HISTORY_DIR = os.path.join(DATA_DIR, 'order_history')  # Месячные сегменты истории заказов
+PENDING_ORDERS_JOURNAL_FILE = os.path.join(DATA_DIR, 'pending_orders.journal')
+FSM_STATES_FILE = os.path.join(DATA_DIR, 'fsm_states.json')  # Снимок FSM-состояний пользователей
+FSM_STATES_JOURNAL_FILE = os.path.join(DATA_DIR, 'fsm_states.journal')
+TRACE_FILE = os.path.join(DATA_DIR, 'traces.jsonl')  # Деревья участков обработки обновлений (ротируется)
+SLOW_UPDATES_FILE = os.path.join(DATA_DIR, 'slow_updates.log')  # Обновления дольше TRACE_SLOW_THRESHOLD
+LLM_USAGE_FILE = os.path.join(DATA_DIR, 'llm_usage.json')  # Расход токенов нейросети по дням и пользователям
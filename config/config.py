@@ -6,6 +6,7 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")  # для тестов — локальный мок
 
 CONVERSATIONS_FILE = "conversations.json"
 BOT_MIND_FILE = "bot_mind.json"
@@ -13,4 +14,89 @@ ORDER_NUMBER_FILE = "order_number.json"
 PENDING_ORDERS_FILE = "pending_orders.json"
 ORDER_HISTORY_FILE = "order_history.json"
 
-ADMIN_ID = 222467350
\ No newline at end of file
+ADMIN_ID = 222467350
+
+# Лимиты исходящих сообщений Telegram (services/send_scheduler.py)
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))  # сообщений в секунду на весь бот
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))  # сообщений в секунду в один личный чат
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "3"))  # сколько сообщений в чат можно отправить подряд
+SEND_GROUP_RATE_PER_MIN = float(os.getenv("SEND_GROUP_RATE_PER_MIN", "20"))  # сообщений в минуту в группу
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))  # повторов после TelegramRetryAfter
+
+# Доставка уведомлений о заказах из outbox (services/outbox_service.py)
+OUTBOX_BASE_DELAY = float(os.getenv("OUTBOX_BASE_DELAY", "2"))  # первая пауза перед повтором, с
+OUTBOX_MAX_DELAY = float(os.getenv("OUTBOX_MAX_DELAY", "300"))  # максимальная пауза перед повтором, с
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "30"))  # как часто проверять outbox без сигнала, с
+
+# Режим получения обновлений: "polling" (по умолчанию) или "webhook" (utils/webhook_server.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")  # внешний https-адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # секретный токен, который Telegram присылает в заголовке
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "127.0.0.1")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080"))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "10"))  # сколько ждать обработки принятых обновлений при остановке, с
+
+# FSM-хранилище на диске (storage/fsm_storage.py)
+FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", str(7 * 24 * 3600)))  # через сколько удалять брошенное состояние, с
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "1"))  # как часто дописывать изменения в журнал, с
+FSM_FLUSH_BATCH = int(os.getenv("FSM_FLUSH_BATCH", "256"))  # при стольких изменённых ключах запись не ждёт таймера
+
+# Очередь обновлений одного пользователя (middlewares/user_serialization.py)
+USER_QUEUE_LIMIT = int(os.getenv("USER_QUEUE_LIMIT", "5"))  # после скольких обновлений в очереди пользователя отбрасываются нажатия кнопок
+
+# Защита от повторных нажатий и повторной доставки (utils/idempotency.py)
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "60"))  # сколько помнить выполненное действие, с
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))  # сколько ключей хранить максимум
+
+# Ограничение частоты запросов пользователя (middlewares/throttling.py)
+THROTTLE_LLM_RATE_PER_MIN = float(os.getenv("THROTTLE_LLM_RATE_PER_MIN", "6"))  # ответов нейросети в минуту на пользователя
+THROTTLE_LLM_BURST = int(os.getenv("THROTTLE_LLM_BURST", "3"))  # сколько сообщений подряд без ожидания
+THROTTLE_SHOP_RATE = float(os.getenv("THROTTLE_SHOP_RATE", "2"))  # нажатий кнопок магазина в секунду на пользователя
+THROTTLE_SHOP_BURST = int(os.getenv("THROTTLE_SHOP_BURST", "10"))
+
+# Метрики в формате Prometheus (utils/metrics.py)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))  # 0 — не поднимать эндпоинт /metrics
+
+# Трассировка обновлений (utils/tracing.py)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0").lower() in ("1", "true", "yes")
+TRACE_SLOW_THRESHOLD = float(os.getenv("TRACE_SLOW_THRESHOLD", "2"))  # с какой длительности обновление попадает в журнал медленных, с
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(20 * 1024 * 1024)))  # размер файла трассировки до ротации
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", "5"))  # сколько старых файлов хранить
+
+# Логирование (utils/logging_setup.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", "")  # путь к ротируемому файлу лога; пусто — только консоль
+LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_FILE_BACKUPS = int(os.getenv("LOG_FILE_BACKUPS", "5"))
+
+# Запросы к нейросети (services/ai_service.py)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))  # сколько ждать ответа OpenRouter, с
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))  # повторов клиента при 429/5xx и обрывах соединения
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # одновременных запросов, остальные ждут в очереди
+
+# Профилирование по команде /profile (utils/profiler.py)
+PROFILE_DEFAULT_SECONDS = float(os.getenv("PROFILE_DEFAULT_SECONDS", "10"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+
+# Память: снимки tracemalloc по /memsnap (utils/memory.py) и контроль роста (services/memory_watchdog.py)
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "1"))  # глубина стека выделения в tracemalloc
+MEMORY_CHECK_INTERVAL = float(os.getenv("MEMORY_CHECK_INTERVAL", "60"))  # как часто замерять RSS и кэши, с; 0 — не замерять
+MEMORY_RSS_GROWTH_MB = float(os.getenv("MEMORY_RSS_GROWTH_MB", "200"))  # рост RSS от базы, при котором предупреждать
+MEMORY_RSS_LIMIT_MB = float(os.getenv("MEMORY_RSS_LIMIT_MB", "0"))  # абсолютный предел RSS; 0 — не проверять
+MEMORY_CACHE_GROWTH = float(os.getenv("MEMORY_CACHE_GROWTH", "2"))  # во сколько раз должен вырасти кэш
+MEMORY_CACHE_MIN_ENTRIES = int(os.getenv("MEMORY_CACHE_MIN_ENTRIES", "1000"))  # и хотя бы на сколько записей
+MEMORY_ALERT_COOLDOWN = float(os.getenv("MEMORY_ALERT_COOLDOWN", "3600"))  # не чаще одного предупреждения за столько секунд
+
+# Контроль цикла событий (utils/loop_monitor.py)
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "1").lower() in ("1", "true", "yes")
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))  # шаг пульса, с
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.1"))  # с какой блокировки снимать стек, с
+LOOP_LAG_WINDOW = int(os.getenv("LOOP_LAG_WINDOW", "600"))  # по скольким последним замерам считать перцентили
+
+# Учёт расхода нейросети (storage/llm_usage_storage.py, команда /llmstats)
+LLM_USAGE_KEEP_DAYS = int(os.getenv("LLM_USAGE_KEEP_DAYS", "30"))  # сколько дней хранить счётчики
+LLM_USAGE_FLUSH_INTERVAL = float(os.getenv("LLM_USAGE_FLUSH_INTERVAL", "60"))  # как часто сохранять на диск, с
+LLM_PRICE_PROMPT = float(os.getenv("LLM_PRICE_PROMPT", "0"))  # цена 1 млн токенов запроса, $ (у :free-моделей 0)
+LLM_PRICE_COMPLETION = float(os.getenv("LLM_PRICE_COMPLETION", "0"))  # цена 1 млн токенов ответа, $
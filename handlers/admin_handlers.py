@@ -0,0 +1,195 @@
+# handlers/admin_handlers.py
+from aiogram import Bot, Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile
+from services.analytics_service import load_sales, format_sales_report
+from storage.conversations_storage import get_user_info
+from storage.llm_usage_storage import llm_usage_store, CALLS, ERRORS, PROMPT, COMPLETION, LATENCY_MS
+from utils.idempotency import idempotency_store
+from utils.profiler import loop_profiler
+from utils.memory import allocation_tracker, format_size, peak_rss_bytes, rss_bytes
+from services.memory_watchdog import cache_sizes
+from middlewares.user_serialization import user_serialization
+from config.config import (
+    ADMIN_ID, LLM_PRICE_PROMPT, LLM_PRICE_COMPLETION, LLM_USAGE_KEEP_DAYS, PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS,
+)
+from datetime import date, datetime, timedelta
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+router = Router(name="admin")
+
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 3650  # история дольше десяти лет не нужна, а огромное число ломает timedelta
+LLMSTATS_DEFAULT_DAYS = 7
+LLMSTATS_TOP = 10
+
+# Фоновые задачи отправки отчётов (ссылки держим, чтобы задачи не собрал сборщик мусора)
+_report_tasks: set = set()
+
+
+def is_admin(msg: types.Message) -> bool:
+    return msg.from_user is not None and msg.from_user.id == ADMIN_ID
+
+
+@router.message(Command("stats"))
+async def stats_handler(msg: types.Message, command: CommandObject):
+    """/stats [дней] — отчёт о продажах за последние N дней (по умолчанию 30)."""
+    if not is_admin(msg):
+        return
+    try:
+        days = int(command.args) if command.args else STATS_DEFAULT_DAYS
+    except ValueError:
+        days = 0
+    if days < 1:
+        await msg.answer("Использование: /stats [количество дней]")
+        return
+    days = min(days, STATS_MAX_DAYS)
+
+    since = date.today() - timedelta(days=days - 1)
+    sales = await asyncio.to_thread(load_sales, since)
+    await msg.answer(format_sales_report(sales, f"Продажи за {days} дн. (с {since})"))
+    logger.info("Администратор запросил статистику продаж за %s дн.", days)
+
+
+@router.message(Command("duplicates"))
+async def duplicates_handler(msg: types.Message):
+    """/duplicates — сколько повторных нажатий и повторных доставок обработано без повторных действий."""
+    if not is_admin(msg):
+        return
+    stats = idempotency_store.stats()
+    lines = ["Повторы, обработанные из кэша (повторов / выполнено):"]
+    for name in sorted(set(stats["hits"]) | set(stats["misses"])):
+        lines.append(f"{name}: {stats['hits'].get(name, 0)} / {stats['misses'].get(name, 0)}")
+    if len(lines) == 1:
+        lines.append("пока нет")
+    queue = user_serialization.stats()
+    lines.append(f"\nСхлопнуто двойных нажатий в очереди: {queue['coalesced']}, отброшено при переполнении: {queue['dropped']}")
+    await msg.answer("\n".join(lines))
+
+
+def _llm_cost(counters: list) -> float:
+    return (counters[PROMPT] * LLM_PRICE_PROMPT + counters[COMPLETION] * LLM_PRICE_COMPLETION) / 1_000_000
+
+
+def _per_call(counters: list, index: int) -> float:
+    """Среднее на успешный запрос: у запросов с ошибкой токенов нет."""
+    succeeded = counters[CALLS] - counters[ERRORS]
+    return counters[index] / succeeded if succeeded else 0.0
+
+
+@router.message(Command("llmstats"))
+async def llmstats_handler(msg: types.Message, command: CommandObject):
+    """/llmstats [дней] — расход нейросети за последние N дней (по умолчанию 7): токены, время, главные потребители."""
+    if not is_admin(msg):
+        return
+    try:
+        days = int(command.args) if command.args else LLMSTATS_DEFAULT_DAYS
+    except ValueError:
+        days = 0
+    if days < 1:
+        await msg.answer("Использование: /llmstats [количество дней]")
+        return
+    days = min(days, LLM_USAGE_KEEP_DAYS)  # более старые дни хранилище уже отбросило
+
+    summary = llm_usage_store.summary(days, top=LLMSTATS_TOP)
+    total = summary["total"]
+    if not total[CALLS]:
+        await msg.answer(f"За {days} дн. запросов к нейросети не было.")
+        return
+    lines = [
+        f"Нейросеть за {days} дн.:",
+        f"запросов {total[CALLS]} (ошибок {total[ERRORS]}), пользователей {summary['users']}",
+        f"токены: запрос {total[PROMPT]}, ответ {total[COMPLETION]}, стоимость ${_llm_cost(total):.2f}",
+        f"в среднем на запрос: {_per_call(total, PROMPT):.0f} токенов запроса, "
+        f"{_per_call(total, COMPLETION):.0f} ответа, {_per_call(total, LATENCY_MS) / 1000:.1f} с",
+        "",
+        "По моделям:",
+    ]
+    for model, counters in sorted(summary["models"].items(), key=lambda item: item[1][CALLS], reverse=True):
+        lines.append(f"{model}: {counters[CALLS]} запросов, {counters[PROMPT]} + {counters[COMPLETION]} токенов, "
+                     f"{_per_call(counters, LATENCY_MS) / 1000:.1f} с на запрос")
+    lines += ["", "Больше всего токенов:"]
+    for place, (user_id, counters) in enumerate(summary["top"], start=1):
+        user_info = await get_user_info(user_id) if user_id != "None" else {}
+        name = user_info.get("full_name") or "—"
+        username = f" @{user_info['username']}" if user_info.get("username") else ""
+        lines.append(f"{place}. {name}{username} (ID {user_id}): {counters[CALLS]} запросов, "
+                     f"{counters[PROMPT] + counters[COMPLETION]} токенов, "
+                     f"в среднем {_per_call(counters, PROMPT):.0f} токенов запроса")
+    await msg.answer("\n".join(lines))
+    logger.info("Администратор запросил статистику нейросети за %s дн.", days)
+
+
+async def _send_profile(bot: Bot, chat_id: int, task: asyncio.Task) -> None:
+    try:
+        result = await task
+    except Exception as e:
+        logger.error("Ошибка профилирования: %s", e)
+        await bot.send_message(chat_id, f"Профилирование не удалось: {e}")
+        return
+    await bot.send_message(chat_id, result.summary()[:4000])
+    filename = f"profile-{datetime.now():%Y%m%d-%H%M%S}.prof"
+    await bot.send_document(chat_id, BufferedInputFile(result.dump(), filename=filename),
+                            caption="Открыть: python -m pstats, snakeviz")
+
+
+@router.message(Command("profile"))
+async def profile_handler(msg: types.Message, command: CommandObject):
+    """/profile [секунд] — профилирует бота N секунд (по умолчанию 10) и присылает отчёт и .prof-файл."""
+    if not is_admin(msg):
+        return
+    try:
+        seconds = float(command.args) if command.args else PROFILE_DEFAULT_SECONDS
+    except ValueError:
+        await msg.answer("Использование: /profile [секунд]")
+        return
+    seconds = min(max(seconds, 1), PROFILE_MAX_SECONDS)
+    try:
+        task = loop_profiler.start(seconds)
+    except RuntimeError:
+        await msg.answer("Профилирование уже идёт, дождитесь отчёта.")
+        return
+    # Отчёт отправит фоновая задача: очередь обновлений администратора не ждёт окончания окна
+    report = asyncio.create_task(_send_profile(msg.bot, msg.chat.id, task), name="profile-report")
+    _report_tasks.add(report)
+    report.add_done_callback(_report_tasks.discard)
+    await msg.answer(f"Профилирование включено на {seconds:g} с, отчёт придёт следом.")
+    logger.info("Администратор запустил профилирование на %s с", seconds)
+
+
+@router.message(Command("memory"))
+async def memory_handler(msg: types.Message):
+    """/memory — RSS процесса и размеры кэшей, которые растут с числом пользователей."""
+    if not is_admin(msg):
+        return
+    lines = [f"RSS: {format_size(rss_bytes())} (пик {format_size(peak_rss_bytes())})", "", "Кэши:"]
+    lines += [f"{name}: {size}" for name, size in cache_sizes().items()]
+    lines.append("")
+    lines.append("tracemalloc включён, /memsnap — снимок и разница" if allocation_tracker.tracing
+                 else "tracemalloc выключен, /memsnap включит его")
+    await msg.answer("\n".join(lines))
+
+
+@router.message(Command("memsnap"))
+async def memsnap_handler(msg: types.Message, command: CommandObject):
+    """
+    /memsnap — первый вызов включает tracemalloc, следующие присылают главные места выделения
+    памяти и рост с прошлого снимка. /memsnap stop — выключить tracemalloc.
+    """
+    if not is_admin(msg):
+        return
+    if (command.args or "").strip() == "stop":
+        if allocation_tracker.tracing:
+            allocation_tracker.stop()
+        await msg.answer("tracemalloc выключен.")
+        return
+    if not allocation_tracker.tracing:
+        allocation_tracker.start()
+        await msg.answer("tracemalloc включён: выделения учитываются с этого момента. "
+                         "Повторите /memsnap через некоторое время, /memsnap stop — выключить.")
+        return
+    report = await asyncio.to_thread(allocation_tracker.snapshot_report)
+    await msg.answer(report[:4000])
+    logger.info("Администратор снял снимок памяти")
@@ -1,16 +1,23 @@
-from aiogram import Router, types, F
+from aiogram import Router, types
 from aiogram.filters import Command
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from services.cart_service import get_user_cart, add_to_cart, clear_cart
 from utils.keyboard_utils import get_coffee_catalog_keyboard, get_coffee_detail_keyboard
 from utils.utils import format_cart
+from utils.navigation import show_screen
+from utils.callback_data import CallbackRouter
+from utils.idempotency import idempotent
+from models.callbacks import (
+    AddToCart, BackToDetails, BackToShop, Checkout, ClearCart, CoffeeCatalog, CoffeeDetails, SelectWeight, ViewCart,
+)
 import json
 import logging
 import os
 
 logger = logging.getLogger(__name__)
-router = Router()
+router = Router(name="coffee")
+callbacks = CallbackRouter(router, flags={"throttle": "shop"})
 
 # Определяем путь к JSON файлу
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -25,11 +32,11 @@ async def coffeeshop_handler(msg: types.Message):
         "Добро пожаловать в кофейный магазин!\nВыберите кофе из каталога:",
         reply_markup=get_coffee_catalog_keyboard(coffee_list)
     )
-    logger.info(f"Пользователь {msg.from_user.id} открыл каталог кофе")
+    logger.info("Пользователь %s открыл каталог кофе", msg.from_user.id)
 
-@router.callback_query(lambda c: c.data.startswith("coffee_") and c.data.split("_")[1].isdigit())
-async def process_coffee_selection(callback: CallbackQuery):
-    coffee_index = int(callback.data.split("_")[1])
+@callbacks(CoffeeDetails)
+async def process_coffee_selection(callback: CallbackQuery, callback_data: CoffeeDetails):
+    coffee_index = callback_data.coffee_index
     with open("bot_mind.json", 'r', encoding='utf-8') as f:
         data = json.load(f)
         coffee_list = data.get("coffee_shop", [])
@@ -48,21 +55,19 @@ async def process_coffee_selection(callback: CallbackQuery):
         f"(в наличии: {coffee['quantity_1000g']})"
     )
     
-    await callback.bot.send_photo(
-        chat_id=callback.message.chat.id,
+    await show_screen(
+        callback,
+        coffee_info,
         photo=coffee["image_url"],
-        caption=coffee_info,
         parse_mode="Markdown",
         reply_markup=get_coffee_detail_keyboard(coffee_index)
     )
-    await callback.message.delete()
     await callback.answer()
 
-@router.callback_query(lambda c: c.data.startswith("weight_"))
-async def process_weight_selection(callback: CallbackQuery):
-    parts = callback.data.split("_")
-    coffee_index = int(parts[1])
-    weight = parts[2]
+@callbacks(SelectWeight)
+async def process_weight_selection(callback: CallbackQuery, callback_data: SelectWeight):
+    coffee_index = callback_data.coffee_index
+    weight = callback_data.weight
     
     with open("bot_mind.json", 'r', encoding='utf-8') as f:
         data = json.load(f)
@@ -77,14 +82,14 @@ async def process_weight_selection(callback: CallbackQuery):
     price = coffee.get(price_key)
     
     if price is None:
-        await callback.bot.send_message(
-            chat_id=callback.message.chat.id,
-            text="Нет в наличии",
+        await show_screen(
+            callback,
+            "Нет в наличии",
+            keep_photo=True,
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="Назад к кофе", callback_data=f"coffee_{coffee_index}")]
+                [InlineKeyboardButton(text="Назад к кофе", callback_data=CoffeeDetails(coffee_index).pack())]
             ])
         )
-        await callback.message.delete()
         await callback.answer()
         return
     
@@ -95,24 +100,23 @@ async def process_weight_selection(callback: CallbackQuery):
     
     confirm_keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="Подтверждаю", callback_data=f"add_to_cart_{coffee_index}_{weight}"),
-            InlineKeyboardButton(text="Отмена", callback_data=f"back_to_details_{coffee_index}")
+            InlineKeyboardButton(text="Подтверждаю", callback_data=AddToCart(coffee_index, weight).pack()),
+            InlineKeyboardButton(text="Отмена", callback_data=BackToDetails(coffee_index).pack())
         ]
     ])
     
-    await callback.bot.send_message(
-        chat_id=callback.message.chat.id,
-        text=confirmation,
+    await show_screen(
+        callback,
+        confirmation,
+        keep_photo=True,  # Фото выбранного кофе остаётся, меняется только подпись
         parse_mode="Markdown",
         reply_markup=confirm_keyboard
     )
-    await callback.message.delete()
     await callback.answer()
 
-@router.callback_query(lambda c: c.data.startswith("back_to_details_") and len(c.data.split("_")) > 3 and c.data.split("_")[3].isdigit())
-async def back_to_coffee_details(callback: CallbackQuery):
-    parts = callback.data.split("_")
-    coffee_index = int(parts[3])
+@callbacks(BackToDetails)
+async def back_to_coffee_details(callback: CallbackQuery, callback_data: BackToDetails):
+    coffee_index = callback_data.coffee_index
     
     with open("bot_mind.json", 'r', encoding='utf-8') as f:
         data = json.load(f)
@@ -132,21 +136,20 @@ async def back_to_coffee_details(callback: CallbackQuery):
         f"(в наличии: {coffee['quantity_1000g']})"
     )
     
-    await callback.bot.send_photo(
-        chat_id=callback.message.chat.id,
+    await show_screen(
+        callback,
+        coffee_info,
         photo=coffee["image_url"],
-        caption=coffee_info,
         parse_mode="Markdown",
         reply_markup=get_coffee_detail_keyboard(coffee_index)
     )
-    await callback.message.delete()
     await callback.answer()
 
-@router.callback_query(lambda c: c.data.startswith("add_to_cart_"))
-async def add_to_cart_handler(callback: CallbackQuery):
-    parts = callback.data.split("_")
-    coffee_index = int(parts[3])
-    weight = parts[4]
+@callbacks(AddToCart)
+@idempotent
+async def add_to_cart_handler(callback: CallbackQuery, callback_data: AddToCart):
+    coffee_index = callback_data.coffee_index
+    weight = callback_data.weight
     user_id = callback.from_user.id
     
     try:
@@ -157,26 +160,25 @@ async def add_to_cart_handler(callback: CallbackQuery):
             coffee = coffee_list[coffee_index]
             quantity_key = f"quantity_{weight}g"
         
-        await callback.bot.send_message(
-            chat_id=callback.message.chat.id,
-            text=f"*{coffee['name']}* ({weight}г) добавлено в корзину!\nОсталось: {coffee[quantity_key] - 1}",
+        await show_screen(
+            callback,
+            f"*{coffee['name']}* ({weight}г) добавлено в корзину!\nОсталось: {coffee[quantity_key] - 1}",
+            keep_photo=True,
             parse_mode="Markdown",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="В корзину", callback_data="view_cart")],
-                [InlineKeyboardButton(text="Продолжить покупку", callback_data=f"back_to_details_{coffee_index}")]
+                [InlineKeyboardButton(text="В корзину", callback_data=ViewCart().pack())],
+                [InlineKeyboardButton(text="Продолжить покупку", callback_data=BackToDetails(coffee_index).pack())]
             ])
         )
-        await callback.message.delete()
         await callback.answer()
     except ValueError as e:
-        await callback.bot.send_message(callback.message.chat.id, str(e))
-        await callback.message.delete()
+        await show_screen(callback, str(e), keep_photo=True)
     except Exception as e:
-        logger.error(f"Ошибка при добавлении в корзину: {e}")
+        logger.error("Ошибка при добавлении в корзину: %s", e)
         await callback.bot.send_message(callback.message.chat.id, "Ошибка при добавлении в корзину!")
 
 # handlers/coffee_handlers.py (фрагмент view_cart)
-@router.callback_query(F.data == "view_cart")
+@callbacks(ViewCart)
 async def view_cart(callback: CallbackQuery):
     user_id = callback.from_user.id
     cart = await get_user_cart(user_id)  # Теперь возвращает список словарей
@@ -184,71 +186,54 @@ async def view_cart(callback: CallbackQuery):
     cart_text = format_cart(cart)
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="Оформить покупку", callback_data="checkout"),
-            InlineKeyboardButton(text="Очистить корзину", callback_data="clear_cart")
+            InlineKeyboardButton(text="Оформить покупку", callback_data=Checkout().pack()),
+            InlineKeyboardButton(text="Очистить корзину", callback_data=ClearCart().pack())
         ],
         [
-            InlineKeyboardButton(text="Назад к каталогу", callback_data="coffee_catalog")
+            InlineKeyboardButton(text="Назад к каталогу", callback_data=CoffeeCatalog().pack())
         ]
     ])
     
-    await callback.bot.send_message(
-        chat_id=callback.message.chat.id,
-        text=cart_text,
-        parse_mode="Markdown",
-        reply_markup=keyboard
-    )
-    await callback.message.delete()
+    await show_screen(callback, cart_text, parse_mode="Markdown", reply_markup=keyboard)
     await callback.answer()
 
-@router.callback_query(F.data == "coffee_catalog")
+@callbacks(CoffeeCatalog)
 async def back_to_catalog(callback: CallbackQuery):
     with open("bot_mind.json", 'r', encoding='utf-8') as f:
         coffee_list = json.load(f).get("coffee_shop", [])
     
-    await callback.message.delete()
-    await callback.bot.send_message(
-        chat_id=callback.message.chat.id,
-        text="Выберите кофе из каталога:",
-        reply_markup=get_coffee_catalog_keyboard(coffee_list)
-    )
+    await show_screen(callback, "Выберите кофе из каталога:", reply_markup=get_coffee_catalog_keyboard(coffee_list))
     await callback.answer()
-    logger.info(f"Пользователь {callback.from_user.id} вернулся к каталогу")
+    logger.info("Пользователь %s вернулся к каталогу", callback.from_user.id)
 
-@router.callback_query(F.data == "clear_cart")
+@callbacks(ClearCart)
 async def clear_cart_handler(callback: CallbackQuery):
     user_id = callback.from_user.id
     cart = await get_user_cart(user_id)
     if not cart:
-        await callback.bot.send_message(
-            chat_id=callback.message.chat.id,
-            text="Корзина уже пуста!",
+        await show_screen(
+            callback,
+            "Корзина уже пуста!",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="Назад к каталогу", callback_data="coffee_catalog")]
+                [InlineKeyboardButton(text="Назад к каталогу", callback_data=CoffeeCatalog().pack())]
             ])
         )
     else:
         await clear_cart(user_id, restore_quantity=True)
-        await callback.bot.send_message(
-            chat_id=callback.message.chat.id,
-            text="Корзина очищена, товары возвращены в наличие!",
+        await show_screen(
+            callback,
+            "Корзина очищена, товары возвращены в наличие!",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="Назад к каталогу", callback_data="coffee_catalog")]
+                [InlineKeyboardButton(text="Назад к каталогу", callback_data=CoffeeCatalog().pack())]
             ])
         )
-    await callback.message.delete()
     await callback.answer()
 
-@router.callback_query(F.data == "back_to_shop_from_order")
+@callbacks(BackToShop)
 async def back_to_shop_from_order(callback: CallbackQuery):
     with open("bot_mind.json", 'r', encoding='utf-8') as f:
         coffee_list = json.load(f).get("coffee_shop", [])
     
-    await callback.message.delete()
-    await callback.bot.send_message(
-        chat_id=callback.message.chat.id,
-        text="Выберите кофе из каталога:",
-        reply_markup=get_coffee_catalog_keyboard(coffee_list)
-    )
+    await show_screen(callback, "Выберите кофе из каталога:", reply_markup=get_coffee_catalog_keyboard(coffee_list))
     await callback.answer()
-    logger.info(f"Пользователь {callback.from_user.id} вернулся к каталогу из заказа")    
\ No newline at end of file
+    logger.info("Пользователь %s вернулся к каталогу из заказа", callback.from_user.id)    
\ No newline at end of file
@@ -1,33 +1,37 @@
-from aiogram import Router, types, F
+from aiogram import Router, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
 from services.order_service import create_pickup_order, create_europochta_order, issue_order
 from services.cart_service import get_user_cart, clear_cart
 from utils.utils import format_cart
+from utils.navigation import show_screen
+from utils.callback_data import CallbackRouter
+from utils.idempotency import idempotent
+from models.callbacks import CancelIssue, Checkout, CoffeeCatalog, ConfirmIssue, EuropochtaSend, IssueOrder, PickupCash, ViewCart
 from states.states import OrderStates
 
-router = Router()
+router = Router(name="order")
+callbacks = CallbackRouter(router, flags={"throttle": "shop"})
 
 class OrderStatesGroup(StatesGroup):
     waiting_for_comment = State()
     waiting_for_recipient_name = State()
     waiting_for_post_office_number = State()
 
-@router.callback_query(F.data == "checkout")
+@callbacks(Checkout)
 async def checkout_handler(callback: CallbackQuery):
     user_id = callback.from_user.id
     cart = await get_user_cart(user_id)
     
     if not cart:
-        await callback.bot.send_message(
-            chat_id=callback.message.chat.id,
-            text="Ваша корзина пуста!",
+        await show_screen(
+            callback,
+            "Ваша корзина пуста!",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="Назад к каталогу", callback_data="coffee_catalog")]
+                [InlineKeyboardButton(text="Назад к каталогу", callback_data=CoffeeCatalog().pack())]
             ])
         )
-        await callback.message.delete()
         await callback.answer()
         return
     
@@ -43,31 +47,24 @@ async def checkout_handler(callback: CallbackQuery):
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="Самовывоз", callback_data="pickup_cash"),
-            InlineKeyboardButton(text="Европочта", callback_data="europochta_send")
+            InlineKeyboardButton(text="Самовывоз", callback_data=PickupCash().pack()),
+            InlineKeyboardButton(text="Европочта", callback_data=EuropochtaSend().pack())
         ],
         [
-            InlineKeyboardButton(text="Назад к корзине", callback_data="view_cart")
+            InlineKeyboardButton(text="Назад к корзине", callback_data=ViewCart().pack())
         ]
     ])
     
-    await callback.bot.send_message(
-        chat_id=callback.message.chat.id,
-        text=checkout_text,
-        parse_mode="Markdown",
-        reply_markup=keyboard
-    )
-    await callback.message.delete()
+    await show_screen(callback, checkout_text, parse_mode="Markdown", reply_markup=keyboard)
     await callback.answer()
 
-@router.callback_query(F.data == "pickup_cash")
+@callbacks(PickupCash)
 async def pickup_cash_handler(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
     cart = await get_user_cart(user_id)
     
     if not cart:
-        await callback.bot.send_message(callback.message.chat.id, "Ваша корзина пуста!")
-        await callback.message.delete()
+        await show_screen(callback, "Ваша корзина пуста!")
         await callback.answer()
         return
     
@@ -81,18 +78,14 @@ async def pickup_cash_handler(callback: CallbackQuery, state: FSMContext):
         f"или напишите 'нет', если комментарий не нужен:"
     )
     
-    await callback.bot.send_message(
-        chat_id=callback.message.chat.id,
-        text=order_text,
-        parse_mode="Markdown"
-    )
+    await show_screen(callback, order_text, parse_mode="Markdown")
     
     await state.update_data(cart=cart, total=total, user_id=user_id)
     await state.set_state(OrderStatesGroup.waiting_for_comment)
-    await callback.message.delete()
     await callback.answer()
 
 @router.message(OrderStatesGroup.waiting_for_comment)
+@idempotent
 async def process_order_comment(message: Message, state: FSMContext):
     user_id = message.from_user.id
     comment = message.text.strip()
@@ -104,29 +97,24 @@ async def process_order_comment(message: Message, state: FSMContext):
     order_number = await create_pickup_order(user_id, message.bot, comment, cart, total)
     await state.clear()
 
-@router.callback_query(F.data == "europochta_send")
+@callbacks(EuropochtaSend)
 async def europochta_send_handler(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
     cart = await get_user_cart(user_id)
     
     if not cart:
-        await callback.bot.send_message(
-            chat_id=callback.message.chat.id,
-            text="Ваша корзина пуста!",
+        await show_screen(
+            callback,
+            "Ваша корзина пуста!",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="Назад к каталогу", callback_data="coffee_catalog")]
+                [InlineKeyboardButton(text="Назад к каталогу", callback_data=CoffeeCatalog().pack())]
             ])
         )
-        await callback.message.delete()
         await callback.answer()
         return
     
-    await callback.bot.send_message(
-        chat_id=callback.message.chat.id,
-        text="Введите имя и фамилию получателя:"
-    )
+    await show_screen(callback, "Введите имя и фамилию получателя:")
     await state.set_state(OrderStatesGroup.waiting_for_recipient_name)
-    await callback.message.delete()
     await callback.answer()
 
 @router.message(OrderStatesGroup.waiting_for_recipient_name)
@@ -137,6 +125,7 @@ async def process_recipient_name(message: Message, state: FSMContext):
     await state.set_state(OrderStatesGroup.waiting_for_post_office_number)
 
 @router.message(OrderStatesGroup.waiting_for_post_office_number)
+@idempotent
 async def process_post_office_number(message: Message, state: FSMContext):
     user_input = message.text.strip()
     data = await state.get_data()
@@ -156,13 +145,13 @@ async def process_post_office_number(message: Message, state: FSMContext):
     order_number = await create_europochta_order(user_id, message.bot, recipient_name, address, post_office_number, cart, total)
     await state.clear()
 
-@router.callback_query(F.data.startswith("issue_order_"))
-async def confirm_issue_order(callback: CallbackQuery):
-    order_number = callback.data.split("_")[2]
+@callbacks(IssueOrder)
+async def confirm_issue_order(callback: CallbackQuery, callback_data: IssueOrder):
+    order_number = callback_data.order_number
     confirm_text = f"Вы уверены, что хотите подтвердить выдачу заказа №{order_number}?"
     confirm_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="Подтвердить", callback_data=f"confirm_issue_{order_number}")],
-        [InlineKeyboardButton(text="Отмена", callback_data="cancel_issue")]
+        [InlineKeyboardButton(text="Подтвердить", callback_data=ConfirmIssue(order_number).pack())],
+        [InlineKeyboardButton(text="Отмена", callback_data=CancelIssue().pack())]
     ])
     await callback.bot.send_message(
         chat_id=callback.from_user.id,
@@ -171,13 +160,14 @@ async def confirm_issue_order(callback: CallbackQuery):
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("confirm_issue_"))
-async def issue_order_confirmed(callback: CallbackQuery):
-    order_number = callback.data.split("_")[2]
+@callbacks(ConfirmIssue)
+@idempotent
+async def issue_order_confirmed(callback: CallbackQuery, callback_data: ConfirmIssue):
+    order_number = callback_data.order_number
     await issue_order(order_number, callback.bot)
     await callback.answer()
 
-@router.callback_query(F.data == "cancel_issue")
+@callbacks(CancelIssue)
 async def cancel_issue(callback: CallbackQuery):
     await callback.bot.send_message(
         chat_id=callback.from_user.id,
@@ -6,7 +6,7 @@ from storage.conversations_storage import get_conversation, update_chat_history
 import logging
 
 logger = logging.getLogger(__name__)
-router = Router()
+router = Router(name="user")
 
 @router.message(Command("start"))
 async def start_handler(msg: types.Message):
@@ -19,9 +19,9 @@ async def start_handler(msg: types.Message):
     await msg.answer(welcome_text)
     if str(user.id) not in (await get_conversation(user.id)):
         await update_chat_history(user.id, "", "user")  # Инициализация пустой истории
-    logger.info(f"Пользователь {user.id} начал работу с ботом")
+    logger.info("Пользователь %s начал работу с ботом", user.id)
 
-@router.message(F.text, ~F.text.startswith('/'))  # Игнорируем команды, начинающиеся с "/"
+@router.message(F.text, ~F.text.startswith('/'), flags={"throttle": "llm"})  # Игнорируем команды, начинающиеся с "/"
 async def message_handler(msg: types.Message):
     user_id = msg.from_user.id
     user_message = msg.text
@@ -30,7 +30,7 @@ async def message_handler(msg: types.Message):
     
     conversation = await get_conversation(user_id)
     messages = conversation.get("messages", [])
-    ai_response = await get_ai_response([{"role": m["role"], "content": m["message"]} for m in messages[-20:]])
+    ai_response = await get_ai_response([{"role": m["role"], "content": m["message"]} for m in messages[-20:]], user_id)
     await update_chat_history(user_id, ai_response, "assistant")
     await msg.answer(ai_response)
-    logger.info(f"Ответ отправлен пользователю {user_id}")
\ No newline at end of file
+    logger.info("Ответ отправлен пользователю %s", user_id)
\ No newline at end of file
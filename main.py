@@ -1,40 +1,133 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from config.config import BOT_TOKEN
+from config.config import BOT_TOKEN, BOT_MODE, LOOP_MONITOR_ENABLED
 from storage.conversations_storage import load_conversations_to_cache
+from storage.pending_orders_storage import load_pending_orders_to_cache
+from storage.order_history_storage import load_order_history_index
+from storage.fsm_storage import fsm_storage, load_fsm_states
+from storage.llm_usage_storage import llm_usage_store
+from services.order_pipeline import order_pipeline
+from services.outbox_service import outbox_worker
+from services.memory_watchdog import memory_watchdog
+from services.send_scheduler import send_scheduler, PriorityMiddleware, Priority
 from utils.utils import periodic_save
+from utils.webhook_server import WebhookServer, check_webhook_config
+from utils.logging_setup import setup_logging, shutdown_logging
+from utils.loop_monitor import loop_monitor
+from utils.metrics import MetricsServer
+from services.metrics_service import register_bot_collectors
+from middlewares.metrics import handler_metrics, telegram_metrics
+from middlewares.tracing import tracing
+from utils.tracing import tracer
+from middlewares.user_profile import UserProfileMiddleware
+from middlewares.user_serialization import user_serialization
+from middlewares.throttling import ThrottlingMiddleware, throttling
 from handlers.user_handlers import router as user_router
 from handlers.coffee_handlers import router as coffee_router
 from handlers.order_handlers import router as order_router
+from handlers.admin_handlers import router as admin_router
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def setup_session(bot: Bot) -> None:
+    """Middleware исходящих запросов бота."""
+    bot.session.middleware(send_scheduler)  # Все отправки идут через планировщик с лимитами Telegram
+    bot.session.middleware(telegram_metrics)  # Чистое время запроса к Bot API, без ожидания в планировщике
+
+
+def create_dispatcher(throttle: ThrottlingMiddleware = throttling) -> Dispatcher:
+    """Диспетчер со всеми middleware и роутерами бота (им же пользуются бенчмарки)."""
+    dp = Dispatcher(storage=fsm_storage)  # Состояния оформления заказа переживают перезапуск
+    dp.update.outer_middleware(tracing)  # Корневой участок трассировки, включая ожидание в очереди пользователя
+    dp.update.outer_middleware(UserProfileMiddleware())  # Профиль пользователя из каждого обновления
+    dp.update.outer_middleware(user_serialization)  # Обновления одного пользователя — по очереди
+
+    # Оформление заказов и админские сообщения обгоняют просмотр каталога
+    for router, priority in ((coffee_router, Priority.LOW), (order_router, Priority.HIGH), (admin_router, Priority.HIGH)):
+        router.message.middleware(PriorityMiddleware(priority))
+        router.callback_query.middleware(PriorityMiddleware(priority))
+
+    # Лимиты частоты: ответы нейросети и кнопки магазина (бюджет задаётся флагом хендлера)
+    user_router.message.middleware(throttle)
+    for router in (coffee_router, order_router):
+        router.callback_query.middleware(throttle)
+
+    # Время хендлеров всех роутеров
+    dp.message.middleware(handler_metrics)
+    dp.callback_query.middleware(handler_metrics)
+
+    # Подключаем роутеры
+    dp.include_router(coffee_router)  # Подключаем coffee_router раньше, чтобы обработать специфические callback
+    dp.include_router(order_router)
+    dp.include_router(admin_router)
+    dp.include_router(user_router)  # Подключаем user_router последним, чтобы обработать об
+    return dp
+
+
 async def main():
+    if BOT_MODE == "webhook":
+        try:
+            check_webhook_config()
+        except ValueError as e:
+            logger.error("Бот не запущен в режиме вебхука: %s", e)
+            return
+    metrics_server = MetricsServer()
+    # Контроль цикла событий — с самого начала, чтобы видеть и блокировки при загрузке кэшей
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
     try:
         # Инициализация бота
         bot = Bot(token=BOT_TOKEN)
-        dp = Dispatcher()
-
-        # Подключаем роутеры
-        dp.include_router(coffee_router)  # Подключаем coffee_router раньше, чтобы обработать специфические callback
-        dp.include_router(order_router)
-        dp.include_router(user_router)  # Подключаем user_router последним, чтобы обработать об
+        setup_session(bot)
+        tracer.setup()
+        dp = create_dispatcher()
 
         # Загружаем кэш
         await load_conversations_to_cache()
+        await load_pending_orders_to_cache()
+        await load_order_history_index()
+        await load_fsm_states()
+        await llm_usage_store.load()
+
+        # Запускаем единственного писателя заказов
+        await order_pipeline.start()
+
+        # Уведомления о заказах доставляются в фоне из outbox
+        order_pipeline.add_commit_listener(outbox_worker.wake)
+        outbox_worker.start(bot)
+
+        # Контроль роста RSS и кэшей с предупреждением администратору
+        memory_watchdog.start(bot)
+
+        # Эндпоинт /metrics для Prometheus
+        register_bot_collectors()
+        await metrics_server.start()
 
         # Запускаем периодическое сохранение
         asyncio.create_task(periodic_save())
 
         # Запускаем бота
-        logger.info("Бот запущен")
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            logger.info("Бот запущен в режиме вебхука")
+            await WebhookServer(dp, bot).serve()
+        else:
+            logger.info("Бот запущен")
+            await dp.start_polling(bot)
     except Exception as e:
-        logger.error(f"Ошибка в main: {e}")
+        logger.error("Ошибка в main: %s", e)
     finally:
+        await order_pipeline.stop()
+        await outbox_worker.stop()
+        await memory_watchdog.stop()
+        await llm_usage_store.close()
+        await metrics_server.stop()
+        await loop_monitor.stop()
         await bot.session.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    setup_logging()  # Запись логов в фоновом потоке, до запуска цикла событий
+    try:
+        asyncio.run(main())
+    finally:
+        shutdown_logging()
\ No newline at end of file
@@ -0,0 +1,82 @@
+# middlewares/metrics.py
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject
+from utils.callback_data import CallbackRouter
+from utils.metrics import registry
+from utils.tracing import tracer
+
+HANDLER_LATENCY = registry.histogram(
+    "bot_handler_seconds", "Время обработки обновления хендлером", ("router", "handler"),
+)
+HANDLER_ERRORS = registry.counter(
+    "bot_handler_errors_total", "Хендлеры, завершившиеся исключением", ("router", "handler"),
+)
+TELEGRAM_LATENCY = registry.histogram(
+    "bot_telegram_request_seconds", "Время запроса к Bot API (без ожидания в планировщике отправок)", ("method",),
+)
+TELEGRAM_ERRORS = registry.counter(
+    "bot_telegram_errors_total", "Запросы к Bot API, завершившиеся ошибкой", ("method", "error"),
+)
+
+
+def handler_name(data: Dict[str, Any]) -> str:
+    """Имя функции-хендлера; для кнопок — конкретный хендлер схемы, а не общий диспетчер CallbackRouter."""
+    handler: HandlerObject = data.get("handler")
+    if handler is None:
+        return "unknown"
+    callback = handler.callback
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, CallbackRouter) and "callback_data" in data:
+        return owner.handler_name(data["callback_data"])
+    return getattr(callback, "__name__", type(callback).__name__)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Гистограмма времени хендлеров с метками router и handler. Регистрируется как внутренний
+    middleware диспетчера — aiogram применяет его к хендлерам всех вложенных роутеров.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        router = data.get("event_router")
+        labels = {"router": router.name if router is not None else "unknown", "handler": handler_name(data)}
+        started = time.perf_counter()
+        try:
+            with tracer.span("handler", **labels):
+                return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(**labels)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, **labels)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Время и ошибки запросов к Bot API по методам (middleware сессии бота)."""
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot, method):
+        api_method = method.__api_method__
+        started = time.perf_counter()
+        try:
+            with tracer.span(f"bot_api.{api_method}"):
+                return await make_request(bot, method)
+        except TelegramAPIError as e:
+            TELEGRAM_ERRORS.inc(method=api_method, error=type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_LATENCY.observe(time.perf_counter() - started, method=api_method)
+
+
+handler_metrics = HandlerMetricsMiddleware()
+telegram_metrics = TelegramMetricsMiddleware()
@@ -0,0 +1,115 @@
+# middlewares/throttling.py
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject, User
+from config.config import (
+    ADMIN_ID, THROTTLE_LLM_RATE_PER_MIN, THROTTLE_LLM_BURST, THROTTLE_SHOP_RATE, THROTTLE_SHOP_BURST,
+)
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# При таком числе корзин пользователей неиспользуемые удаляются
+USER_BUCKETS_PRUNE_AT = 10000
+
+# Бюджеты: имя -> (маркеров в секунду, запас)
+DEFAULT_BUDGETS: Dict[str, Tuple[float, float]] = {
+    "llm": (THROTTLE_LLM_RATE_PER_MIN / 60, THROTTLE_LLM_BURST),  # ответы нейросети
+    "shop": (THROTTLE_SHOP_RATE, THROTTLE_SHOP_BURST),  # кнопки магазина и оформления заказа
+}
+
+NOTICES = {
+    "llm": "Вы пишете слишком часто 🙂 Подождите немного — я отвечу на следующие сообщения чуть позже.",
+    "shop": "Слишком много нажатий, подождите пару секунд.",
+}
+
+
+class _BudgetStats:
+    __slots__ = ("allowed", "throttled", "notices")
+
+    def __init__(self):
+        self.allowed = 0
+        self.throttled = 0
+        self.notices = 0
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничение частоты для отдельных бюджетов. Хендлер попадает в бюджет флагом
+    flags={"throttle": "llm"}; без флага обновление проходит без ограничений.
+    У каждого пользователя своя маркерная корзина на бюджет. Превысившему лимит
+    один раз за эпизод отправляется вежливое уведомление, остальное молча отбрасывается,
+    пока в корзине снова не появятся маркеры.
+    """
+
+    def __init__(self, budgets: Dict[str, Tuple[float, float]] = None, exempt: Tuple[int, ...] = (ADMIN_ID,)):
+        self.budgets = budgets or DEFAULT_BUDGETS
+        self.exempt = set(exempt)
+        self._buckets: Dict[str, Dict[int, TokenBucket]] = {name: {} for name in self.budgets}
+        self._notified: Dict[str, set] = {name: set() for name in self.budgets}
+        self._stats: Dict[str, _BudgetStats] = {name: _BudgetStats() for name in self.budgets}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        budget = get_flag(data, "throttle")
+        user: User = data.get("event_from_user")
+        if budget not in self.budgets or user is None or user.id in self.exempt:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        buckets = self._buckets[budget]
+        bucket = buckets.get(user.id)
+        if bucket is None:
+            if len(buckets) >= USER_BUCKETS_PRUNE_AT:
+                self._prune(budget, now)
+            rate, burst = self.budgets[budget]
+            bucket = buckets[user.id] = TokenBucket(rate, burst, now)
+
+        stats = self._stats[budget]
+        if bucket.try_take(now):
+            stats.allowed += 1
+            self._notified[budget].discard(user.id)
+            return await handler(event, data)
+
+        stats.throttled += 1
+        first_in_episode = user.id not in self._notified[budget]
+        if first_in_episode:
+            self._notified[budget].add(user.id)
+            stats.notices += 1
+            logger.info("Пользователь %s превысил лимит «%s»", user.id, budget)
+        await self._reject(event, NOTICES.get(budget, NOTICES["shop"]) if first_in_episode else None)
+        return None
+
+    @staticmethod
+    async def _reject(event: TelegramObject, notice: str = None) -> None:
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer(notice)  # ответ нужен всегда, иначе на кнопке останутся «часики»
+            elif isinstance(event, Message) and notice:
+                await event.answer(notice)
+        except Exception as e:
+            logger.debug("Не удалось уведомить о превышении лимита: %s", e)
+
+    def _prune(self, budget: str, now: float) -> None:
+        buckets = self._buckets[budget]
+        for user_id in [user_id for user_id, bucket in buckets.items() if bucket.idle(now)]:
+            del buckets[user_id]
+            self._notified[budget].discard(user_id)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"allowed": stats.allowed, "throttled": stats.throttled, "notices": stats.notices,
+                   "users": len(self._buckets[name])}
+            for name, stats in self._stats.items()
+        }
+
+
+throttling = ThrottlingMiddleware()
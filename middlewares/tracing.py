@@ -0,0 +1,32 @@
+# middlewares/tracing.py
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, User
+from utils.tracing import Tracer, tracer as default_tracer
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Открывает корневой участок трассировки на каждое обновление. Регистрируется первым
+    внешним middleware, чтобы в дерево попало и ожидание в очереди пользователя.
+    """
+
+    def __init__(self, tracer: Tracer = default_tracer):
+        self.tracer = tracer
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not self.tracer.enabled or not isinstance(event, Update):
+            return await handler(event, data)
+        user: User = data.get("event_from_user")
+        with self.tracer.trace("update", update_id=event.update_id, type=event.event_type,
+                               user_id=user.id if user is not None else None):
+            return await handler(event, data)
+
+
+tracing = TracingMiddleware()
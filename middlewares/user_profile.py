@@ -0,0 +1,34 @@
+# middlewares/user_profile.py
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+from storage.conversations_storage import update_user_info
+
+
+def user_info_from(user: User) -> Dict[str, Any]:
+    """Профиль пользователя в том виде, в каком он хранится в conversations['user_info']."""
+    return {
+        "full_name": user.full_name,
+        "username": user.username,
+        "language_code": user.language_code,
+    }
+
+
+class UserProfileMiddleware(BaseMiddleware):
+    """
+    Запоминает имя и username отправителя каждого обновления в user_info его разговора,
+    чтобы при оформлении заказа не ходить за ними в Telegram (bot.get_chat).
+    Кэш меняется только если профиль действительно изменился.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: User = data.get("event_from_user")
+        if user is not None and not user.is_bot:
+            await update_user_info(user.id, user_info_from(user))
+        return await handler(event, data)
@@ -0,0 +1,107 @@
+# middlewares/user_serialization.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject, Update, User
+from config.config import USER_QUEUE_LIMIT
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class _UserLane:
+    """Очередь обновлений одного пользователя: замок и то, что сейчас ждёт или выполняется."""
+
+    __slots__ = ("lock", "queued", "callbacks")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.queued = 0  # обновлений в полосе, включая выполняющееся
+        self.callbacks: Set[Tuple[Any, str]] = set()  # (сообщение, callback_data) в полосе
+
+
+def _callback_key(callback: CallbackQuery) -> Tuple[Any, str]:
+    message_id = callback.message.message_id if callback.message is not None else callback.inline_message_id
+    return message_id, callback.data or ""
+
+
+class UserSerializationMiddleware(BaseMiddleware):
+    """
+    Обновления одного пользователя обрабатываются строго по очереди, разных — параллельно.
+
+    Замок заводится на пользователя при первом обновлении и удаляется, как только его
+    полоса опустела, поэтому реестр не растёт с числом пользователей. Если в полосе уже
+    queue_limit обновлений, новое нажатие кнопки отбрасывается; сообщения встают в очередь
+    всегда — это ввод пользователя (имя, адрес, вопрос), терять его нельзя. Повторное нажатие
+    той же кнопки того же сообщения, пока первое ещё в полосе, схлопывается с ним
+    (двойной тап «Подтверждаю»).
+    """
+
+    def __init__(self, queue_limit: int = USER_QUEUE_LIMIT):
+        self.queue_limit = queue_limit
+        self._lanes: Dict[int, _UserLane] = {}
+        self.dropped = 0
+        self.coalesced = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        callback = event.callback_query if isinstance(event, Update) else None
+        callback_key = _callback_key(callback) if callback is not None else None
+        lane = self._lanes.get(user.id)
+        if lane is not None:
+            if callback_key is not None and callback_key in lane.callbacks:
+                self.coalesced += 1
+                logger.debug("Повторное нажатие %s пользователем %s схлопнуто", callback_key, user.id)
+                await self._dismiss(callback)
+                return None
+            if callback is not None and lane.queued >= self.queue_limit:
+                self.dropped += 1
+                logger.warning("Очередь пользователя %s переполнена (%s), нажатие %s отброшено",
+                               user.id, lane.queued, callback.data)
+                await self._dismiss(callback)
+                return None
+        else:
+            lane = self._lanes[user.id] = _UserLane()
+
+        lane.queued += 1
+        if callback_key is not None:
+            lane.callbacks.add(callback_key)
+        try:
+            with tracer.span("user_lane.wait", queued=lane.queued - 1):
+                await lane.lock.acquire()
+            try:
+                return await handler(event, data)
+            finally:
+                lane.lock.release()
+        finally:
+            lane.queued -= 1
+            if callback_key is not None:
+                lane.callbacks.discard(callback_key)
+            if not lane.queued:
+                del self._lanes[user.id]
+
+    @staticmethod
+    async def _dismiss(callback: Optional[CallbackQuery]) -> None:
+        """Отвечает на отброшенный callback, чтобы у пользователя пропали «часики» на кнопке."""
+        if callback is None:
+            return
+        try:
+            await callback.answer()
+        except Exception as e:
+            logger.debug("Не удалось ответить на отброшенный callback %s: %s", callback.id, e)
+
+    def stats(self) -> Dict[str, int]:
+        return {"active_users": len(self._lanes), "dropped": self.dropped, "coalesced": self.coalesced}
+
+
+user_serialization = UserSerializationMiddleware()
@@ -0,0 +1,86 @@
+# models/callbacks.py
+"""
+Схемы callback_data кнопок бота. legacy — формат кнопок до введения схем:
+такие кнопки остаются в старых сообщениях и в outbox, поэтому продолжают распознаваться.
+"""
+from dataclasses import dataclass
+
+from utils.callback_data import CallbackPayload
+
+
+# --- каталог и корзина ---
+
+@dataclass(frozen=True)
+class CoffeeCatalog(CallbackPayload, prefix="ct", legacy="coffee_catalog"):
+    pass
+
+
+@dataclass(frozen=True)
+class CoffeeDetails(CallbackPayload, prefix="cf", legacy="coffee_"):
+    coffee_index: int
+
+
+@dataclass(frozen=True)
+class SelectWeight(CallbackPayload, prefix="wt", legacy="weight_"):
+    coffee_index: int
+    weight: str  # "250" или "1000"
+
+
+@dataclass(frozen=True)
+class BackToDetails(CallbackPayload, prefix="bd", legacy="back_to_details_"):
+    coffee_index: int
+
+
+@dataclass(frozen=True)
+class AddToCart(CallbackPayload, prefix="ac", legacy="add_to_cart_"):
+    coffee_index: int
+    weight: str
+
+
+@dataclass(frozen=True)
+class ViewCart(CallbackPayload, prefix="vc", legacy="view_cart"):
+    pass
+
+
+@dataclass(frozen=True)
+class ClearCart(CallbackPayload, prefix="cc", legacy="clear_cart"):
+    pass
+
+
+@dataclass(frozen=True)
+class BackToShop(CallbackPayload, prefix="bs", legacy="back_to_shop_from_order"):
+    pass
+
+
+# --- оформление заказа ---
+
+@dataclass(frozen=True)
+class Checkout(CallbackPayload, prefix="co", legacy="checkout"):
+    pass
+
+
+@dataclass(frozen=True)
+class PickupCash(CallbackPayload, prefix="pc", legacy="pickup_cash"):
+    pass
+
+
+@dataclass(frozen=True)
+class EuropochtaSend(CallbackPayload, prefix="ep", legacy="europochta_send"):
+    pass
+
+
+# --- выдача заказа администратором ---
+
+@dataclass(frozen=True)
+class IssueOrder(CallbackPayload, prefix="io", legacy="issue_order_"):
+    order_number: str  # строка: номер с ведущими нулями
+
+
+@dataclass(frozen=True)
+class ConfirmIssue(CallbackPayload, prefix="ci", legacy="confirm_issue_"):
+    order_number: str
+
+
+@dataclass(frozen=True)
+class CancelIssue(CallbackPayload, prefix="cx", legacy="cancel_issue"):
+    pass
@@ -34,4 +34,5 @@ class Order:
     address: Optional[str] = None
     post_office_number: Optional[str] = None
     issued: bool = False
-    issue_date: Optional[str] = None
\ No newline at end of file
+    issue_date: Optional[str] = None
+    created_at: Optional[str] = None
\ No newline at end of file
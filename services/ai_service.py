@@ -1,37 +1,103 @@
 # services/ai_service.py
-from openai import OpenAI
-from config.config import OPENROUTER_API_KEY, BOT_MIND_FILE
+from openai import AsyncOpenAI
+from config.config import (
+    OPENROUTER_API_KEY, OPENROUTER_BASE_URL, BOT_MIND_FILE, LLM_TIMEOUT, LLM_MAX_RETRIES, LLM_MAX_CONCURRENCY,
+)
+import asyncio
 import json
 import logging
-from typing import List, Dict
+import time
+from typing import Any, Dict, List, Optional
+from storage.llm_usage_storage import llm_usage_store
+from utils.metrics import registry
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=OPENROUTER_API_KEY)
+# Асинхронный клиент: пока нейросеть думает, цикл событий обслуживает остальных пользователей
+client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY,
+                     timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES)
+
+AI_MODEL = "deepseek/deepseek-chat:free"
+
+# Ответ пользователю, если нейросеть не ответила (ошибка, таймаут)
+FALLBACK_RESPONSE = "⚠️ Произошла ошибка. Попробуйте позже."
+
+LLM_LATENCY = registry.histogram("bot_llm_request_seconds", "Время ответа нейросети", ("model",))
+LLM_ERRORS = registry.counter("bot_llm_errors_total", "Ошибки запросов к нейросети", ("model", "error"))
+LLM_TOKENS = registry.counter("bot_llm_tokens_total", "Токены, потраченные на запросы к нейросети", ("model", "kind"))
+LLM_QUEUE_WAIT = registry.histogram("bot_llm_queue_seconds", "Ожидание свободного слота запроса к нейросети")
+
+# Не больше LLM_MAX_CONCURRENCY запросов к OpenRouter одновременно, остальные ждут своей очереди
+_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_counters = {"requests": 0, "in_flight": 0, "waiting": 0, "peak_waiting": 0}
+
+def stats() -> Dict[str, Any]:
+    return {**_counters, "limit": LLM_MAX_CONCURRENCY}
 
 def load_bot_mind() -> str:
     try:
         with open(BOT_MIND_FILE, 'r', encoding='utf-8') as f:
             return json.dumps(json.load(f), ensure_ascii=False, indent=2)
     except Exception as e:
-        logger.error(f"Error loading bot mind: {e}")
+        logger.error("Error loading bot mind: %s", e)
         return ""
 
-async def get_ai_response(messages: List[Dict[str, str]]) -> str:
+async def get_ai_response(messages: List[Dict[str, str]], user_id: Optional[int] = None) -> str:
+    """Ответ нейросети на историю сообщений; расход токенов учитывается за user_id (см. /llmstats)."""
+    requested = time.perf_counter()
     try:
         system_prompt = load_bot_mind()
         messages_for_ai = [{"role": "system", "content": system_prompt}] + messages[-20:]
-        completion = client.chat.completions.create(
-            model="deepseek/deepseek-chat:free",
-            messages=messages_for_ai,
-            extra_headers={
-                "HTTP-Referer": "https://github.com/your-repo",
-                "X-Title": "Coffee Master Bot"
-            }
+        queued = time.perf_counter()
+        _counters["waiting"] += 1
+        _counters["peak_waiting"] = max(_counters["peak_waiting"], _counters["waiting"])
+        try:
+            with tracer.span("llm.queue", waiting=_counters["waiting"]):
+                await _slots.acquire()
+        finally:
+            _counters["waiting"] -= 1
+        requested = time.perf_counter()
+        LLM_QUEUE_WAIT.observe(requested - queued)
+        _counters["requests"] += 1
+        _counters["in_flight"] += 1
+        try:
+            with tracer.span("llm", model=AI_MODEL, messages=len(messages_for_ai)) as span:
+                completion = await client.chat.completions.create(
+                    model=AI_MODEL,
+                    messages=messages_for_ai,
+                    extra_headers={
+                        "HTTP-Referer": "https://github.com/your-repo",
+                        "X-Title": "Coffee Master Bot"
+                    }
+                )
+                latency = time.perf_counter() - requested
+                ai_response = completion.choices[0].message.content
+                usage = completion.usage
+                if usage is not None:
+                    LLM_TOKENS.inc(usage.prompt_tokens, model=AI_MODEL, kind="prompt")
+                    LLM_TOKENS.inc(usage.completion_tokens, model=AI_MODEL, kind="completion")
+                    span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+        finally:
+            # Только сам запрос: ожидание слота уже в bot_llm_queue_seconds
+            LLM_LATENCY.observe(time.perf_counter() - requested, model=AI_MODEL)
+            _counters["in_flight"] -= 1
+            _slots.release()
+    except Exception as e:
+        LLM_ERRORS.inc(model=AI_MODEL, error=type(e).__name__)
+        llm_usage_store.record(user_id, AI_MODEL, latency=time.perf_counter() - requested, error=True)
+        logger.error("API Error: %s", e)
+        return FALLBACK_RESPONSE
+
+    # Учёт расхода — вне запроса: его ошибка не должна превращать готовый ответ в запасной
+    try:
+        llm_usage_store.record(
+            user_id, completion.model or AI_MODEL,
+            prompt_tokens=usage.prompt_tokens if usage is not None else 0,
+            completion_tokens=usage.completion_tokens if usage is not None else 0,
+            latency=latency,
         )
-        ai_response = completion.choices[0].message.content
-        logger.info(f"AI responded: {ai_response}")
-        return ai_response
     except Exception as e:
-        logger.error(f"API Error: {e}")
-        return "⚠️ Произошла ошибка. Попробуйте позже."
\ No newline at end of file
+        logger.error("Не удалось учесть расход нейросети: %s", e)
+    logger.debug("AI responded: %s", ai_response)
+    return ai_response
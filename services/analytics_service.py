@@ -0,0 +1,285 @@
+# services/analytics_service.py
+"""
+Аналитика продаж по истории заказов.
+
+История раскладывается в колонки NumPy (одна строка на позицию заказа),
+все группировки считаются векторно через np.unique / np.bincount.
+Колонки закрытых месячных сегментов кэшируются рядом с ними в YYYY-MM.columns.npz,
+поэтому при повторных запросах JSON разбирается только для текущего месяца.
+
+Запуск из консоли:
+    python -m services.analytics_service --since 2026-09-01 --until 2026-09-30 --product "Brazil Serrado" --weight 1000
+"""
+import argparse
+import asyncio
+import os
+import logging
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from storage.order_history_storage import OrderHistory, order_date, order_history
+
+logger = logging.getLogger(__name__)
+
+PICKUP = "Самовывоз"
+EUROPOCHTA = "Европочта"
+
+# Версия формата кэша колонок: кэш другой версии пересобирается из сегмента
+COLUMNS_VERSION = 2
+
+
+@dataclass
+class SalesColumns:
+    """Позиции заказов в колоночном виде; sku и payment — коды в словарях sku_names и payment_methods."""
+    order_id: np.ndarray       # int64, номер заказа
+    date: np.ndarray           # datetime64[D], дата заказа (order_date: выдачи, иначе создания)
+    sku: np.ndarray            # int32, код товара (название + вес)
+    weight: np.ndarray         # int32, вес в граммах
+    price: np.ndarray          # int64, цена в копейках
+    payment: np.ndarray        # int16, код способа оплаты
+    sku_names: np.ndarray      # str, подпись товара для кода sku
+    payment_methods: np.ndarray  # str, способ оплаты для кода payment
+
+    def __len__(self) -> int:
+        return len(self.order_id)
+
+    def filter(self, mask: np.ndarray) -> "SalesColumns":
+        return SalesColumns(
+            order_id=self.order_id[mask],
+            date=self.date[mask],
+            sku=self.sku[mask],
+            weight=self.weight[mask],
+            price=self.price[mask],
+            payment=self.payment[mask],
+            sku_names=self.sku_names,
+            payment_methods=self.payment_methods,
+        )
+
+
+def price_to_kopecks(price: Any) -> int:
+    """'12.50 руб.' -> 1250."""
+    if isinstance(price, (int, float)):
+        return int(round(price * 100))
+    return int(round(float(str(price).replace("руб.", "").replace(",", ".").strip() or 0) * 100))
+
+
+def sku_label(name: str, weight: Any) -> str:
+    return f"{name} ({weight}г)"
+
+
+def _raw_columns(orders: Iterable[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Разбирает заказы в колонки с локальными словарями товаров и способов оплаты."""
+    order_ids: List[int] = []
+    dates: List[str] = []
+    skus: List[str] = []
+    weights: List[int] = []
+    prices: List[int] = []
+    payments: List[str] = []
+    for order in orders:
+        number = int(order["order_number"])
+        # Та же дата, что в метаданных сегментов: иначе отбор сегментов по периоду терял бы заказы
+        day = order_date(order)[:10] or "NaT"
+        payment = order.get("payment_method") or ""
+        for item in order.get("cart", []):
+            order_ids.append(number)
+            dates.append(day)
+            skus.append(sku_label(item["name"], item["weight"]))
+            weights.append(int(item["weight"]))
+            prices.append(price_to_kopecks(item["price"]))
+            payments.append(payment)
+
+    sku_names, sku_codes = np.unique(np.array(skus, dtype=str), return_inverse=True)
+    payment_methods, payment_codes = np.unique(np.array(payments, dtype=str), return_inverse=True)
+    return {
+        "order_id": np.array(order_ids, dtype=np.int64),
+        "date": np.array(dates, dtype="datetime64[D]"),
+        "sku": sku_codes.astype(np.int32),
+        "weight": np.array(weights, dtype=np.int32),
+        "price": np.array(prices, dtype=np.int64),
+        "payment": payment_codes.astype(np.int16),
+        "sku_names": sku_names,
+        "payment_methods": payment_methods,
+    }
+
+
+def _segment_columns(history: OrderHistory, month: str) -> Dict[str, np.ndarray]:
+    """Колонки закрытого сегмента: из кэша .columns.npz или разбором сжатого сегмента."""
+    cache_path = history.segment_path(month, ".columns.npz")
+    segment_path = history.segment_path(month, ".jsonl.gz")
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(segment_path):
+        with np.load(cache_path) as cached:
+            if "version" in cached.files and int(cached["version"]) == COLUMNS_VERSION:
+                return {key: cached[key] for key in cached.files if key != "version"}
+    columns = _raw_columns(history.iter_segment_sync(month))
+    tmp_path = f"{cache_path}.tmp.npz"
+    np.savez(tmp_path, version=np.array(COLUMNS_VERSION), **columns)
+    os.replace(tmp_path, cache_path)
+    return columns
+
+
+def _concat(parts: List[Dict[str, np.ndarray]]) -> SalesColumns:
+    """Склеивает колонки сегментов, переводя локальные коды в общий словарь."""
+    parts = [part for part in parts if len(part["order_id"])]
+    if not parts:
+        empty = _raw_columns([])
+        return SalesColumns(**empty)
+
+    sku_names = np.unique(np.concatenate([part["sku_names"] for part in parts]))
+    payment_methods = np.unique(np.concatenate([part["payment_methods"] for part in parts]))
+    sku, payment = [], []
+    for part in parts:
+        sku.append(np.searchsorted(sku_names, part["sku_names"]).astype(np.int32)[part["sku"]])
+        payment.append(np.searchsorted(payment_methods, part["payment_methods"]).astype(np.int16)[part["payment"]])
+    return SalesColumns(
+        order_id=np.concatenate([part["order_id"] for part in parts]),
+        date=np.concatenate([part["date"] for part in parts]),
+        sku=np.concatenate(sku),
+        weight=np.concatenate([part["weight"] for part in parts]),
+        price=np.concatenate([part["price"] for part in parts]),
+        payment=np.concatenate(payment),
+        sku_names=sku_names,
+        payment_methods=payment_methods,
+    )
+
+
+def load_sales(since: Optional[date] = None, until: Optional[date] = None, history: OrderHistory = order_history) -> SalesColumns:
+    """
+    Загружает позиции заказов за период [since, until] в колонки.
+    Закрытые сегменты вне периода пропускаются по метаданным. Синхронная функция,
+    из бота вызывается через asyncio.to_thread.
+    """
+    since_iso = since.isoformat() if since else None
+    until_iso = (until + timedelta(days=1)).isoformat() if until else None
+    parts = []
+    for meta in history.segments():
+        if since_iso and meta["max_date"] and meta["max_date"] < since_iso:
+            continue
+        if until_iso and meta["min_date"] and meta["min_date"] > until_iso:
+            continue
+        if meta["count"]:
+            parts.append(_segment_columns(history, meta["month"]))
+    if history.active is not None:
+        parts.append(_raw_columns(history.active.iter_orders_sync()))
+
+    sales = _concat(parts)
+    mask = np.ones(len(sales), dtype=bool)
+    if since:
+        mask &= sales.date >= np.datetime64(since, "D")
+    if until:
+        mask &= sales.date <= np.datetime64(until, "D")
+    return sales if mask.all() else sales.filter(mask)
+
+
+def filter_product(sales: SalesColumns, product: Optional[str] = None, weight: Optional[int] = None) -> SalesColumns:
+    """Оставляет позиции товаров, в названии которых есть product, и/или с указанным весом."""
+    mask = np.ones(len(sales), dtype=bool)
+    if product:
+        matching = np.char.find(np.char.lower(sales.sku_names), product.lower()) >= 0
+        mask &= matching[sales.sku]
+    if weight:
+        mask &= sales.weight == weight
+    return sales if mask.all() else sales.filter(mask)
+
+
+def revenue_by_day(sales: SalesColumns) -> Tuple[np.ndarray, np.ndarray]:
+    """Выручка (в копейках) по дням: (дни, выручка)."""
+    days, day_index = np.unique(sales.date, return_inverse=True)
+    return days, np.bincount(day_index, weights=sales.price, minlength=len(days)).astype(np.int64)
+
+
+def revenue_by_day_and_sku(sales: SalesColumns) -> Tuple[np.ndarray, np.ndarray]:
+    """Матрица выручки дни x товары (в копейках): (дни, матрица[len(days), len(sku_names)])."""
+    days, day_index = np.unique(sales.date, return_inverse=True)
+    n_sku = len(sales.sku_names)
+    flat = np.bincount(day_index * n_sku + sales.sku, weights=sales.price, minlength=len(days) * n_sku)
+    return days, flat.astype(np.int64).reshape(len(days), n_sku)
+
+
+def sales_by_sku(sales: SalesColumns) -> Tuple[np.ndarray, np.ndarray]:
+    """Количество проданных пачек и выручка (в копейках) по каждому коду товара."""
+    n_sku = len(sales.sku_names)
+    quantity = np.bincount(sales.sku, minlength=n_sku)
+    revenue = np.bincount(sales.sku, weights=sales.price, minlength=n_sku).astype(np.int64)
+    return quantity, revenue
+
+
+def top_products(sales: SalesColumns, limit: int = 5) -> List[Tuple[str, int, int]]:
+    """Самые продаваемые товары по выручке: [(товар, количество, выручка в копейках)]."""
+    quantity, revenue = sales_by_sku(sales)
+    order = np.lexsort((-quantity, -revenue))[:limit]
+    return [(str(sales.sku_names[i]), int(quantity[i]), int(revenue[i])) for i in order if quantity[i]]
+
+
+def average_basket(sales: SalesColumns) -> Tuple[int, float, float]:
+    """(число заказов, средний чек в копейках, среднее число позиций в заказе)."""
+    if not len(sales):
+        return 0, 0.0, 0.0
+    _, order_index = np.unique(sales.order_id, return_inverse=True)
+    totals = np.bincount(order_index, weights=sales.price)
+    return len(totals), float(totals.mean()), len(sales) / len(totals)
+
+
+def payment_split(sales: SalesColumns) -> Dict[str, Tuple[int, int]]:
+    """Самовывоз против Европочты: {способ: (число заказов, выручка в копейках)}."""
+    kind = np.char.startswith(sales.payment_methods.astype(str), EUROPOCHTA)[sales.payment]
+    split = {}
+    for label, mask in ((PICKUP, ~kind), (EUROPOCHTA, kind)):
+        split[label] = (len(np.unique(sales.order_id[mask])), int(sales.price[mask].sum()))
+    return split
+
+
+def _rub(kopecks: float) -> str:
+    return f"{kopecks / 100:.2f} руб."
+
+
+def format_sales_report(sales: SalesColumns, title: str, top: int = 5, days: int = 7) -> str:
+    """Текстовый отчёт для команды /stats и консоли."""
+    orders, basket, items = average_basket(sales)
+    lines = [f"📊 {title}", ""]
+    if not orders:
+        lines.append("Продаж за период нет.")
+        return "\n".join(lines)
+
+    lines.append(f"Заказов: {orders}, позиций: {len(sales)}, выручка: {_rub(sales.price.sum())}")
+    lines.append(f"Средний чек: {_rub(basket)}, позиций в заказе: {items:.1f}")
+    lines.append("")
+    lines.append("Способ получения:")
+    for label, (count, revenue) in payment_split(sales).items():
+        lines.append(f"- {label}: {count} заказов, {_rub(revenue)}")
+    lines.append("")
+    lines.append("Топ товаров:")
+    for name, quantity, revenue in top_products(sales, top):
+        lines.append(f"- {name}: {quantity} шт., {_rub(revenue)}")
+    day_list, revenue = revenue_by_day(sales)
+    lines.append("")
+    lines.append("Выручка по дням:")
+    for day, value in list(zip(day_list, revenue))[-days:]:
+        lines.append(f"- {day}: {_rub(value)}")
+    return "\n".join(lines)
+
+
+def _parse_date(value: str) -> date:
+    return date.fromisoformat(value)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Отчёт о продажах по истории заказов")
+    parser.add_argument("--since", type=_parse_date, help="начало периода, YYYY-MM-DD")
+    parser.add_argument("--until", type=_parse_date, help="конец периода включительно, YYYY-MM-DD")
+    parser.add_argument("--product", help="часть названия товара")
+    parser.add_argument("--weight", type=int, choices=(250, 1000), help="вес пачки в граммах")
+    parser.add_argument("--top", type=int, default=10, help="сколько товаров показать в топе")
+    parser.add_argument("--days", type=int, default=31, help="сколько последних дней показать в выручке по дням")
+    args = parser.parse_args(argv)
+
+    asyncio.run(order_history.load())
+    sales = filter_product(load_sales(args.since, args.until), args.product, args.weight)
+    period = f"{args.since or 'начала'} — {args.until or 'сегодня'}"
+    print(format_sales_report(sales, f"Продажи с {period}", top=args.top, days=args.days))
+
+
+if __name__ == "__main__":
+    main()
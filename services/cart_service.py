@@ -50,8 +50,9 @@ async def add_to_cart(user_id: int, coffee_index: int, weight: str) -> None:
     with open(BOT_MIND_FILE, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
 
-    logger.info(f"Добавлен товар в корзину: {cart_item}, осталось {weight}г: {coffee_list[coffee_index][quantity_key]}")
-    logger.info(f"Текущее состояние корзины в кэше: {conversation['cart']}")
+    logger.info("Пользователь %s добавил в корзину %s %sг, осталось: %s",
+                user_id, coffee.name, weight, coffee_list[coffee_index][quantity_key])
+    logger.debug("Текущее состояние корзины пользователя %s: %s", user_id, conversation['cart'])
 
 async def clear_cart(user_id: int, restore_quantity: bool = False) -> None:
     """Очищает корзину пользователя, с опцией возврата остатков."""
@@ -73,10 +74,10 @@ async def clear_cart(user_id: int, restore_quantity: bool = False) -> None:
 
         with open(BOT_MIND_FILE, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
-        logger.info(f"Остатки возвращены в bot_mind.json для пользователя {user_id}")
+        logger.info("Остатки возвращены в bot_mind.json для пользователя %s", user_id)
 
     # Очищаем корзину
     conversation["cart"] = []
     await save_conversation(user_id, conversation)
 
-    logger.info(f"Корзина пользователя {user_id} очищена, restore_quantity={restore_quantity}")
\ No newline at end of file
+    logger.info("Корзина пользователя %s очищена, restore_quantity=%s", user_id, restore_quantity)
\ No newline at end of file
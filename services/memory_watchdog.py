@@ -0,0 +1,129 @@
+# services/memory_watchdog.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+
+import storage.conversations_storage as conversations_storage
+from config.config import (
+    ADMIN_ID, MEMORY_CHECK_INTERVAL, MEMORY_RSS_GROWTH_MB, MEMORY_RSS_LIMIT_MB, MEMORY_CACHE_GROWTH,
+    MEMORY_CACHE_MIN_ENTRIES, MEMORY_ALERT_COOLDOWN,
+)
+from middlewares.throttling import throttling
+from middlewares.user_serialization import user_serialization
+from services.send_scheduler import send_scheduler
+from storage.fsm_storage import fsm_storage
+from storage.pending_orders_storage import pending_orders_repository
+from utils.idempotency import idempotency_store
+from utils.memory import format_size, rss_bytes
+
+logger = logging.getLogger(__name__)
+
+
+def cache_sizes() -> Dict[str, int]:
+    """Размеры кэшей, которые растут вместе с числом пользователей."""
+    conversations = conversations_storage.conversations_cache
+    return {
+        "conversations": len(conversations),
+        "chat_messages": sum(len(conversation.get("messages") or ()) for conversation in conversations.values()),
+        "fsm_states": len(fsm_storage),
+        "pending_orders": len(pending_orders_repository),
+        "idempotency_keys": idempotency_store.stats()["keys"],
+        "user_lanes": user_serialization.stats()["active_users"],
+        "throttle_users": sum(stats["users"] for stats in throttling.stats().values()),
+        "send_chats": send_scheduler.stats()["chats"],
+    }
+
+
+class MemoryWatchdog:
+    """
+    Раз в interval замеряет RSS процесса и размеры кэшей. Первый замер — база; если RSS
+    вырос больше чем на rss_growth_mb (или превысил rss_limit_mb), а кэш — в cache_growth
+    раз и хотя бы на cache_min_entries записей, администратору уходит предупреждение.
+    После предупреждения база сдвигается на текущие значения, повтор — не раньше cooldown.
+    """
+
+    def __init__(self, interval: float = MEMORY_CHECK_INTERVAL, rss_growth_mb: float = MEMORY_RSS_GROWTH_MB,
+                 rss_limit_mb: float = MEMORY_RSS_LIMIT_MB, cache_growth: float = MEMORY_CACHE_GROWTH,
+                 cache_min_entries: int = MEMORY_CACHE_MIN_ENTRIES, cooldown: float = MEMORY_ALERT_COOLDOWN):
+        self.interval = interval
+        self.rss_growth = rss_growth_mb * 1024 * 1024
+        self.rss_limit = rss_limit_mb * 1024 * 1024
+        self.cache_growth = cache_growth
+        self.cache_min_entries = cache_min_entries
+        self.cooldown = cooldown
+        self.bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._baseline: Optional[Dict[str, Any]] = None
+        self._last_alert: Optional[float] = None
+        self.last: Dict[str, Any] = {}
+        self.alerts = 0
+
+    def sample(self) -> Dict[str, Any]:
+        self.last = {"rss": rss_bytes(), "caches": cache_sizes()}
+        return self.last
+
+    def check(self, sample: Dict[str, Any]) -> List[str]:
+        """Что выросло сверх порогов относительно базы (пустой список — всё в норме)."""
+        if self._baseline is None:
+            self._baseline = sample
+            return []
+        problems = []
+        base_rss = self._baseline["rss"]
+        if sample["rss"] - base_rss > self.rss_growth:
+            problems.append(f"RSS {format_size(base_rss)} → {format_size(sample['rss'])}")
+        elif self.rss_limit and sample["rss"] > self.rss_limit:
+            problems.append(f"RSS {format_size(sample['rss'])} выше предела {format_size(int(self.rss_limit))}")
+        for name, size in sample["caches"].items():
+            base = self._baseline["caches"].get(name, 0)
+            if size - base >= self.cache_min_entries and size > base * self.cache_growth:
+                problems.append(f"{name}: {base} → {size}")
+        return problems
+
+    async def check_once(self) -> None:
+        sample = self.sample()
+        problems = self.check(sample)
+        if not problems:
+            return
+        logger.warning("Рост памяти: %s", "; ".join(problems))
+        now = time.monotonic()
+        if self._last_alert is not None and now - self._last_alert < self.cooldown:
+            return
+        self._last_alert = now
+        self._baseline = sample
+        self.alerts += 1
+        if self.bot is not None:
+            text = "⚠️ Рост памяти бота:\n" + "\n".join(problems) + "\n\nПодробнее: /memory, /memsnap"
+            await self.bot.send_message(ADMIN_ID, text)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check_once()
+            except Exception as e:
+                logger.error("Ошибка проверки памяти: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self, bot: Bot) -> None:
+        self.bot = bot
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="memory-watchdog")
+            logger.info("Контроль памяти запущен (раз в %s с)", self.interval)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.last, "alerts": self.alerts}
+
+
+memory_watchdog = MemoryWatchdog()
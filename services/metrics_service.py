@@ -0,0 +1,140 @@
+# services/metrics_service.py
+from middlewares.throttling import throttling
+from middlewares.user_serialization import user_serialization
+from services import ai_service
+from services.memory_watchdog import memory_watchdog
+from services.order_pipeline import order_pipeline
+from services.outbox_service import outbox_worker
+from services.send_scheduler import send_scheduler
+from storage.fsm_storage import fsm_storage
+from utils.idempotency import idempotency_store
+from utils.loop_monitor import loop_monitor
+from utils.metrics import registry
+from utils.tracing import tracer
+
+SEND_QUEUED = registry.gauge("bot_send_queue_length", "Отправки, ожидающие слота планировщика")
+SEND_CHATS = registry.gauge("bot_send_chats", "Чаты с активными лимитами планировщика")
+SEND_RETRY_AFTER = registry.counter("bot_send_retry_after_total", "Ответы RetryAfter от Telegram")
+SEND_LANE_WAIT = registry.gauge(
+    "bot_send_lane_wait_seconds", "Ожидание в очереди планировщика по полосам", ("lane", "stat"),
+)
+SEND_LANE_SENT = registry.counter("bot_send_lane_requests_total", "Отправки по полосам приоритета", ("lane",))
+
+OUTBOX_EVENTS = registry.counter("bot_outbox_events_total", "Уведомления outbox по исходу", ("result",))
+OUTBOX_WAITING = registry.gauge("bot_outbox_waiting_retry", "Уведомления outbox, ожидающие повтора")
+
+PIPELINE_COMMITS = registry.counter("bot_order_pipeline_commits_total", "Пакетные записи журнала заказов")
+PIPELINE_ORDERS = registry.counter("bot_order_pipeline_orders_total", "Заказы, записанные в журнал")
+
+SERIALIZATION_ACTIVE = registry.gauge("bot_user_lanes_active", "Пользователи с обновлениями в обработке")
+SERIALIZATION_EVENTS = registry.counter(
+    "bot_user_lane_events_total", "Отброшенные и схлопнутые обновления", ("result",),
+)
+
+THROTTLE_EVENTS = registry.counter("bot_throttle_events_total", "Решения ограничителя частоты", ("budget", "result"))
+THROTTLE_USERS = registry.gauge("bot_throttle_users", "Пользователи с корзиной маркеров", ("budget",))
+
+IDEMPOTENCY_EVENTS = registry.counter(
+    "bot_idempotency_total", "Вызовы идемпотентных хендлеров (hit — повтор из кэша)", ("handler", "result"),
+)
+IDEMPOTENCY_KEYS = registry.gauge("bot_idempotency_keys", "Ключи идемпотентности в памяти")
+
+TRACED_UPDATES = registry.counter("bot_traced_updates_total", "Трассированные обновления", ("kind",))
+
+LLM_IN_FLIGHT = registry.gauge("bot_llm_in_flight", "Запросы к нейросети в работе")
+LLM_WAITING = registry.gauge("bot_llm_waiting", "Запросы к нейросети, ожидающие слота LLM_MAX_CONCURRENCY")
+
+PROCESS_RSS = registry.gauge("bot_process_rss_bytes", "RSS процесса на последнем замере контроля памяти")
+CACHE_ENTRIES = registry.gauge("bot_cache_entries", "Размеры кэшей на последнем замере контроля памяти", ("cache",))
+MEMORY_ALERTS = registry.counter("bot_memory_alerts_total", "Предупреждения о росте памяти")
+
+LOOP_LAG_WINDOW = registry.gauge(
+    "bot_event_loop_lag_window_seconds", "Опоздание цикла событий за последние LOOP_LAG_WINDOW замеров", ("quantile",),
+)
+
+FSM_STATES = registry.gauge("bot_fsm_states", "Состояния FSM в памяти")
+FSM_EVENTS = registry.counter("bot_fsm_events_total", "Сбросы журнала FSM и истёкшие состояния", ("event",))
+
+
+def _collect_send_scheduler() -> None:
+    stats = send_scheduler.stats()
+    SEND_QUEUED.set(stats["queued"])
+    SEND_CHATS.set(stats["chats"])
+    SEND_RETRY_AFTER.set_total(stats["retry_after"])
+    for lane, snapshot in stats["lanes"].items():
+        SEND_LANE_SENT.set_total(snapshot["count"], lane=lane)
+        for stat in ("avg", "p50", "p95", "max"):
+            SEND_LANE_WAIT.set(snapshot[stat], lane=lane, stat=stat)
+
+
+def _collect_outbox() -> None:
+    stats = outbox_worker.stats()
+    for result in ("delivered", "retries", "dropped"):
+        OUTBOX_EVENTS.set_total(stats[result], result=result)
+    OUTBOX_WAITING.set(stats["waiting_retry"])
+
+
+def _collect_order_pipeline() -> None:
+    PIPELINE_COMMITS.set_total(order_pipeline.commits)
+    PIPELINE_ORDERS.set_total(order_pipeline.committed_orders)
+
+
+def _collect_middlewares() -> None:
+    stats = user_serialization.stats()
+    SERIALIZATION_ACTIVE.set(stats["active_users"])
+    for result in ("dropped", "coalesced"):
+        SERIALIZATION_EVENTS.set_total(stats[result], result=result)
+
+    for budget, stats in throttling.stats().items():
+        for result in ("allowed", "throttled", "notices"):
+            THROTTLE_EVENTS.set_total(stats[result], budget=budget, result=result)
+        THROTTLE_USERS.set(stats["users"], budget=budget)
+
+
+def _collect_idempotency() -> None:
+    stats = idempotency_store.stats()
+    IDEMPOTENCY_KEYS.set(stats["keys"])
+    for key, result in (("hits", "hit"), ("misses", "miss")):
+        for handler, count in stats[key].items():
+            IDEMPOTENCY_EVENTS.set_total(count, handler=handler, result=result)
+
+
+def _collect_fsm() -> None:
+    FSM_STATES.set(len(fsm_storage))
+    FSM_EVENTS.set_total(fsm_storage.flushes, event="flush")
+    FSM_EVENTS.set_total(fsm_storage.expired, event="expired")
+
+
+def _collect_llm() -> None:
+    stats = ai_service.stats()
+    LLM_IN_FLIGHT.set(stats["in_flight"])
+    LLM_WAITING.set(stats["waiting"])
+
+
+def _collect_memory() -> None:
+    # Берём последний замер контроля памяти: сами кэши на каждый запрос /metrics не пересчитываются
+    stats = memory_watchdog.stats()
+    if "rss" in stats:
+        PROCESS_RSS.set(stats["rss"])
+        for cache, size in stats["caches"].items():
+            CACHE_ENTRIES.set(size, cache=cache)
+    MEMORY_ALERTS.set_total(stats["alerts"])
+
+
+def _collect_loop() -> None:
+    for quantile, lag in loop_monitor.percentiles().items():
+        LOOP_LAG_WINDOW.set(lag, quantile=quantile)
+
+
+def _collect_tracing() -> None:
+    stats = tracer.stats()
+    TRACED_UPDATES.set_total(stats["traced"], kind="all")
+    TRACED_UPDATES.set_total(stats["slow"], kind="slow")
+
+
+def register_bot_collectors() -> None:
+    """Выгружает в /metrics счётчики, которые компоненты бота уже ведут сами (stats())."""
+    for collector in (_collect_send_scheduler, _collect_outbox, _collect_order_pipeline,
+                      _collect_middlewares, _collect_idempotency, _collect_fsm, _collect_llm, _collect_memory, _collect_loop,
+                      _collect_tracing):
+        registry.add_collector(collector)
@@ -0,0 +1,161 @@
+# services/order_pipeline.py
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from config import ORDER_NUMBER_FILE
+from storage.pending_orders_storage import PendingOrdersRepository, pending_orders_repository
+from storage.orders_storage import load_last_order_number, save_last_order_number, format_order_number
+from storage.conversations_storage import clear_cart
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Сколько заказов максимум попадает в один групповой коммит
+MAX_BATCH_SIZE = 64
+
+
+# Строит уведомления outbox для заказа, которому уже присвоен номер
+NotificationsBuilder = Callable[[Dict[str, Any]], List[Dict[str, Any]]]
+
+
+@dataclass
+class PlaceOrderCommand:
+    """Команда на оформление заказа: данные заказа без номера и future для ответа вызывающему."""
+    order: Dict[str, Any]
+    future: asyncio.Future = field(repr=False)
+    notifications: Optional[NotificationsBuilder] = field(default=None, repr=False)
+
+
+class OrderPipeline:
+    """
+    Единственный писатель заказов. Хендлеры кладут команды в очередь, фоновая задача
+    забирает всё, что накопилось, назначает номера в памяти, одной записью в журнал
+    фиксирует пачку заказов вместе с их уведомлениями для outbox (групповой коммит),
+    сохраняет счётчик номеров, очищает корзины и только после этого отвечает каждому
+    вызывающему через его future.
+    """
+
+    def __init__(self, repository: PendingOrdersRepository, number_file: str = ORDER_NUMBER_FILE,
+                 max_batch_size: int = MAX_BATCH_SIZE):
+        self.repository = repository
+        self.number_file = number_file
+        self.max_batch_size = max_batch_size
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._last_number = 0
+        self._commit_listeners: List[Callable[[], None]] = []
+        self.commits = 0
+        self.committed_orders = 0
+
+    def add_commit_listener(self, listener: Callable[[], None]) -> None:
+        """listener вызывается после каждого успешного коммита (например, чтобы разбудить outbox)."""
+        self._commit_listeners.append(listener)
+
+    async def start(self) -> None:
+        """Восстанавливает счётчик номеров и запускает задачу-писателя."""
+        async with self._start_lock:
+            if self._task is not None:
+                return
+            # Если бот упал между записью журнала и счётчика, номер берём из самих заказов
+            self._last_number = max(
+                await load_last_order_number(self.number_file),
+                await self.repository.max_order_number(),
+            )
+            self._task = asyncio.create_task(self._run(), name="order-pipeline")
+        logger.info("Конвейер заказов запущен, последний номер заказа: %s", self._last_number)
+
+    async def stop(self) -> None:
+        """Дожидается фиксации уже принятых заказов и останавливает писателя."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Конвейер заказов остановлен")
+
+    async def place_order(self, order: Dict[str, Any], notifications: Optional[NotificationsBuilder] = None) -> Dict[str, Any]:
+        """
+        Ставит заказ в очередь и ждёт, пока он будет записан на диск. Возвращает заказ с номером.
+        notifications(order) строит уведомления, которые попадут в outbox в том же коммите.
+        """
+        if self._task is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        with tracer.span("order_pipeline.place_order", queued=self._queue.qsize()):
+            await self._queue.put(PlaceOrderCommand(order=order, future=future, notifications=notifications))
+            return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch: List[PlaceOrderCommand] = [await self._queue.get()]
+            # Всё, что успело накопиться, пока шла предыдущая запись, уходит одним коммитом
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                logger.error("Ошибка группового коммита заказов (%s шт.): %s", len(batch), e)
+                for command in batch:
+                    if not command.future.done():
+                        command.future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, batch: List[PlaceOrderCommand]) -> None:
+        accepted: List[PlaceOrderCommand] = []
+        orders: List[Dict[str, Any]] = []
+        outbox: List[Dict[str, Any]] = []
+        number = self._last_number
+        for command in batch:
+            order = {**command.order, "order_number": format_order_number(number + 1)}
+            # Уведомления строятся по одному заказу: ошибка построителя отклоняет только его заказ
+            try:
+                messages = command.notifications(order) if command.notifications else []
+            except Exception as e:
+                logger.error("Ошибка при подготовке уведомлений заказа пользователя %s: %s", order.get("user_id"), e)
+                command.future.set_exception(e)
+                continue
+            number += 1
+            accepted.append(command)
+            orders.append(order)
+            outbox.extend(messages)
+        if not orders:
+            return
+
+        await self.repository.add_many(orders, outbox)
+        self._last_number = number
+        self.commits += 1
+        self.committed_orders += len(orders)
+
+        # Заказы и уведомления уже в журнале: покупатели узнают об успехе, outbox просыпается,
+        # что бы ни случилось дальше со счётчиком и корзинами
+        for command, order in zip(accepted, orders):
+            if not command.future.done():
+                command.future.set_result(order)
+        for listener in self._commit_listeners:
+            listener()
+
+        # Счётчик номеров и корзины друг от друга не зависят (счётчик при старте всё равно
+        # сверяется с заказами), поэтому не ждём их по очереди
+        results = await asyncio.gather(
+            save_last_order_number(self._last_number, self.number_file),
+            *(clear_cart(order["user_id"], restore_quantity=False) for order in orders),
+            return_exceptions=True,
+        )
+        if isinstance(results[0], Exception):
+            logger.error("Не удалось сохранить счётчик номеров заказов (%s): %s", self._last_number, results[0])
+        for order, result in zip(orders, results[1:]):
+            if isinstance(result, Exception):
+                logger.error("Не удалось очистить корзину пользователя %s после заказа №%s: %s",
+                             order["user_id"], order["order_number"], result)
+        logger.info("Групповой коммит: заказы №%s–%s (%s шт.)", orders[0]['order_number'], orders[-1]['order_number'], len(orders))
+
+
+order_pipeline = OrderPipeline(pending_orders_repository)
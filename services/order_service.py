@@ -1,159 +1,148 @@
 # services/order_service.py
-import aiofiles
 from models.models import Order, CartItem
-from storage.orders_storage import generate_order_number, save_pending_order
-from storage.conversations_storage import get_user_cart, clear_cart
-from config.config import ADMIN_ID, PENDING_ORDERS_FILE
-import json
+from storage.orders_storage import remove_pending_order, save_order_to_history
+from storage.pending_orders_storage import pending_orders_repository
+from services.order_pipeline import order_pipeline
+from services.outbox_service import outbox_message
+from storage.conversations_storage import get_user_info, update_user_info
+from config.config import ADMIN_ID
 import logging
 from datetime import datetime
 from aiogram import Bot
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, User
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from models.callbacks import CoffeeCatalog, IssueOrder
 
 
 logger = logging.getLogger(__name__)
 
 
-async def create_pickup_order(user_id: int, bot: Bot, comment: str, cart: list[dict], total: float) -> str:
-    # Получаем данные пользователя через Telegram API
-    user = await bot.get_chat(user_id)
-    full_name = user.full_name if user.full_name else "Неизвестный пользователь"
-    username = user.username
+def _cart_lines(cart: list[dict]) -> str:
+    return "".join(f"- {item['name']} ({item['weight']}г) - {item['price']}\n" for item in cart)
 
-    order_number = await generate_order_number()
-    order = Order(
-        order_number=order_number,
-        user_id=user_id,
-        full_name=full_name,
-        username=username,
-        cart=cart,
-        payment_method="Самовывоз (оплата при получении)",
-        total=total,
-        comment=comment if comment.lower() != "нет" else "Без комментария",
-        issued=False,
-        issue_date=None
-    )
-    
-    order_data = order.__dict__
-    await save_pending_order(order_data)
-    
+
+def _pickup_notifications(order: dict) -> list[dict]:
+    """Уведомления покупателю и администратору о заказе с самовывозом."""
+    order_number = order["order_number"]
     user_order_text = (
         f"✅ *Заказ №{order_number} оформлен!*\n"
         f"🛒 *Ваш заказ:*\n"
-        f"{''.join(f'- {item['name']} ({item['weight']}г) - {item['price']}\n' for item in cart)}\n"
+        f"{_cart_lines(order['cart'])}\n"
         f"Способ оплаты: Самовывоз (оплата при получении)\n"
-        f"Комментарий: {order.comment}\n"
+        f"Комментарий: {order['comment']}\n"
         f"Заберите ваш заказ по адресу: город Минск ул. Неждановой д. 37 понедельник - пятница 9-17 часов\n"
         f"Оплата наличными или картой при получении."
     )
-    
-    await bot.send_message(
-        chat_id=user_id,
-        text=user_order_text,
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="Вернуться в магазин", callback_data="coffee_catalog")]
-        ])
-    )
-    
     admin_text = (
         f"🔔 *Новый заказ №{order_number}!*\n"
-        f"Пользователь: {full_name} (ID: {user_id}, @{username})\n"
+        f"Пользователь: {order['full_name']} (ID: {order['user_id']}, @{order['username']})\n"
         f"🛒 *Заказ:*\n"
-        f"{''.join(f'- {item['name']} ({item['weight']}г) - {item['price']}\n' for item in cart)}\n"
+        f"{_cart_lines(order['cart'])}\n"
         f"Способ оплаты: Самовывоз (оплата при получении)\n"
-        f"Сумма: {total:.2f} руб.\n"
-        f"Комментарий: {order.comment}"
-    )
-    
-    await bot.send_message(
-        chat_id=ADMIN_ID,
-        text=admin_text,
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="Выдать заказ", callback_data=f"issue_order_{order_number}")]
-        ])
-    )
-    
-    await clear_cart(user_id, restore_quantity=False)
-    logger.info(f"Заказ №{order_number} создан и сохранён для пользователя {user_id}")
-    return order_number
+        f"Сумма: {order['total']:.2f} руб.\n"
+        f"Комментарий: {order['comment']}"
+    )
+    return [
+        outbox_message(
+            f"{order_number}:user", order["user_id"], user_order_text, parse_mode="Markdown",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="Вернуться в магазин", callback_data=CoffeeCatalog().pack())]
+            ])
+        ),
+        outbox_message(
+            f"{order_number}:admin", ADMIN_ID, admin_text, parse_mode="Markdown",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="Выдать заказ", callback_data=IssueOrder(order_number).pack())]
+            ])
+        ),
+    ]
 
-# services/order_service.py (фрагменты)
-async def create_europochta_order(user_id: int, bot: Bot, recipient_name: str, address: str, post_office_number: str, cart: list[dict], total: float) -> str:
-    # Получаем данные пользователя через Telegram API
-    user: User = await bot.get_chat(user_id)
-    full_name = user.full_name if user.full_name else "Неизвестный пользователь"
-    username = user.username
 
-    order_number = await generate_order_number()
-    order = Order(
-        order_number=order_number,
-        user_id=user_id,
-        full_name=full_name,  # Реальное имя пользователя
-        username=username,    # Реальный username (если есть)
-        cart=cart,           # cart уже список словарей
-        payment_method="Европочта (оплата при получении)",
-        total=total,
-        recipient_name=recipient_name,
-        address=address,
-        post_office_number=post_office_number,
-        issued=False,
-        issue_date=None
-    )
-    
-    order_data = order.__dict__
-    await save_pending_order(order_data)
-    
-    user_order_text = (
+def _europochta_notifications(order: dict) -> list[dict]:
+    """Уведомления покупателю и администратору о заказе с доставкой Европочтой."""
+    order_number = order["order_number"]
+    order_text = (
         f"✅ *Заказ №{order_number} оформлен!*\n"
         f"🛒 *Ваш заказ:*\n"
-        f"{''.join(f'- {item['name']} ({item['weight']}г) - {item['price']}\n' for item in cart)}\n"
-        f"Способ оплаты: Самовывоз (оплата при получении)\n"
-        f"Комментарий: {order.comment}\n"
-        f"Заберите ваш заказ по адресу: город Минск ул. Неждановой д. 37 понедельник - пятница 9-17 часов\n"
-        f"Оплата наличными или картой при получении."
-    )
-    
-    await bot.send_message(
-        chat_id=user_id,
-        text=user_order_text,
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="Вернуться в магазин", callback_data="back_to_shop_from_order")]
-        ])
+        f"{_cart_lines(order['cart'])}\n"
+        f"Способ оплаты: Европочта (оплата при получении)\n"
+        f"Получатель: {order['recipient_name']}\n"
+        f"Адрес: {order['address']}\n"
+        f"Номер отделения: {order['post_office_number']}\n"
+        f"Оплата при получении в отделении почты."
     )
-    
     admin_text = (
         f"🔔 *Новый заказ №{order_number}!*\n"
-        f"Пользователь: {order.full_name} (ID: {user_id}, @{order.username})\n"
+        f"Пользователь: {order['full_name']} (ID: {order['user_id']}, @{order['username']})\n"
         f"🛒 *Заказ:*\n"
-        f"{''.join(f'- {item['name']} ({item['weight']}г) - {item['price']}\n' for item in cart)}\n"
-        f"Способ оплаты: Самовывоз (оплата при получении)\n"
-        f"Сумма: {total:.2f} руб.\n"
-        f"Комментарий: {order.comment}"
-    )
-    
-    await bot.send_message(
-        chat_id=ADMIN_ID,
-        text=admin_text,
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="Выдать заказ", callback_data=f"issue_order_{order_number}")]
-        ])
+        f"{_cart_lines(order['cart'])}\n"
+        f"Способ оплаты: Европочта (оплата при получении)\n"
+        f"Получатель: {order['recipient_name']}\n"
+        f"Адрес: {order['address']}\n"
+        f"Номер отделения: {order['post_office_number']}\n"
+        f"Сумма: {order['total']:.2f} руб."
+    )
+    return [
+        outbox_message(
+            f"{order_number}:user", order["user_id"], order_text, parse_mode="Markdown",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="Вернуться в магазин", callback_data=CoffeeCatalog().pack())]
+            ])
+        ),
+        outbox_message(
+            f"{order_number}:admin", ADMIN_ID, admin_text, parse_mode="Markdown",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="Выдать заказ", callback_data=IssueOrder(order_number).pack())]
+            ])
+        ),
+    ]
+
+
+async def get_user_profile(user_id: int, bot: Bot) -> dict:
+    """
+    Имя и username покупателя. Обычно берутся из кэша, который наполняет UserProfileMiddleware;
+    в Telegram (bot.get_chat) идём, только если профиля в кэше ещё нет.
+    """
+    user_info = await get_user_info(user_id)
+    if user_info.get("full_name"):
+        return user_info
+    chat = await bot.get_chat(user_id)
+    user_info = {"full_name": chat.full_name, "username": chat.username}
+    await update_user_info(user_id, user_info)
+    return user_info
+
+
+async def create_pickup_order(user_id: int, bot: Bot, comment: str, cart: list[dict], total: float) -> str:
+    user_info = await get_user_profile(user_id, bot)
+
+    order = Order(
+        order_number="",  # Номер назначает конвейер заказов
+        user_id=user_id,
+        full_name=user_info.get("full_name") or "Неизвестный пользователь",
+        username=user_info.get("username"),
+        cart=cart,
+        payment_method="Самовывоз (оплата при получении)",
+        total=total,
+        comment=comment if comment.lower() != "нет" else "Без комментария",
+        issued=False,
+        issue_date=None,
+        created_at=datetime.now().isoformat()
     )
-    
-    await clear_cart(user_id, restore_quantity=False)
-    logger.info(f"Заказ №{order_number} создан и сохранён для пользователя {user_id}")
+
+    # Номер, запись в pending_orders, уведомления в outbox и очистка корзины — одним групповым коммитом.
+    # Сами уведомления доставляет outbox_worker, оформление не ждёт Telegram.
+    order_data = await order_pipeline.place_order(order.__dict__, notifications=_pickup_notifications)
+    order_number = order_data["order_number"]
+    logger.info("Заказ №%s создан и сохранён для пользователя %s", order_number, user_id)
     return order_number
 
 async def create_europochta_order(user_id: int, bot: Bot, recipient_name: str, address: str, post_office_number: str, cart: list[dict], total: float) -> str:
-    order_number = await generate_order_number()
+    user_info = await get_user_profile(user_id, bot)
+
     order = Order(
-        order_number=order_number,
+        order_number="",  # Номер назначает конвейер заказов
         user_id=user_id,
-        full_name="Имя пользователя",  # Замени на реальное имя из сообщения
-        username=None,  # Замени на реальный username, если доступен
+        full_name=user_info.get("full_name") or "Неизвестный пользователь",
+        username=user_info.get("username"),
         cart=cart,  # cart уже список словарей
         payment_method="Европочта (оплата при получении)",
         total=total,
@@ -161,88 +150,34 @@ async def create_europochta_order(user_id: int, bot: Bot, recipient_name: str, a
         address=address,
         post_office_number=post_office_number,
         issued=False,
-        issue_date=None
+        issue_date=None,
+        created_at=datetime.now().isoformat()
     )
-    
-    order_data = order.__dict__
-    await save_pending_order(order_data)
-    
-    order_text = (
-        f"✅ *Заказ №{order_number} оформлен!*\n"
-        f"🛒 *Ваш заказ:*\n"
-        f"{''.join(f'- {item['name']} ({item['weight']}г) - {item['price']}\n' for item in cart)}\n"
-        f"Способ оплаты: Европочта (оплата при получении)\n"
-        f"Получатель: {recipient_name}\n"
-        f"Адрес: {address}\n"
-        f"Номер отделения: {post_office_number}\n"
-        f"Оплата при получении в отделении почты."
-    )
-    
-    await bot.send_message(
-        chat_id=user_id,
-        text=order_text,
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="Вернуться в магазин", callback_data="coffee_catalog")]
-        ])
-    )
-    
-    admin_text = (
-        f"🔔 *Новый заказ №{order_number}!*\n"
-        f"Пользователь: {order.full_name} (ID: {user_id}, @{order.username})\n"
-        f"🛒 *Заказ:*\n"
-        f"{''.join(f'- {item['name']} ({item['weight']}г) - {item['price']}\n' for item in cart)}\n"
-        f"Способ оплаты: Европочта (оплата при получении)\n"
-        f"Получатель: {recipient_name}\n"
-        f"Адрес: {address}\n"
-        f"Номер отделения: {post_office_number}\n"
-        f"Сумма: {total:.2f} руб."
-    )
-    
-    await bot.send_message(
-        chat_id=ADMIN_ID,
-        text=admin_text,
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="Выдать заказ", callback_data=f"issue_order_{order_number}")]
-        ])
-    )
-    
-    await clear_cart(user_id, restore_quantity=False)
-    logger.info(f"Заказ №{order_number} создан и сохранён для пользователя {user_id}")
+
+    order_data = await order_pipeline.place_order(order.__dict__, notifications=_europochta_notifications)
+    order_number = order_data["order_number"]
+    logger.info("Заказ №%s создан и сохранён для пользователя %s", order_number, user_id)
     return order_number
 
 async def issue_order(order_number: str, bot: Bot) -> None:
-    try:
-        async with aiofiles.open(PENDING_ORDERS_FILE, 'r', encoding='utf-8') as f:
-            content = await f.read()
-            pending_orders = json.loads(content) if content else {"orders": []}
-    except FileNotFoundError:
-        logger.error(f"Файл {PENDING_ORDERS_FILE} не найден!")
-        return
-
-    order_data = next((order for order in pending_orders["orders"] if order["order_number"] == order_number), None)
+    order_data = await pending_orders_repository.get(order_number)
     if not order_data:
-        logger.error(f"Заказ №{order_number} не найден в ожидающих заказах!")
+        logger.error("Заказ №%s не найден в ожидающих заказах!", order_number)
         return
 
-    order_data["issued"] = True
-    order_data["issue_date"] = datetime.now().isoformat()
-
-    async with aiofiles.open("order_history.json", 'r', encoding='utf-8') as f:
-        content = await f.read()
-        history = json.loads(content) if content else {"orders": []}
-    history["orders"].append(order_data)
-
-    async with aiofiles.open("order_history.json", 'w', encoding='utf-8') as f:
-        await f.write(json.dumps(history, ensure_ascii=False, indent=2))
-
-    pending_orders["orders"] = [order for order in pending_orders["orders"] if order["order_number"] != order_number]
-    async with aiofiles.open(PENDING_ORDERS_FILE, 'w', encoding='utf-8') as f:
-        await f.write(json.dumps(pending_orders, ensure_ascii=False, indent=2))
+    order_data = {**order_data, "issued": True, "issue_date": datetime.now().isoformat()}
+    # Из ожидающих заказ убирается, только когда он уже лежит в истории
+    if not await save_order_to_history(order_data):
+        await bot.send_message(
+            chat_id=ADMIN_ID,
+            text=f"Не удалось записать заказ №{order_number} в историю. Заказ остался в ожидающих, "
+                 f"нажмите «Выдать заказ» ещё раз."
+        )
+        return
+    await remove_pending_order(order_number)
 
     await bot.send_message(
         chat_id=ADMIN_ID,
         text=f"Заказ №{order_number} успешно выдан и записан в историю."
     )
-    logger.info(f"Заказ №{order_number} выдан и перемещён в историю")
\ No newline at end of file
+    logger.info("Заказ №%s выдан и перемещён в историю", order_number)
\ No newline at end of file
@@ -0,0 +1,146 @@
+# services/outbox_service.py
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.types import InlineKeyboardMarkup
+from config.config import OUTBOX_BASE_DELAY, OUTBOX_MAX_DELAY, OUTBOX_POLL_INTERVAL
+from storage.pending_orders_storage import PendingOrdersRepository, pending_orders_repository
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_message(message_id: str, chat_id: int, text: str, parse_mode: Optional[str] = None,
+                   reply_markup: Optional[InlineKeyboardMarkup] = None) -> Dict[str, Any]:
+    """Уведомление для outbox в виде, пригодном для записи в журнал."""
+    return {
+        "id": message_id,
+        "chat_id": chat_id,
+        "text": text,
+        "parse_mode": parse_mode,
+        "reply_markup": reply_markup.model_dump(exclude_none=True) if reply_markup else None,
+    }
+
+
+class OutboxWorker:
+    """
+    Фоновая доставка уведомлений из outbox. Каждое уведомление отправляется, пока
+    не будет доставлено: после ошибки — повтор с экспоненциальной задержкой и джиттером.
+    Доставленные отмечаются в журнале, поэтому после перезапуска повторно не уходят;
+    одно и то же уведомление никогда не отправляется параллельно дважды.
+    """
+
+    def __init__(self, repository: PendingOrdersRepository, base_delay: float = OUTBOX_BASE_DELAY,
+                 max_delay: float = OUTBOX_MAX_DELAY, poll_interval: float = OUTBOX_POLL_INTERVAL):
+        self.repository = repository
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.bot: Optional[Bot] = None
+        self._retry: Dict[str, Tuple[int, float]] = {}  # id -> (попыток, время следующей попытки)
+        self._in_flight: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.retries = 0
+        self.dropped = 0
+
+    def start(self, bot: Bot) -> None:
+        self.bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="outbox-worker")
+            logger.info("Доставка уведомлений из outbox запущена")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        """Проверить outbox сейчас, не дожидаясь таймера (вызывается после коммита заказов)."""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                sleep_for = await self.process_once()
+            except Exception as e:
+                logger.error("Ошибка в доставке outbox: %s", e)
+                sleep_for = self.poll_interval
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_for)
+            except asyncio.TimeoutError:
+                pass
+
+    async def process_once(self) -> float:
+        """Отправляет все уведомления, которым пора, и возвращает, сколько можно спать до следующих."""
+        now = time.monotonic()
+        pending = await self.repository.outbox_pending()
+        due = [
+            message for message in pending
+            if message["id"] not in self._in_flight and self._retry.get(message["id"], (0, 0.0))[1] <= now
+        ]
+        if due:
+            results = await asyncio.gather(*(self._deliver(message) for message in due))
+            finished = [message["id"] for message, done in zip(due, results) if done]
+            await self.repository.ack_outbox(finished)
+            for message_id in finished:
+                self._retry.pop(message_id, None)
+
+        waits = [next_at - time.monotonic() for _, next_at in self._retry.values()]
+        return max(0.0, min(waits + [self.poll_interval]))
+
+    async def _deliver(self, message: Dict[str, Any]) -> bool:
+        """True — уведомление доставлено или отброшено навсегда, False — нужен повтор."""
+        message_id = message["id"]
+        self._in_flight.add(message_id)
+        try:
+            markup = InlineKeyboardMarkup.model_validate(message["reply_markup"]) if message.get("reply_markup") else None
+            try:
+                await self.bot.send_message(
+                    chat_id=message["chat_id"], text=message["text"],
+                    parse_mode=message.get("parse_mode"), reply_markup=markup,
+                )
+            except TelegramBadRequest as e:
+                if not message.get("parse_mode"):
+                    raise
+                # Разметку ломают пользовательские данные (комментарий, адрес) — отправляем простым текстом
+                logger.warning("Уведомление %s не прошло с разметкой (%s), отправляем без неё", message_id, e)
+                await self.bot.send_message(chat_id=message["chat_id"], text=message["text"], reply_markup=markup)
+            self.delivered += 1
+            logger.info("Уведомление %s доставлено в чат %s", message_id, message['chat_id'])
+            return True
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            self.dropped += 1
+            logger.error("Уведомление %s отброшено, Telegram отказал окончательно: %s", message_id, e)
+            return True
+        except Exception as e:
+            attempts = self._retry.get(message_id, (0, 0.0))[0] + 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            self._retry[message_id] = (attempts, time.monotonic() + delay)
+            self.retries += 1
+            logger.warning("Уведомление %s не доставлено (%s), попытка %s, повтор через %.1f с", message_id, e, attempts, delay)
+            return False
+        finally:
+            self._in_flight.discard(message_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "delivered": self.delivered,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "waiting_retry": len(self._retry),
+        }
+
+
+outbox_worker = OutboxWorker(pending_orders_repository)
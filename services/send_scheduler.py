@@ -0,0 +1,236 @@
+# services/send_scheduler.py
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Deque, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage, EditMessageCaption, EditMessageMedia, EditMessageReplyMarkup, EditMessageText,
+    ForwardMessage, SendAnimation, SendDocument, SendMediaGroup, SendMessage, SendPhoto, SendVideo, SendVoice,
+)
+from config.config import (
+    ADMIN_ID, SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_GROUP_RATE_PER_MIN, SEND_MAX_RETRIES,
+)
+from utils.rate_limit import TokenBucket
+from utils.stats import percentile
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Методы Bot API, которые Telegram считает отправкой сообщений и ограничивает по частоте
+LIMITED_METHODS = (
+    SendMessage, SendPhoto, SendMediaGroup, SendDocument, SendAnimation, SendVideo, SendVoice,
+    CopyMessage, ForwardMessage, EditMessageText, EditMessageCaption, EditMessageMedia, EditMessageReplyMarkup,
+)
+
+# Сколько последних задержек на полосу хранить для перцентилей
+DELAY_SAMPLES = 1000
+# При таком числе корзин чатов неиспользуемые удаляются
+CHAT_BUCKETS_PRUNE_AT = 10000
+
+
+class Priority(IntEnum):
+    """Полосы приоритета: меньше — раньше."""
+    HIGH = 0    # уведомления администратору, подтверждения заказов
+    NORMAL = 1
+    LOW = 2     # просмотр каталога
+
+
+send_priority: ContextVar[Optional[Priority]] = ContextVar("send_priority", default=None)
+
+
+@contextmanager
+def outbound_priority(priority: Priority):
+    """Все отправки внутри блока идут в полосе priority."""
+    token = send_priority.set(priority)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+class PriorityMiddleware(BaseMiddleware):
+    """Задаёт полосу приоритета для всех отправок из хендлеров роутера."""
+
+    def __init__(self, priority: Priority):
+        self.priority = priority
+
+    async def __call__(self, handler, event, data):
+        with outbound_priority(self.priority):
+            return await handler(event, data)
+
+
+class LaneStats:
+    """Задержка в очереди планировщика для одной полосы."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=DELAY_SAMPLES)
+
+    def observe(self, delay: float) -> None:
+        self.count += 1
+        self.total += delay
+        self.max = max(self.max, delay)
+        self.samples.append(delay)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": percentile(self.samples, 50),
+            "p95": percentile(self.samples, 95),
+            "max": self.max,
+        }
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Планировщик исходящих запросов к Bot API (middleware сессии aiogram).
+
+    Отправки ограничиваются маркерными корзинами: общей на бота (~30 сообщений/с),
+    на личный чат (~1 сообщение/с с небольшим запасом) и на группу (~20 сообщений/мин).
+    Ожидающие запросы выпускаются по приоритету полос, внутри полосы — по порядку.
+    TelegramRetryAfter обрабатывается автоматически: чат блокируется на retry_after,
+    и запрос повторяется.
+    """
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, chat_rate: float = SEND_CHAT_RATE,
+                 chat_burst: int = SEND_CHAT_BURST, group_rate_per_min: float = SEND_GROUP_RATE_PER_MIN,
+                 max_retries: int = SEND_MAX_RETRIES):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate_per_min / 60
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._waiters: List[Any] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump_task: Optional[asyncio.Task] = None
+        self.lanes: Dict[Priority, LaneStats] = {priority: LaneStats() for priority in Priority}
+        self.retry_after_count = 0
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= CHAT_BUCKETS_PRUNE_AT:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle(now)}
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_rate, 1, now)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    @staticmethod
+    def _priority(chat_id: int) -> Priority:
+        priority = send_priority.get()
+        if priority is not None:
+            return priority
+        return Priority.HIGH if chat_id == ADMIN_ID else Priority.NORMAL
+
+    async def _acquire(self, chat_id: int, priority: Priority) -> None:
+        now = time.monotonic()
+        bucket = self._chat_bucket(chat_id, now)
+        # Быстрый путь: очереди нет и обе корзины позволяют отправить сразу
+        if not self._waiters and not self._global.delay(now) and not bucket.delay(now):
+            self._global.take(now)
+            bucket.take(now)
+            self.lanes[priority].observe(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), chat_id, now, future))
+        self._ensure_pump()
+        self._wakeup.set()
+        await future
+
+    def _ensure_pump(self) -> None:
+        if self._pump_task is None or self._pump_task.done():
+            self._wakeup = asyncio.Event()
+            self._pump_task = asyncio.create_task(self._pump(), name="send-scheduler")
+
+    async def _pump(self) -> None:
+        """Выпускает ожидающих по приоритету, пока позволяют корзины."""
+        while True:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            sleep_for = None
+            global_delay = self._global.delay(now)
+            if global_delay:
+                sleep_for = global_delay
+            else:
+                # Самый приоритетный ожидающий, чей чат уже свободен; занятый чат не задерживает остальных
+                for entry in sorted(self._waiters):
+                    priority, _, chat_id, enqueued, future = entry
+                    if future.done():
+                        self._waiters.remove(entry)
+                        heapq.heapify(self._waiters)
+                        sleep_for = 0.0
+                        break
+                    bucket = self._chat_bucket(chat_id, now)
+                    chat_delay = bucket.delay(now)
+                    if not chat_delay:
+                        self._global.take(now)
+                        bucket.take(now)
+                        self._waiters.remove(entry)
+                        heapq.heapify(self._waiters)
+                        self.lanes[priority].observe(now - enqueued)
+                        future.set_result(None)
+                        sleep_for = 0.0
+                        break
+                    sleep_for = chat_delay if sleep_for is None else min(sleep_for, chat_delay)
+
+            if sleep_for:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=sleep_for)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(0)
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if not isinstance(method, LIMITED_METHODS) or not isinstance(chat_id, int):
+            return await make_request(bot, method)
+
+        priority = self._priority(chat_id)
+        for attempt in range(self.max_retries + 1):
+            with tracer.span("send_scheduler.wait", priority=priority.name.lower()):
+                await self._acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after_count += 1
+                if attempt == self.max_retries:
+                    raise
+                logger.warning("RetryAfter %s с для чата %s (%s), попытка %s", e.retry_after, chat_id, type(method).__name__, attempt + 1)
+                self._chat_bucket(chat_id, time.monotonic()).block(time.monotonic(), e.retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики планировщика: задержки в очереди по полосам, длина очереди, число RetryAfter."""
+        return {
+            "queued": len(self._waiters),
+            "retry_after": self.retry_after_count,
+            "chats": len(self._chats),
+            "lanes": {priority.name.lower(): lane.snapshot() for priority, lane in self.lanes.items()},
+        }
+
+
+send_scheduler = SendScheduler()
@@ -13,13 +13,13 @@ def load_bot_mind() -> Dict[str, Any]:
             data = json.load(f)
             return data
     except FileNotFoundError:
-        logger.warning(f"Файл {BOT_MIND_FILE} не найден, возвращается пустой словарь")
+        logger.warning("Файл %s не найден, возвращается пустой словарь", BOT_MIND_FILE)
         return {"coffee_shop": []}
     except json.JSONDecodeError as e:
-        logger.error(f"Ошибка декодирования JSON в {BOT_MIND_FILE}: {e}")
+        logger.error("Ошибка декодирования JSON в %s: %s", BOT_MIND_FILE, e)
         return {"coffee_shop": []}
     except Exception as e:
-        logger.error(f"Ошибка при загрузке bot_mind: {e}")
+        logger.error("Ошибка при загрузке bot_mind: %s", e)
         return {"coffee_shop": []}
 
 def save_bot_mind(data: Dict[str, Any]):
@@ -27,9 +27,9 @@ def save_bot_mind(data: Dict[str, Any]):
     try:
         with open(BOT_MIND_FILE, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
-        logger.info(f"Данные сохранены в {BOT_MIND_FILE}")
+        logger.info("Данные сохранены в %s", BOT_MIND_FILE)
     except Exception as e:
-        logger.error(f"Ошибка при сохранении в {BOT_MIND_FILE}: {e}")
+        logger.error("Ошибка при сохранении в %s: %s", BOT_MIND_FILE, e)
 
 def get_coffee_list() -> List[Dict]:
     """Получает список кофе из bot_mind.json."""
@@ -2,6 +2,7 @@
 import json
 import aiofiles
 import logging
+from utils.metrics import timed_storage
 from config.config import CONVERSATIONS_FILE  # Укажи полный путь
 from datetime import datetime
 from typing import Dict, Any, List
@@ -9,6 +10,7 @@ from typing import Dict, Any, List
 logger = logging.getLogger(__name__)
 conversations_cache: Dict[str, Any] = {}
 
+@timed_storage("conversations")
 async def load_conversations_to_cache():
     """Загружает данные из файла в кэш."""
     global conversations_cache
@@ -18,9 +20,10 @@ async def load_conversations_to_cache():
             conversations_cache = json.loads(content) if content else {}
         logger.info("Кэш загружен из файла")
     except Exception as e:
-        logger.error(f"Ошибка при загрузке кэша: {e}")
+        logger.error("Ошибка при загрузке кэша: %s", e)
         conversations_cache = {}
 
+@timed_storage("conversations")
 async def save_conversations_from_cache():
     """Сохраняет кэш в файл."""
     try:
@@ -28,17 +31,38 @@ async def save_conversations_from_cache():
             await f.write(json.dumps(conversations_cache, indent=4, ensure_ascii=False))
         logger.info("Кэш сохранен в файл")
     except Exception as e:
-        logger.error(f"Ошибка при сохранении кэша: {e}")
+        logger.error("Ошибка при сохранении кэша: %s", e)
 
+@timed_storage("conversations")
 async def get_conversation(user_id: int) -> Dict[str, Any]:
     """Получает историю чата из кэша."""
     return conversations_cache.get(str(user_id), {"user_info": {}, "messages": [], "cart": []})
 
+@timed_storage("conversations")
 async def save_conversation(user_id: int, data: Dict[str, Any]):
     """Сохраняет данные в кэш."""
     conversations_cache[str(user_id)] = data
-    logger.info(f"Данные сохранены в кэш для пользователя {user_id}")
+    logger.debug("Данные сохранены в кэш для пользователя %s", user_id)
 
+@timed_storage("conversations")
+async def get_user_info(user_id: int) -> Dict[str, Any]:
+    """Возвращает сохранённый профиль пользователя (имя, username) или пустой словарь."""
+    conversation = conversations_cache.get(str(user_id)) or {}
+    return conversation.get("user_info") or {}
+
+@timed_storage("conversations")
+async def update_user_info(user_id: int, user_info: Dict[str, Any]) -> bool:
+    """Обновляет профиль пользователя в кэше. Возвращает True, если профиль изменился."""
+    conversation = conversations_cache.get(str(user_id))
+    if conversation is not None and conversation.get("user_info") == user_info:
+        return False
+    if conversation is None:
+        conversation = conversations_cache[str(user_id)] = {"user_info": {}, "messages": [], "cart": []}
+    conversation["user_info"] = user_info
+    logger.debug("Профиль пользователя %s обновлён: %s", user_id, user_info)
+    return True
+
+@timed_storage("conversations")
 async def update_chat_history(user_id: int, message: str, role: str = "user"):
     """Обновляет историю чата."""
     conversation = await get_conversation(user_id) or {"user_info": {}, "messages": []}
@@ -50,8 +74,10 @@ async def update_chat_history(user_id: int, message: str, role: str = "user"):
     if len(conversation["messages"]) > 20:
         conversation["messages"] = conversation["messages"][-20:]
     await save_conversation(user_id, conversation)
-    logger.info(f"Обновлена история для пользователя {user_id}: {conversation}")
+    # Вся переписка — только на DEBUG: на INFO это мегабайты лога на каждое сообщение
+    logger.debug("Обновлена история для пользователя %s: %s", user_id, conversation)
 
+@timed_storage("conversations")
 async def get_user_cart(user_id: int) -> list:
     """
     Возвращает корзину пользователя по его ID.
@@ -59,6 +85,7 @@ async def get_user_cart(user_id: int) -> list:
     conversation = await get_conversation(user_id)
     return conversation.get("cart", [])
 
+@timed_storage("conversations")
 async def clear_cart(user_id: int, restore_quantity: bool = False) -> None:
     """
     Очищает корзину пользователя.
@@ -71,4 +98,4 @@ async def clear_cart(user_id: int, restore_quantity: bool = False) -> None:
             pass
         conversation["cart"] = []  # Очищаем корзину
         await save_conversation(user_id, conversation)
-        logger.info(f"Корзина пользователя {user_id} очищена")
\ No newline at end of file
+        logger.info("Корзина пользователя %s очищена", user_id)
\ No newline at end of file
@@ -0,0 +1,242 @@
+# storage/fsm_storage.py
+import asyncio
+import json
+import os
+import time
+import aiofiles
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from config import FSM_STATES_FILE, FSM_STATES_JOURNAL_FILE
+from config.config import FSM_STATE_TTL, FSM_FLUSH_INTERVAL, FSM_FLUSH_BATCH
+from utils.metrics import STORAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# После стольких записей в журнале он сворачивается в снимок
+JOURNAL_COMPACT_THRESHOLD = 2000
+# Как часто искать брошенные состояния, с
+SWEEP_INTERVAL = 600
+
+
+@dataclass
+class FSMRecord:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    touched: float = 0.0
+
+
+def _key_to_json(key: StorageKey) -> List[Any]:
+    return [key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny]
+
+
+def _key_from_json(value: List[Any]) -> StorageKey:
+    bot_id, chat_id, user_id, thread_id, business_connection_id, destiny = value
+    return StorageKey(bot_id=bot_id, chat_id=chat_id, user_id=user_id, thread_id=thread_id,
+                      business_connection_id=business_connection_id, destiny=destiny)
+
+
+class JournalFSMStorage(BaseStorage):
+    """
+    FSM-хранилище aiogram, которое переживает перезапуск бота.
+
+    Чтение и запись идут в словарь в памяти, как у MemoryStorage. Изменения копятся
+    и раз в flush_interval (или при накоплении flush_batch ключей) дописываются в журнал
+    одной записью с fsync; несколько изменений одного ключа за это время превращаются
+    в одну запись. Состояния, которые не трогали дольше ttl, удаляются — брошенное
+    оформление заказа не висит в памяти и на диске вечно.
+    """
+
+    def __init__(self, snapshot_file: str = FSM_STATES_FILE, journal_file: str = FSM_STATES_JOURNAL_FILE,
+                 ttl: float = FSM_STATE_TTL, flush_interval: float = FSM_FLUSH_INTERVAL,
+                 flush_batch: int = FSM_FLUSH_BATCH, compact_threshold: int = JOURNAL_COMPACT_THRESHOLD):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.compact_threshold = compact_threshold
+        self._records: Dict[StorageKey, FSMRecord] = {}
+        self._dirty: Dict[StorageKey, None] = {}
+        self._journal_records = 0
+        self._last_sweep = time.time()
+        self._flush_needed = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.expired = 0
+
+    # --- загрузка и запись на диск ---
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        key = _key_from_json(record["key"])
+        if record.get("op") == "del":
+            self._records.pop(key, None)
+        else:
+            self._records[key] = FSMRecord(state=record.get("state"), data=record.get("data") or {},
+                                           touched=record.get("touched", 0.0))
+
+    async def load(self) -> None:
+        """Загружает снимок, проигрывает поверх него журнал и сразу отбрасывает просроченные состояния."""
+        self._records.clear()
+        try:
+            async with aiofiles.open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                content = await f.read()
+            for record in (json.loads(content) if content else []):
+                self._apply(record)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error("Ошибка при загрузке %s: %s", self.snapshot_file, e)
+
+        self._journal_records = 0
+        try:
+            async with aiofiles.open(self.journal_file, 'r', encoding='utf-8') as f:
+                async for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        self._apply(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Оборванная последняя строка после аварийного завершения
+                        logger.warning("Пропущена повреждённая запись журнала %s", self.journal_file)
+                        continue
+                    self._journal_records += 1
+        except FileNotFoundError:
+            pass
+
+        self._sweep(time.time())
+        logger.info("Загружено FSM-состояний: %s (записей в журнале: %s)", len(self._records), self._journal_records)
+
+    def _record_json(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._records.get(key)
+        if record is None:
+            return {"op": "del", "key": _key_to_json(key)}
+        return {"op": "put", "key": _key_to_json(key), "state": record.state, "data": record.data,
+                "touched": record.touched}
+
+    async def flush(self) -> None:
+        """Дописывает накопленные изменения в журнал одной записью."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            keys = list(self._dirty)
+            self._dirty.clear()
+            payload = "".join(json.dumps(self._record_json(key), ensure_ascii=False) + "\n" for key in keys)
+            try:
+                with STORAGE_LATENCY.time(store="fsm", operation="journal_flush"):
+                    async with aiofiles.open(self.journal_file, 'a', encoding='utf-8') as f:
+                        await f.write(payload)
+                        await f.flush()
+                        await asyncio.to_thread(os.fsync, f.fileno())
+            except BaseException:
+                # Не потеряли: ключи снова помечены и уйдут со следующей записью (или при close)
+                self._dirty.update(dict.fromkeys(keys))
+                raise
+            self.flushes += 1
+            self._journal_records += len(keys)
+            if self._journal_records >= self.compact_threshold:
+                await self._compact()
+
+    async def _compact(self) -> None:
+        """Сворачивает журнал в снимок и очищает журнал."""
+        tmp_file = f"{self.snapshot_file}.tmp"
+        records = [self._record_json(key) for key in self._records]
+        async with aiofiles.open(tmp_file, 'w', encoding='utf-8') as f:
+            await f.write(json.dumps(records, ensure_ascii=False))
+        os.replace(tmp_file, self.snapshot_file)
+        async with aiofiles.open(self.journal_file, 'w', encoding='utf-8') as f:
+            await f.write("")
+        logger.info("Журнал FSM свёрнут (%s записей, состояний: %s)", self._journal_records, len(records))
+        self._journal_records = 0
+
+    def _sweep(self, now: float) -> None:
+        """Удаляет состояния, которые не менялись дольше ttl."""
+        self._last_sweep = now
+        expired = [key for key, record in self._records.items() if now - record.touched > self.ttl]
+        for key in expired:
+            del self._records[key]
+            self._dirty[key] = None
+        if expired:
+            self.expired += len(expired)
+            logger.info("Удалено брошенных FSM-состояний: %s", len(expired))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            now = time.time()
+            if now - self._last_sweep >= SWEEP_INTERVAL:
+                self._sweep(now)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Ошибка при записи журнала FSM: %s", e)
+
+    def _touch(self, key: StorageKey) -> FSMRecord:
+        record = self._records.get(key)
+        if record is None:
+            record = self._records[key] = FSMRecord()
+        record.touched = time.time()
+        return record
+
+    def _mark_dirty(self, key: StorageKey, record: FSMRecord) -> None:
+        if record.state is None and not record.data:
+            # Пустое состояние хранить незачем — в журнал уйдёт удаление
+            self._records.pop(key, None)
+        self._dirty[key] = None
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="fsm-storage-flush")
+        if len(self._dirty) >= self.flush_batch:
+            self._flush_needed.set()
+
+    # --- интерфейс BaseStorage ---
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._touch(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._records.get(key)
+        return record.state if record is not None else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = self._touch(key)
+        record.data = data.copy()
+        self._mark_dirty(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._records.get(key)
+        return record.data.copy() if record is not None else {}
+
+    async def close(self) -> None:
+        """Останавливает фоновую запись и сбрасывает на диск всё накопленное."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Не удалось сохранить FSM-состояния при остановке: %s", e)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+fsm_storage = JournalFSMStorage()
+
+
+async def load_fsm_states():
+    """Загружает FSM-состояния пользователей при старте бота."""
+    await fsm_storage.load()
@@ -0,0 +1,137 @@
+# storage/llm_usage_storage.py
+import asyncio
+import json
+import os
+import aiofiles
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from config import LLM_USAGE_FILE
+from config.config import LLM_USAGE_KEEP_DAYS, LLM_USAGE_FLUSH_INTERVAL
+from utils.metrics import STORAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Счётчики одного пользователя или модели за день:
+# [запросов, ошибок, токенов запроса, токенов ответа, суммарное время ответа в мс]
+CALLS, ERRORS, PROMPT, COMPLETION, LATENCY_MS = range(5)
+
+
+def _new_counters() -> List[int]:
+    return [0, 0, 0, 0, 0]
+
+
+def _add(target: List[int], source: List[int]) -> None:
+    for i, value in enumerate(source):
+        target[i] += value
+
+
+class LLMUsageStore:
+    """
+    Расход нейросети по дням: для каждого дня — счётчики по пользователям и по моделям.
+    Запись — сложение в словаре в памяти; на диск раз в flush_interval уходит снимок
+    целиком (сотня пользователей за день — несколько КБ). Дни старше keep_days отбрасываются.
+    """
+
+    def __init__(self, path: str = LLM_USAGE_FILE, keep_days: int = LLM_USAGE_KEEP_DAYS,
+                 flush_interval: float = LLM_USAGE_FLUSH_INTERVAL):
+        self.path = path
+        self.keep_days = keep_days
+        self.flush_interval = flush_interval
+        # {"2026-10-19": {"users": {"123": [...]}, "models": {"model": [...]}}}
+        self._days: Dict[str, Dict[str, Dict[str, List[int]]]] = {}
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self) -> None:
+        try:
+            async with aiofiles.open(self.path, 'r', encoding='utf-8') as f:
+                content = await f.read()
+            self._days = json.loads(content) if content else {}
+        except FileNotFoundError:
+            self._days = {}
+        except Exception as e:
+            logger.error("Ошибка при загрузке %s: %s", self.path, e)
+            self._days = {}
+        self._trim(date.today())
+        logger.info("Загружена статистика нейросети за %s дн.", len(self._days))
+
+    def _trim(self, today: date) -> None:
+        oldest = (today - timedelta(days=self.keep_days - 1)).isoformat()
+        for day in [day for day in self._days if day < oldest]:
+            del self._days[day]
+
+    def record(self, user_id: Optional[int], model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               latency: float = 0.0, error: bool = False) -> None:
+        """Учитывает один запрос к нейросети (успешный или с ошибкой)."""
+        today = date.today()
+        key = today.isoformat()
+        day = self._days.get(key)
+        if day is None:
+            day = self._days[key] = {"users": {}, "models": {}}
+            self._trim(today)
+        counters = [1, int(error), prompt_tokens, completion_tokens, round(latency * 1000)]
+        _add(day["users"].setdefault(str(user_id), _new_counters()), counters)
+        _add(day["models"].setdefault(model, _new_counters()), counters)
+        self._dirty = True
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="llm-usage-flush")
+
+    def summary(self, days: int = 1, top: int = 10) -> Dict[str, Any]:
+        """Суммы за последние days дней: по моделям, всего и top пользователей по токенам."""
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        users: Dict[str, List[int]] = {}
+        models: Dict[str, List[int]] = {}
+        for day, data in self._days.items():
+            if day < since:
+                continue
+            for user_id, counters in data["users"].items():
+                _add(users.setdefault(user_id, _new_counters()), counters)
+            for model, counters in data["models"].items():
+                _add(models.setdefault(model, _new_counters()), counters)
+        total = _new_counters()
+        for counters in models.values():
+            _add(total, counters)
+        ranked = sorted(users.items(), key=lambda item: item[1][PROMPT] + item[1][COMPLETION], reverse=True)
+        return {"total": total, "models": models, "users": len(users), "top": ranked[:top]}
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        payload = json.dumps(self._days, ensure_ascii=False, separators=(",", ":"))
+        tmp_file = f"{self.path}.tmp"
+        try:
+            with STORAGE_LATENCY.time(store="llm_usage", operation="flush"):
+                async with aiofiles.open(tmp_file, 'w', encoding='utf-8') as f:
+                    await f.write(payload)
+                os.replace(tmp_file, self.path)
+        except BaseException:
+            self._dirty = True
+            raise
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Ошибка при сохранении статистики нейросети: %s", e)
+
+    async def close(self) -> None:
+        """Останавливает фоновую запись и сохраняет накопленное."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Не удалось сохранить статистику нейросети при остановке: %s", e)
+
+
+llm_usage_store = LLMUsageStore()
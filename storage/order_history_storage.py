@@ -0,0 +1,447 @@
+# storage/order_history_storage.py
+import asyncio
+import gzip
+import json
+import mmap
+import os
+import aiofiles
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from config import ORDER_HISTORY_FILE, ORDER_HISTORY_LOG_FILE, ORDER_HISTORY_INDEX_FILE, ORDER_HISTORY_DIR
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк закрытого сегмента читается в потоке за один раз
+ITER_BATCH_SIZE = 1000
+
+
+def current_month() -> str:
+    return datetime.now().strftime("%Y-%m")
+
+
+def order_date(order: Dict[str, Any]) -> str:
+    """Дата заказа для метаданных сегмента: дата выдачи, иначе дата создания."""
+    return order.get("issue_date") or order.get("created_at") or ""
+
+
+class OrderHistoryLog:
+    """
+    История заказов в формате JSON Lines: заказы только дописываются в конец файла.
+    Рядом лежит индекс (тоже JSON Lines) «номер заказа / user_id -> смещение в байтах»,
+    поэтому запись стоит O(1), а поиск заказа — одно чтение из mmap.
+    """
+
+    def __init__(self, log_file: str, index_file: str):
+        self.log_file = log_file
+        self.index_file = index_file
+        self._by_number: Dict[str, int] = {}
+        self._by_user: Dict[int, List[int]] = {}
+        self._size = 0
+        self._mm: Optional[mmap.mmap] = None
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def _index(self, order_number: str, user_id: Optional[int], offset: int) -> None:
+        self._by_number[order_number] = offset
+        self._by_user.setdefault(user_id, []).append(offset)
+
+    async def load(self) -> None:
+        """Загружает индекс и доиндексирует хвост лога, если индекс отстал (например, после сбоя)."""
+        async with self._lock:
+            await self._load()
+
+    async def _load(self) -> None:
+        self._by_number.clear()
+        self._by_user.clear()
+        last_offset = -1
+        try:
+            async with aiofiles.open(self.index_file, 'r', encoding='utf-8') as f:
+                async for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._index(entry["n"], entry.get("u"), entry["o"])
+                    last_offset = max(last_offset, entry["o"])
+        except FileNotFoundError:
+            pass
+
+        try:
+            self._size = os.path.getsize(self.log_file)
+        except FileNotFoundError:
+            self._size = 0
+
+        # Строки лога после последней проиндексированной
+        missing = []
+        if self._size:
+            async with aiofiles.open(self.log_file, 'rb') as f:
+                position = 0
+                if last_offset >= 0:
+                    await f.seek(last_offset)
+                    position = last_offset + len(await f.readline())
+                while position < self._size:
+                    line = await f.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        order = json.loads(line)
+                        missing.append({"n": order["order_number"], "u": order.get("user_id"), "o": position})
+                    except (json.JSONDecodeError, KeyError):
+                        logger.warning("Пропущена повреждённая строка %s на смещении %s", self.log_file, position)
+                    position += len(line)
+                # Оборванная последняя строка не считается частью лога
+                self._size = position
+        if missing:
+            for entry in missing:
+                self._index(entry["n"], entry["u"], entry["o"])
+            await self._write_index(missing)
+            logger.warning("Индекс %s дополнен %s записями", self.index_file, len(missing))
+
+        self._loaded = True
+        logger.info("Индекс %s загружен: %s заказов", self.log_file, len(self._by_number))
+
+    async def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            await self._load()
+
+    async def _write_index(self, entries: List[Dict[str, Any]]) -> None:
+        async with aiofiles.open(self.index_file, 'a', encoding='utf-8') as f:
+            await f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+
+    async def append(self, order: Dict[str, Any]) -> int:
+        """Дописывает заказ в конец лога и возвращает его смещение."""
+        line = (json.dumps(order, ensure_ascii=False) + "\n").encode('utf-8')
+        async with self._lock:
+            await self._ensure_loaded()
+            offset = self._size
+            async with aiofiles.open(self.log_file, 'ab') as f:
+                if await f.tell() != offset:
+                    # Отрезаем оборванную строку, оставшуюся после сбоя
+                    await f.truncate(offset)
+                await f.write(line)
+            self._size = offset + len(line)
+            entry = {"n": order["order_number"], "u": order.get("user_id"), "o": offset}
+            self._index(entry["n"], entry["u"], offset)
+            await self._write_index([entry])
+        return offset
+
+    def _mapped(self) -> Optional[mmap.mmap]:
+        """Отображение лога в память; переотображается, когда лог вырос."""
+        if not self._size:
+            return None
+        if self._mm is None or len(self._mm) < self._size:
+            self.close()
+            with open(self.log_file, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def _line_at(self, mm: mmap.mmap, offset: int) -> bytes:
+        end = mm.find(b"\n", offset, self._size)
+        return mm[offset:end if end != -1 else self._size]
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    async def get(self, order_number: str) -> Optional[Dict[str, Any]]:
+        """Находит заказ по номеру без чтения всего файла."""
+        await self._ensure_loaded()
+        offset = self._by_number.get(order_number)
+        if offset is None:
+            return None
+        return json.loads(self._line_at(self._mapped(), offset))
+
+    async def get_by_user(self, user_id: int) -> List[Dict[str, Any]]:
+        """Возвращает все выданные заказы пользователя из этого лога."""
+        await self._ensure_loaded()
+        offsets = self._by_user.get(user_id)
+        if not offsets:
+            return []
+        mm = self._mapped()
+        return [json.loads(self._line_at(mm, offset)) for offset in offsets]
+
+    def iter_orders_sync(self) -> Iterator[Dict[str, Any]]:
+        """
+        Построчно отдаёт заказы из лога через mmap, не копируя файл в память.
+        Вызывается из рабочих потоков, поэтому отображение своё, а не общее _mm:
+        цикл событий закрывает общее при росте лога и на смене месяца.
+        """
+        size = self._size
+        if not size:
+            return
+        with open(self.log_file, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        try:
+            position = 0
+            while position < size:
+                end = mm.find(b"\n", position, size)
+                if end == -1:
+                    break
+                try:
+                    yield json.loads(mm[position:end])
+                except json.JSONDecodeError:
+                    pass
+                position = end + 1
+        finally:
+            mm.close()
+
+    def __len__(self) -> int:
+        return len(self._by_number)
+
+    def __contains__(self, order_number: str) -> bool:
+        return order_number in self._by_number
+
+
+def _empty_meta(month: str) -> Dict[str, Any]:
+    return {
+        "month": month,
+        "count": 0,
+        "total": 0.0,
+        "min_order_number": None,
+        "max_order_number": None,
+        "min_date": None,
+        "max_date": None,
+        "user_ids": [],
+    }
+
+
+def _update_meta(meta: Dict[str, Any], order: Dict[str, Any], user_ids: set) -> None:
+    number = int(order["order_number"])
+    date = order_date(order)
+    meta["count"] += 1
+    meta["total"] = round(meta["total"] + float(order.get("total") or 0), 2)
+    meta["min_order_number"] = number if meta["min_order_number"] is None else min(meta["min_order_number"], number)
+    meta["max_order_number"] = number if meta["max_order_number"] is None else max(meta["max_order_number"], number)
+    if date:
+        meta["min_date"] = date if meta["min_date"] is None else min(meta["min_date"], date)
+        meta["max_date"] = date if meta["max_date"] is None else max(meta["max_date"], date)
+    user_ids.add(order.get("user_id"))
+
+
+class OrderHistory:
+    """
+    История заказов, разбитая на месячные сегменты в каталоге order_history/:
+    - YYYY-MM.jsonl + YYYY-MM.idx — активный сегмент текущего месяца (OrderHistoryLog, чтение через mmap);
+    - YYYY-MM.jsonl.gz + YYYY-MM.meta.json — закрытые сжатые сегменты с метаданными
+      (количество, сумма, диапазоны номеров и дат, пользователи), по которым
+      запрос пропускает сегменты, где искомого заказа быть не может.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.active: Optional[OrderHistoryLog] = None
+        self.active_month: Optional[str] = None
+        self.closed: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def segment_path(self, month: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{month}{suffix}")
+
+    async def load(self) -> None:
+        async with self._lock:
+            await self._load()
+
+    async def _load(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self.closed.clear()
+        active_months = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".meta.json"):
+                month = name[:-len(".meta.json")]
+                async with aiofiles.open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    self.closed[month] = json.loads(await f.read())
+            elif name.endswith(".jsonl"):
+                active_months.append(name[:-len(".jsonl")])
+
+        # Сегменты прошлых месяцев, которые не успели закрыть (бот был остановлен на смене месяца)
+        month = current_month()
+        for stale in active_months:
+            if stale != month:
+                await self._close_segment(stale)
+        await self._open_active(month)
+        self._loaded = True
+        logger.info("История заказов: %s закрытых сегментов, активный %s (%s заказов)", len(self.closed), month, len(self.active))
+
+    async def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            await self._load()
+
+    async def _open_active(self, month: str) -> None:
+        self.active_month = month
+        self.active = OrderHistoryLog(self.segment_path(month, ".jsonl"), self.segment_path(month, ".idx"))
+        await self.active.load()
+
+    async def _close_segment(self, month: str) -> None:
+        """Сжимает сегмент месяца и сохраняет его метаданные."""
+        if not os.path.exists(self.segment_path(month, ".jsonl")):
+            return
+        log = OrderHistoryLog(self.segment_path(month, ".jsonl"), self.segment_path(month, ".idx"))
+        await log.load()
+        meta = await asyncio.to_thread(self._compress_segment, log, month)
+        log.close()
+        self.closed[month] = meta
+        os.remove(self.segment_path(month, ".jsonl"))
+        if os.path.exists(self.segment_path(month, ".idx")):
+            os.remove(self.segment_path(month, ".idx"))
+        logger.info("Сегмент истории заказов %s закрыт: %s заказов", month, meta['count'])
+
+    def _compress_segment(self, log: OrderHistoryLog, month: str) -> Dict[str, Any]:
+        meta = _empty_meta(month)
+        user_ids: set = set()
+        gz_path = self.segment_path(month, ".jsonl.gz")
+        with gzip.open(f"{gz_path}.tmp", 'wb') as gz:
+            for order in log.iter_orders_sync():
+                gz.write((json.dumps(order, ensure_ascii=False) + "\n").encode('utf-8'))
+                _update_meta(meta, order, user_ids)
+        meta["user_ids"] = sorted(user_ids, key=lambda u: (u is None, u))
+        os.replace(f"{gz_path}.tmp", gz_path)
+        with open(f"{self.segment_path(month, '.meta.json')}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(f"{self.segment_path(month, '.meta.json')}.tmp", self.segment_path(month, ".meta.json"))
+        return meta
+
+    def iter_segment_sync(self, month: str) -> Iterator[Dict[str, Any]]:
+        """Построчно читает закрытый сжатый сегмент."""
+        with gzip.open(self.segment_path(month, ".jsonl.gz"), 'rb') as gz:
+            for line in gz:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def _find_in_closed(self, months: List[str], predicate) -> List[Dict[str, Any]]:
+        return [order for month in months for order in self.iter_segment_sync(month) if predicate(order)]
+
+    async def append(self, order: Dict[str, Any]) -> None:
+        """Дописывает заказ в активный сегмент; на смене месяца закрывает предыдущий."""
+        async with self._lock:
+            await self._ensure_loaded()
+            month = current_month()
+            if month != self.active_month:
+                previous = self.active_month
+                self.active.close()
+                await self._close_segment(previous)
+                await self._open_active(month)
+            await self.active.append(order)
+
+    async def get(self, order_number: str) -> Optional[Dict[str, Any]]:
+        """Ищет заказ: сначала в индексе активного сегмента, затем только в подходящих закрытых."""
+        await self._ensure_loaded()
+        order = await self.active.get(order_number)
+        if order is not None:
+            return order
+        try:
+            number = int(order_number)
+        except (TypeError, ValueError):
+            return None  # такого номера не бывает — например, испорченный callback
+        months = [
+            month for month, meta in sorted(self.closed.items(), reverse=True)
+            if meta["count"] and meta["min_order_number"] <= number <= meta["max_order_number"]
+        ]
+        for month in months:
+            found = await asyncio.to_thread(self._find_in_closed, [month], lambda o: o["order_number"] == order_number)
+            if found:
+                return found[0]
+        return None
+
+    async def get_by_user(self, user_id: int) -> List[Dict[str, Any]]:
+        """Все выданные заказы пользователя; читаются только сегменты, где он что-то заказывал."""
+        await self._ensure_loaded()
+        months = [month for month, meta in sorted(self.closed.items()) if user_id in meta["user_ids"]]
+        orders = await asyncio.to_thread(self._find_in_closed, months, lambda o: o.get("user_id") == user_id) if months else []
+        return orders + await self.active.get_by_user(user_id)
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """Метаданные закрытых сегментов по возрастанию месяца."""
+        return [self.closed[month] for month in sorted(self.closed)]
+
+    def iter_orders_sync(self, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Отдаёт заказы по порядку сегментов. since/until (ISO-даты) отсекают
+        закрытые сегменты по метаданным, сами заказы не фильтруются.
+        """
+        for month in sorted(self.closed):
+            meta = self.closed[month]
+            if since and meta["max_date"] and meta["max_date"] < since:
+                continue
+            if until and meta["min_date"] and meta["min_date"] > until:
+                continue
+            yield from self.iter_segment_sync(month)
+        yield from self.active.iter_orders_sync()
+
+    async def iter_orders(self, since: Optional[str] = None, until: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Асинхронная обёртка над iter_orders_sync: чтение пачками в отдельном потоке."""
+        await self._ensure_loaded()
+        iterator = self.iter_orders_sync(since, until)
+        while True:
+            batch = await asyncio.to_thread(lambda: [order for _, order in zip(range(ITER_BATCH_SIZE), iterator)])
+            for order in batch:
+                yield order
+            if len(batch) < ITER_BATCH_SIZE:
+                return
+
+    def __len__(self) -> int:
+        return sum(meta["count"] for meta in self.closed.values()) + (len(self.active) if self.active else 0)
+
+
+order_history = OrderHistory(ORDER_HISTORY_DIR)
+
+
+def _read_legacy_orders() -> List[Dict[str, Any]]:
+    orders: List[Dict[str, Any]] = []
+    if os.path.exists(ORDER_HISTORY_FILE):
+        with open(ORDER_HISTORY_FILE, 'r', encoding='utf-8') as f:
+            content = f.read()
+        orders.extend((json.loads(content) if content else {"orders": []}).get("orders", []))
+    if os.path.exists(ORDER_HISTORY_LOG_FILE):
+        with open(ORDER_HISTORY_LOG_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    orders.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return orders
+
+
+async def migrate_legacy_order_history() -> None:
+    """
+    Однократно раскладывает старую историю (order_history.json и order_history.jsonl)
+    по активным месячным сегментам; сегменты прошлых месяцев закроет и сожмёт
+    OrderHistory._load при загрузке истории. Если миграция прервалась, на следующем
+    старте она повторяется, пропуская заказы, которые уже есть в индексе сегмента.
+    """
+    if not (os.path.exists(ORDER_HISTORY_FILE) or os.path.exists(ORDER_HISTORY_LOG_FILE)):
+        return
+    try:
+        orders = await asyncio.to_thread(_read_legacy_orders)
+    except Exception as e:
+        logger.error("Ошибка при чтении старой истории заказов для миграции: %s", e)
+        return
+
+    os.makedirs(ORDER_HISTORY_DIR, exist_ok=True)
+    by_month: Dict[str, List[Dict[str, Any]]] = {}
+    for order in orders:
+        by_month.setdefault(order_date(order)[:7] or current_month(), []).append(order)
+    for month, month_orders in sorted(by_month.items()):
+        log = OrderHistoryLog(order_history.segment_path(month, ".jsonl"), order_history.segment_path(month, ".idx"))
+        await log.load()
+        for order in month_orders:
+            if order["order_number"] not in log:
+                await log.append(order)
+        log.close()
+
+    for legacy in (ORDER_HISTORY_FILE, ORDER_HISTORY_LOG_FILE):
+        if os.path.exists(legacy):
+            os.replace(legacy, f"{legacy}.migrated")
+    if os.path.exists(ORDER_HISTORY_INDEX_FILE):
+        os.remove(ORDER_HISTORY_INDEX_FILE)
+    logger.info("Старая история заказов разложена по сегментам: %s заказов", len(orders))
+
+
+async def load_order_history_index():
+    """Готовит историю заказов при старте бота: миграция и загрузка сегментов."""
+    await migrate_legacy_order_history()
+    await order_history.load()
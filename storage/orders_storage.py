@@ -2,91 +2,80 @@
 import json
 import aiofiles
 import logging
-from config import PENDING_ORDERS_FILE, ORDER_NUMBER_FILE, ORDER_HISTORY_FILE
+from utils.metrics import timed_storage
+from config import ORDER_NUMBER_FILE
+from storage.order_history_storage import order_history
+from storage.pending_orders_storage import pending_orders_repository
 
 logger = logging.getLogger(__name__)
 
-async def generate_order_number() -> str:
+@timed_storage("orders")
+async def load_last_order_number(number_file: str = ORDER_NUMBER_FILE) -> int:
+    """Возвращает последний выданный номер заказа из order_number.json."""
     try:
-        async with aiofiles.open(ORDER_NUMBER_FILE, 'r', encoding='utf-8') as f:
+        async with aiofiles.open(number_file, 'r', encoding='utf-8') as f:
             content = await f.read()
             data = json.loads(content) if content else {"last_order_number": 0}
     except (FileNotFoundError, json.JSONDecodeError):
         data = {"last_order_number": 0}
+    return data["last_order_number"]
 
-    new_order_number = data["last_order_number"] + 1
-    async with aiofiles.open(ORDER_NUMBER_FILE, 'w', encoding='utf-8') as f:
-        await f.write(json.dumps({"last_order_number": new_order_number}, ensure_ascii=False, indent=2))
+@timed_storage("orders")
+async def save_last_order_number(order_number: int, number_file: str = ORDER_NUMBER_FILE):
+    """Сохраняет последний выданный номер заказа в order_number.json."""
+    async with aiofiles.open(number_file, 'w', encoding='utf-8') as f:
+        await f.write(json.dumps({"last_order_number": order_number}, ensure_ascii=False, indent=2))
 
-    formatted_number = f"{new_order_number:06d}"
-    logger.info(f"Сгенерирован новый номер заказа: {formatted_number}")
-    return formatted_number
+def format_order_number(order_number: int) -> str:
+    return f"{order_number:06d}"
 
+@timed_storage("orders")
 async def save_pending_order(order: dict):
-    """Сохраняет заказ в pending_orders.json."""
+    """Сохраняет заказ в pending_orders (дописывает запись в журнал)."""
     try:
-        async with aiofiles.open(PENDING_ORDERS_FILE, 'r', encoding='utf-8') as f:
-            content = await f.read()
-            pending_orders = json.loads(content) if content else {"orders": []}
-    except FileNotFoundError:
-        pending_orders = {"orders": []}
-
-    pending_orders["orders"].append(order)
-    try:
-        async with aiofiles.open(PENDING_ORDERS_FILE, 'w', encoding='utf-8') as f:
-            await f.write(json.dumps(pending_orders, ensure_ascii=False, indent=2))
-        logger.info(f"Заказ №{order['order_number']} сохранён в pending_orders.json")
+        await pending_orders_repository.add(order)
+        logger.info("Заказ №%s сохранён в pending_orders", order['order_number'])
     except Exception as e:
-        logger.error(f"Ошибка при сохранении заказа в pending_orders.json: {e}")
+        logger.error("Ошибка при сохранении заказа в pending_orders: %s", e)
 
+@timed_storage("orders")
 async def load_pending_orders() -> dict:
-    """Загружает все ожидающие заказы из pending_orders.json."""
+    """Возвращает все ожидающие заказы."""
     try:
-        async with aiofiles.open(PENDING_ORDERS_FILE, 'r', encoding='utf-8') as f:
-            content = await f.read()
-            return json.loads(content) if content else {"orders": []}
-    except FileNotFoundError:
-        return {"orders": []}
+        return {"orders": await pending_orders_repository.all()}
     except Exception as e:
-        logger.error(f"Ошибка при загрузке pending_orders: {e}")
+        logger.error("Ошибка при загрузке pending_orders: %s", e)
         return {"orders": []}
 
+@timed_storage("orders")
 async def load_order_history() -> dict:
-    """Загружает историю заказов из order_history.json."""
+    """Загружает историю заказов целиком (для больших объёмов используйте order_history.iter_orders)."""
     try:
-        async with aiofiles.open(ORDER_HISTORY_FILE, 'r', encoding='utf-8') as f:
-            content = await f.read()
-            return json.loads(content) if content else {"orders": []}
-    except FileNotFoundError:
-        return {"orders": []}
+        return {"orders": [order async for order in order_history.iter_orders()]}
     except Exception as e:
-        logger.error(f"Ошибка при загрузке order_history: {e}")
+        logger.error("Ошибка при загрузке order_history: %s", e)
         return {"orders": []}
 
+@timed_storage("orders")
 async def remove_pending_order(order_number: str) -> bool:
-    """Удаляет заказ из pending_orders.json по номеру."""
-    pending_orders = await load_pending_orders()
-    initial_length = len(pending_orders["orders"])
-    pending_orders["orders"] = [order for order in pending_orders["orders"] if order["order_number"] != order_number]
-    
-    if len(pending_orders["orders"]) < initial_length:
-        try:
-            async with aiofiles.open(PENDING_ORDERS_FILE, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps(pending_orders, ensure_ascii=False, indent=2))
-            logger.info(f"Заказ №{order_number} удалён из pending_orders.json")
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при удалении заказа из pending_orders.json: {e}")
-            return False
-    return False
+    """Удаляет заказ из pending_orders по номеру."""
+    try:
+        removed = await pending_orders_repository.remove(order_number)
+    except Exception as e:
+        logger.error("Ошибка при удалении заказа из pending_orders: %s", e)
+        return False
+    if removed is None:
+        return False
+    logger.info("Заказ №%s удалён из pending_orders", order_number)
+    return True
 
-async def save_order_to_history(order: dict):
-    """Сохраняет заказ в order_history.json."""
-    history = await load_order_history()
-    history["orders"].append(order)
+@timed_storage("orders")
+async def save_order_to_history(order: dict) -> bool:
+    """Дописывает заказ в конец истории заказов; False — заказ в историю не попал."""
     try:
-        async with aiofiles.open(ORDER_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            await f.write(json.dumps(history, ensure_ascii=False, indent=2))
-        logger.info(f"Заказ №{order['order_number']} добавлен в order_history.json")
+        await order_history.append(order)
     except Exception as e:
-        logger.error(f"Ошибка при сохранении заказа в order_history.json: {e}")
\ No newline at end of file
+        logger.error("Ошибка при сохранении заказа №%s в историю заказов: %s", order['order_number'], e)
+        return False
+    logger.info("Заказ №%s добавлен в историю заказов", order['order_number'])
+    return True
@@ -0,0 +1,269 @@
+# storage/pending_orders_storage.py
+import asyncio
+import json
+import os
+import aiofiles
+import logging
+from typing import Dict, List, Optional, Any
+from config import PENDING_ORDERS_FILE, PENDING_ORDERS_JOURNAL_FILE
+from utils.metrics import STORAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# После стольких записей в журнале он сворачивается в снимок pending_orders.json
+JOURNAL_COMPACT_THRESHOLD = 500
+# Сколько идентификаторов доставленных уведомлений помнить для отсечения повторов
+OUTBOX_DELIVERED_KEEP = 1000
+
+
+def order_status(order: Dict[str, Any]) -> str:
+    """Возвращает статус заказа для индекса по статусу."""
+    return order.get("status") or ("issued" if order.get("issued") else "pending")
+
+
+class PendingOrdersRepository:
+    """
+    Ожидающие заказы в памяти: словарь по номеру заказа и вторичные индексы
+    по user_id и статусу. Изменения дописываются в журнал (JSON Lines),
+    снимок pending_orders.json перезаписывается только при сворачивании журнала.
+
+    В том же журнале хранится outbox — уведомления о заказах, которые ещё нужно
+    доставить в Telegram. Они записываются в одном коммите с заказом.
+    """
+
+    def __init__(self, snapshot_file: str, journal_file: str, compact_threshold: int = JOURNAL_COMPACT_THRESHOLD):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.compact_threshold = compact_threshold
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        self._by_user: Dict[int, Dict[str, None]] = {}
+        self._by_status: Dict[str, Dict[str, None]] = {}
+        self._outbox: Dict[str, Dict[str, Any]] = {}
+        self._outbox_delivered: Dict[str, None] = {}
+        self._journal_records = 0
+        self._journal_size = 0  # конец последней целой записи журнала, байт
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    # --- индексы ---
+
+    def _index(self, order: Dict[str, Any]) -> None:
+        number = order["order_number"]
+        self._orders[number] = order
+        self._by_user.setdefault(order.get("user_id"), {})[number] = None
+        self._by_status.setdefault(order_status(order), {})[number] = None
+
+    def _unindex(self, number: str) -> Optional[Dict[str, Any]]:
+        order = self._orders.pop(number, None)
+        if order is None:
+            return None
+        for index, key in ((self._by_user, order.get("user_id")), (self._by_status, order_status(order))):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(number, None)
+                if not bucket:
+                    del index[key]
+        return order
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """Применяет одну запись журнала к состоянию в памяти."""
+        op = record.get("op")
+        if op == "put":
+            self._unindex(record["order"]["order_number"])
+            self._index(record["order"])
+        elif op == "del":
+            self._unindex(record["order_number"])
+        elif op == "outbox":
+            message = record["message"]
+            if message["id"] not in self._outbox_delivered:
+                self._outbox.setdefault(message["id"], message)
+        elif op == "outbox_done":
+            self._outbox.pop(record["id"], None)
+            self._outbox_delivered[record["id"]] = None
+            if len(self._outbox_delivered) > OUTBOX_DELIVERED_KEEP:
+                del self._outbox_delivered[next(iter(self._outbox_delivered))]
+
+    # --- загрузка и запись на диск ---
+
+    async def load(self) -> None:
+        """Загружает снимок и проигрывает поверх него журнал."""
+        async with self._lock:
+            await self._load()
+
+    async def _load(self) -> None:
+        self._orders.clear()
+        self._by_user.clear()
+        self._by_status.clear()
+        self._outbox.clear()
+        self._outbox_delivered.clear()
+        try:
+            async with aiofiles.open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                content = await f.read()
+            snapshot = json.loads(content) if content else {"orders": []}
+            for order in snapshot.get("orders", []):
+                self._index(order)
+            for message in snapshot.get("outbox", []):
+                self._outbox[message["id"]] = message
+            self._outbox_delivered = dict.fromkeys(snapshot.get("outbox_delivered", []))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error("Ошибка при загрузке %s: %s", self.snapshot_file, e)
+
+        self._journal_records = 0
+        self._journal_size = 0
+        try:
+            async with aiofiles.open(self.journal_file, 'rb') as f:
+                async for line in f:
+                    if not line.endswith(b"\n"):
+                        # Оборванная последняя строка после аварийного завершения: следующий
+                        # коммит отрежет её, а не допишет свою запись в её продолжение
+                        logger.warning("Оборванная запись в конце журнала %s будет отброшена", self.journal_file)
+                        break
+                    self._journal_size += len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        self._apply(json.loads(line))
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        logger.warning("Пропущена повреждённая запись журнала %s", self.journal_file)
+                        continue
+                    self._journal_records += 1
+        except FileNotFoundError:
+            pass
+
+        self._loaded = True
+        logger.info("Загружено ожидающих заказов: %s (записей в журнале: %s)", len(self._orders), self._journal_records)
+
+    async def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            await self._load()
+
+    async def _commit(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Дописывает записи в журнал одной операцией записи, сбрасывает их на диск (fsync)
+        и только после этого применяет в памяти.
+        """
+        payload = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode('utf-8')
+        with STORAGE_LATENCY.time(store="pending_orders", operation="journal_commit"):
+            async with aiofiles.open(self.journal_file, 'ab') as f:
+                if await f.tell() != self._journal_size:
+                    # Отрезаем оборванную запись, оставшуюся после сбоя
+                    await f.truncate(self._journal_size)
+                await f.write(payload)
+                await f.flush()
+                await asyncio.to_thread(os.fsync, f.fileno())
+        self._journal_size += len(payload)
+        for record in records:
+            self._apply(record)
+        self._journal_records += len(records)
+        if self._journal_records >= self.compact_threshold:
+            await self._compact()
+
+    async def _compact(self) -> None:
+        """Сворачивает журнал в снимок pending_orders.json и очищает журнал."""
+        tmp_file = f"{self.snapshot_file}.tmp"
+        async with aiofiles.open(tmp_file, 'w', encoding='utf-8') as f:
+            await f.write(json.dumps({
+                "orders": list(self._orders.values()),
+                "outbox": list(self._outbox.values()),
+                "outbox_delivered": list(self._outbox_delivered),
+            }, ensure_ascii=False, indent=2))
+            # Снимок должен лежать на диске до того, как журнал будет очищен
+            await f.flush()
+            await asyncio.to_thread(os.fsync, f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+        async with aiofiles.open(self.journal_file, 'w', encoding='utf-8') as f:
+            await f.write("")
+        self._journal_size = 0
+        logger.info("Журнал ожидающих заказов свёрнут (%s записей)", self._journal_records)
+        self._journal_records = 0
+
+    async def compact(self) -> None:
+        async with self._lock:
+            await self._ensure_loaded()
+            await self._compact()
+
+    # --- операции ---
+
+    async def add(self, order: Dict[str, Any]) -> None:
+        """Добавляет или заменяет заказ."""
+        async with self._lock:
+            await self._ensure_loaded()
+            await self._commit([{"op": "put", "order": order}])
+
+    async def add_many(self, orders: List[Dict[str, Any]], outbox: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Добавляет пачку заказов и их уведомления одной записью в журнал (групповой коммит)."""
+        records = [{"op": "put", "order": order} for order in orders]
+        records += [{"op": "outbox", "message": message} for message in outbox or []]
+        if not records:
+            return
+        async with self._lock:
+            await self._ensure_loaded()
+            await self._commit(records)
+
+    async def update(self, order_number: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        """Обновляет поля заказа и возвращает новую версию заказа."""
+        async with self._lock:
+            await self._ensure_loaded()
+            order = self._orders.get(order_number)
+            if order is None:
+                return None
+            order = {**order, **fields}
+            await self._commit([{"op": "put", "order": order}])
+            return order
+
+    async def remove(self, order_number: str) -> Optional[Dict[str, Any]]:
+        """Удаляет заказ и возвращает его, если он был."""
+        async with self._lock:
+            await self._ensure_loaded()
+            order = self._orders.get(order_number)
+            if order is None:
+                return None
+            await self._commit([{"op": "del", "order_number": order_number}])
+            return order
+
+    async def outbox_pending(self) -> List[Dict[str, Any]]:
+        """Уведомления, которые ещё не доставлены."""
+        await self._ensure_loaded()
+        return list(self._outbox.values())
+
+    async def ack_outbox(self, message_ids: List[str]) -> None:
+        """Отмечает уведомления доставленными (или окончательно отброшенными)."""
+        if not message_ids:
+            return
+        async with self._lock:
+            await self._ensure_loaded()
+            await self._commit([{"op": "outbox_done", "id": message_id} for message_id in message_ids])
+
+    async def get(self, order_number: str) -> Optional[Dict[str, Any]]:
+        await self._ensure_loaded()
+        return self._orders.get(order_number)
+
+    async def get_by_user(self, user_id: int) -> List[Dict[str, Any]]:
+        await self._ensure_loaded()
+        return [self._orders[number] for number in self._by_user.get(user_id, ())]
+
+    async def get_by_status(self, status: str) -> List[Dict[str, Any]]:
+        await self._ensure_loaded()
+        return [self._orders[number] for number in self._by_status.get(status, ())]
+
+    async def all(self) -> List[Dict[str, Any]]:
+        await self._ensure_loaded()
+        return list(self._orders.values())
+
+    async def max_order_number(self) -> int:
+        """Наибольший номер среди ожидающих заказов (0, если их нет)."""
+        await self._ensure_loaded()
+        return max((int(number) for number in self._orders), default=0)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+
+pending_orders_repository = PendingOrdersRepository(PENDING_ORDERS_FILE, PENDING_ORDERS_JOURNAL_FILE)
+
+
+async def load_pending_orders_to_cache():
+    """Загружает ожидающие заказы в память при старте бота."""
+    await pending_orders_repository.load()
@@ -0,0 +1,113 @@
+# tests/test_webhook_server.py
+import asyncio
+import socket
+
+import pytest
+from aiogram import Dispatcher, Router, types
+
+from benchmarks.fake_telegram import FakeTelegram, make_message_update
+from utils.webhook_server import WebhookServer
+
+SECRET = "test-secret"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Harness:
+    """Поддельный Telegram, вебхук-сервер и хендлер, который отвечает только по команде теста."""
+
+    def __init__(self):
+        self.fake = FakeTelegram()
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.handled = 0
+        router = Router()
+
+        @router.message()
+        async def echo(msg: types.Message):
+            self.started.set()
+            await self.release.wait()
+            await msg.answer(msg.text)
+            self.handled += 1
+
+        self.dp = Dispatcher()
+        self.dp.include_router(router)
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}/webhook"
+
+    async def __aenter__(self) -> "Harness":
+        await self.fake.start()
+        self.bot = self.fake.make_bot()
+        self.server = WebhookServer(self.dp, self.bot, base_url=f"http://127.0.0.1:{self.port}", path="/webhook",
+                                    secret=SECRET, host="127.0.0.1", port=self.port, drain_timeout=5)
+        await self.server.start(set_webhook=False)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release.set()
+        await self.server.stop()
+        await self.bot.session.close()
+        await self.fake.stop()
+
+    async def send(self, update_id: int, secret=SECRET) -> int:
+        return await self.fake.send_to_webhook(self.url, make_message_update(update_id, 42, f"text-{update_id}"),
+                                               secret=secret)
+
+
+@pytest.mark.parametrize("secret", ["wrong", None])
+def test_rejects_wrong_or_missing_secret(secret):
+    async def scenario():
+        async with Harness() as h:
+            assert await h.send(1, secret=secret) == 401
+            await asyncio.sleep(0.05)
+            assert not h.started.is_set()
+            assert h.fake.count("sendMessage") == 0
+
+    asyncio.run(scenario())
+
+
+def test_answers_before_processing_in_background():
+    async def scenario():
+        async with Harness() as h:
+            # Хендлер ещё ждёт release, а Telegram уже получил 200
+            assert await h.send(1) == 200
+            await asyncio.wait_for(h.started.wait(), timeout=5)
+            assert h.handled == 0
+            h.release.set()
+            for _ in range(100):
+                if h.fake.count("sendMessage"):
+                    break
+                await asyncio.sleep(0.02)
+            assert h.handled == 1
+            assert h.fake.calls[-1]["params"]["text"] == "text-1"
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_refuses_new_updates_and_drains_accepted():
+    async def scenario():
+        async with Harness() as h:
+            assert await h.send(1) == 200
+            await asyncio.wait_for(h.started.wait(), timeout=5)
+            stopping = asyncio.create_task(h.server.stop())
+            await asyncio.sleep(0.05)
+            # Во время остановки новые обновления получают 503 — Telegram доставит их позже
+            assert await h.send(2) == 503
+            assert not stopping.done()
+            h.release.set()
+            await asyncio.wait_for(stopping, timeout=5)
+            assert h.handled == 1
+            assert h.fake.count("sendMessage") == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("base_url, secret", [("https://bot.example.com", None), ("https://bot.example.com", ""),
+                                               ("", SECRET)])
+def test_refuses_to_start_without_secret_or_base_url(base_url, secret):
+    with pytest.raises(ValueError):
+        WebhookServer(Dispatcher(), None, base_url=base_url, secret=secret)
@@ -0,0 +1,209 @@
+# utils/callback_data.py
+import logging
+import re
+from dataclasses import fields
+from typing import Any, Awaitable, Callable, ClassVar, Dict, List, Optional, Tuple, Type, TypeVar, Union, get_type_hints
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+# Разделитель полей в новом формате: "<prefix><version>:<поле>:<поле>"
+SEP = ":"
+# Разделитель полей в старом формате кнопок: "add_to_cart_3_250"
+LEGACY_SEP = "_"
+# Telegram принимает callback_data не длиннее 64 байт
+MAX_CALLBACK_DATA_BYTES = 64
+
+PREFIX_RE = re.compile(r"^[a-z_]+$")
+
+P = TypeVar("P", bound="CallbackPayload")
+
+
+class _TrieNode:
+    __slots__ = ("children", "schema", "exact")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.schema: Optional[Type["CallbackPayload"]] = None  # после этого префикса идут поля
+        self.exact: Optional[Type["CallbackPayload"]] = None   # строка целиком, без полей
+
+
+class CallbackRegistry:
+    """
+    Все виды callback_data в одном префиксном дереве. Разбор строки — один проход
+    по её символам: находится самый длинный зарегистрированный префикс, остаток
+    разбирается в поля его схемы. Время не зависит от числа зарегистрированных видов.
+    """
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self._schemas: Dict[str, Type["CallbackPayload"]] = {}
+
+    def _insert(self, key: str, schema: Type["CallbackPayload"], exact: bool) -> None:
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+        if exact:
+            if node.exact is not None:
+                raise ValueError(f"callback_data {key!r} уже занята схемой {node.exact.__name__}")
+            node.exact = schema
+        else:
+            if node.schema is not None:
+                raise ValueError(f"Префикс {key!r} уже занят схемой {node.schema.__name__}")
+            node.schema = schema
+
+    def register(self, schema: Type["CallbackPayload"]) -> None:
+        key = schema.key()
+        if key in self._schemas:
+            raise ValueError(f"Схема {key!r} уже зарегистрирована ({self._schemas[key].__name__})")
+        self._schemas[key] = schema
+        self._insert(key + SEP, schema, exact=False)
+        if schema.legacy is not None:
+            # Кнопки старого формата остаются в чатах и в outbox, их тоже нужно понимать
+            self._insert(schema.legacy, schema, exact=not schema.legacy.endswith(LEGACY_SEP))
+
+    def parse(self, data: str) -> Optional["CallbackPayload"]:
+        """Разбирает callback_data в типизированный объект или возвращает None."""
+        node = self._root
+        candidates: List[Tuple[Type["CallbackPayload"], int]] = []
+        for position, char in enumerate(data):
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.schema is not None:
+                candidates.append((node.schema, position + 1))
+        else:
+            if node.exact is not None:
+                return node.exact()
+            # Схема без полей в новом формате упаковывается без разделителя: "ct1"
+            fieldless = node.children.get(SEP)
+            if fieldless is not None and fieldless.schema is not None and not fieldless.schema.field_types():
+                return fieldless.schema()
+        # Самый длинный префикс — первым: "coffee_catalog" не должен стать "coffee_" + "catalog"
+        for schema, end in reversed(candidates):
+            separator = SEP if data[end - 1] == SEP else LEGACY_SEP
+            payload = schema.unpack(data[end:], separator)
+            if payload is not None:
+                return payload
+        return None
+
+
+callback_registry = CallbackRegistry()
+
+
+class CallbackPayload:
+    """
+    Базовый класс типизированной callback_data. Наследник — frozen dataclass с полями
+    int/str, префиксом, версией и, при необходимости, старым форматом:
+
+        @dataclass(frozen=True)
+        class CoffeeDetails(CallbackPayload, prefix="cf", legacy="coffee_"):
+            coffee_index: int
+
+    CoffeeDetails(3).pack() == "cf1:3", а "coffee_3" из старых кнопок разбирается в тот же объект.
+    При несовместимом изменении полей версия повышается, старые кнопки перестают распознаваться.
+    """
+
+    prefix: ClassVar[str]
+    version: ClassVar[int]
+    legacy: ClassVar[Optional[str]]
+    _field_types: ClassVar[Optional[List[Tuple[str, type]]]]
+
+    def __init_subclass__(cls, prefix: str, version: int = 1, legacy: Optional[str] = None,
+                          registry: Optional[CallbackRegistry] = None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not PREFIX_RE.match(prefix):
+            raise ValueError(f"Префикс callback_data должен состоять из строчных латинских букв: {prefix!r}")
+        cls.prefix = prefix
+        cls.version = version
+        cls.legacy = legacy
+        cls._field_types = None
+        (registry or callback_registry).register(cls)
+
+    @classmethod
+    def key(cls) -> str:
+        return f"{cls.prefix}{cls.version}"
+
+    @classmethod
+    def field_types(cls) -> List[Tuple[str, type]]:
+        # Поля известны только после @dataclass, который применяется уже после __init_subclass__
+        if cls._field_types is None:
+            hints = get_type_hints(cls)
+            cls._field_types = [(field.name, hints[field.name]) for field in fields(cls)]
+        return cls._field_types
+
+    def pack(self) -> str:
+        values = [str(getattr(self, name)) for name, _ in self.field_types()]
+        for value in values:
+            if not value or SEP in value:
+                raise ValueError(f"Недопустимое значение поля {type(self).__name__}: {value!r}")
+        data = SEP.join([self.key(), *values])
+        if len(data.encode("utf-8")) > MAX_CALLBACK_DATA_BYTES:
+            raise ValueError(f"callback_data длиннее {MAX_CALLBACK_DATA_BYTES} байт: {data!r}")
+        return data
+
+    @classmethod
+    def unpack(cls: Type[P], body: str, separator: str = SEP) -> Optional[P]:
+        """Строит объект из части callback_data после префикса; None, если поля не подходят."""
+        field_types = cls.field_types()
+        values = body.split(separator) if field_types else []
+        if len(values) != len(field_types) or (not field_types and body):
+            return None
+        kwargs: Dict[str, Any] = {}
+        for (name, field_type), value in zip(field_types, values):
+            if not value:
+                return None
+            if field_type is int:
+                if not (value.isascii() and value.isdigit()):
+                    return None
+                kwargs[name] = int(value)
+            else:
+                kwargs[name] = value
+        return cls(**kwargs)
+
+
+class CallbackRouter:
+    """
+    Один обработчик callback_query на роутер вместо цепочки фильтров: callback_data
+    разбирается один раз, хендлер находится по типу объекта в словаре. Хендлер получает
+    разобранный объект в аргументе callback_data и остальные аргументы aiogram (state и т.д.).
+    Нераспознанные callback передаются дальше по цепочке роутеров, не затрагивая
+    middleware этого роутера.
+    """
+
+    def __init__(self, router: Router, registry: CallbackRegistry = callback_registry,
+                 flags: Optional[Dict[str, Any]] = None):
+        self.registry = registry
+        self._handlers: Dict[Type[CallbackPayload], CallableObject] = {}
+        router.callback_query.register(self._dispatch, self._match, flags=flags)
+
+    def __call__(self, schema: Type[CallbackPayload]) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+        def decorator(handler: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+            if schema in self._handlers:
+                raise ValueError(f"Для {schema.__name__} уже есть хендлер")
+            self._handlers[schema] = CallableObject(handler)
+            return handler
+        return decorator
+
+    def handler_name(self, callback_data: CallbackPayload) -> str:
+        handler = self._handlers.get(type(callback_data))
+        return handler.callback.__name__ if handler is not None else type(callback_data).__name__
+
+    async def _match(self, callback: CallbackQuery) -> Union[bool, Dict[str, Any]]:
+        """
+        Фильтр: разобранный объект попадает в аргументы хендлера как callback_data.
+        Асинхронный намеренно — синхронные фильтры aiogram выполняет в пуле потоков.
+        """
+        if not callback.data:
+            return False
+        payload = self.registry.parse(callback.data)
+        if payload is None or type(payload) not in self._handlers:
+            return False
+        return {"callback_data": payload}
+
+    async def _dispatch(self, callback: CallbackQuery, callback_data: CallbackPayload, **kwargs: Any) -> Any:
+        handler = self._handlers[type(callback_data)]
+        return await handler.call(callback, callback_data=callback_data, **kwargs)
@@ -0,0 +1,114 @@
+# utils/idempotency.py
+import asyncio
+import functools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from aiogram.types import CallbackQuery, Message
+from config.config import IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_KEYS
+
+logger = logging.getLogger(__name__)
+
+H = TypeVar("H", bound=Callable[..., Awaitable[Any]])
+
+
+class IdempotencyStore:
+    """
+    Результаты недавно выполненных хендлеров по ключу идемпотентности.
+    Записи живут ttl секунд, при переполнении вытесняются самые старые.
+    Пока первый вызов ещё выполняется, повторный ждёт его результата, а не запускается параллельно.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[Hashable, Tuple[float, asyncio.Future]]" = OrderedDict()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def _evict(self, now: float) -> None:
+        # Записи упорядочены по времени добавления: просроченные и лишние — в начале
+        while self._entries:
+            expires_at, _ = next(iter(self._entries.values()))
+            if expires_at > now and len(self._entries) < self.max_keys:
+                break
+            self._entries.popitem(last=False)
+
+    async def run(self, name: str, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Tuple[bool, Any]:
+        """
+        Выполняет call один раз на ключ. Возвращает (повтор ли это, результат первого вызова).
+        Если первый вызов упал, ключ забывается и следующий повтор выполнится заново.
+        """
+        now = time.monotonic()
+        self._evict(now)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits[name] = self.hits.get(name, 0) + 1
+            return True, await asyncio.shield(entry[1])
+
+        self.misses[name] = self.misses.get(name, 0) + 1
+        future = asyncio.get_running_loop().create_future()
+        self._entries[key] = (now + self.ttl, future)
+        try:
+            result = await call()
+        except BaseException as e:
+            self._entries.pop(key, None)
+            future.set_exception(e)
+            future.exception()  # повторов может не быть — не даём asyncio ругаться на необработанную ошибку
+            raise
+        future.set_result(result)
+        return False, result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._entries),
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+        }
+
+
+idempotency_store = IdempotencyStore()
+
+
+def idempotency_key(event: Any) -> Optional[Hashable]:
+    """
+    (пользователь, чат, сообщение, callback_data) для нажатия кнопки и (пользователь, чат, сообщение)
+    для текста. Кнопки одного сообщения меняются при редактировании на месте, поэтому
+    в ключ входит и время последней правки: нажатие на тот же экран — повтор, на новый — нет.
+    """
+    if isinstance(event, CallbackQuery):
+        message = event.message
+        if message is None:
+            return event.from_user.id, None, event.inline_message_id, event.data
+        return event.from_user.id, message.chat.id, message.message_id, getattr(message, "edit_date", None), event.data
+    if isinstance(event, Message) and event.from_user is not None:
+        return event.from_user.id, event.chat.id, event.message_id
+    return None
+
+
+def idempotent(handler: H, store: Optional[IdempotencyStore] = None) -> H:
+    """
+    Хендлер с побочными эффектами (корзина, заказ, выдача) выполняется один раз на ключ
+    idempotency_key. Повторное нажатие той же кнопки или повторная доставка того же сообщения
+    получают результат первого вызова; на повторный callback бот просто отвечает, экран уже обновлён.
+    """
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(event, *args, **kwargs):
+        key = idempotency_key(event)
+        if key is None:
+            return await handler(event, *args, **kwargs)
+        duplicate, result = await (store or idempotency_store).run(name, key, lambda: handler(event, *args, **kwargs))
+        if duplicate:
+            logger.info("Повтор %s от пользователя %s обработан из кэша", name, key[0])
+            if isinstance(event, CallbackQuery):
+                try:
+                    await event.answer()
+                except Exception as e:
+                    logger.debug("Не удалось ответить на повторный callback %s: %s", event.id, e)
+        return result
+
+    return wrapper
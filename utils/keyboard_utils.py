@@ -1,5 +1,6 @@
 # utils/keyboard_utils.py
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from models.callbacks import CoffeeCatalog, CoffeeDetails, SelectWeight, ViewCart
 
 def get_coffee_catalog_keyboard(coffee_list):
     keyboard = []
@@ -8,7 +9,7 @@ def get_coffee_catalog_keyboard(coffee_list):
         keyboard.append([
             InlineKeyboardButton(
                 text=f"{coffee['name']} (в наличии: {total_quantity})",
-                callback_data=f"coffee_{coffee_list.index(coffee)}"
+                callback_data=CoffeeDetails(coffee_list.index(coffee)).pack()
             )
         ])
     keyboard.append([
@@ -19,12 +20,12 @@ def get_coffee_catalog_keyboard(coffee_list):
 def get_coffee_detail_keyboard(coffee_index):
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="250г", callback_data=f"weight_{coffee_index}_250"),
-            InlineKeyboardButton(text="1000г", callback_data=f"weight_{coffee_index}_1000")
+            InlineKeyboardButton(text="250г", callback_data=SelectWeight(coffee_index, "250").pack()),
+            InlineKeyboardButton(text="1000г", callback_data=SelectWeight(coffee_index, "1000").pack())
         ],
         [
-            InlineKeyboardButton(text="Моя корзина", callback_data="view_cart"),
-            InlineKeyboardButton(text="Назад к каталогу", callback_data="coffee_catalog")
+            InlineKeyboardButton(text="Моя корзина", callback_data=ViewCart().pack()),
+            InlineKeyboardButton(text="Назад к каталогу", callback_data=CoffeeCatalog().pack())
         ]
     ])
     return keyboard
\ No newline at end of file
@@ -0,0 +1,86 @@
+# utils/logging_setup.py
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, List
+
+from config.config import LOG_LEVEL, LOG_FILE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_listeners: List[QueueListener] = []
+
+
+class Deferred:
+    """
+    Аргумент лога, который вычисляется только в потоке записи: logger.info("%s", Deferred(json.dumps, tree)).
+    Подходит для данных, которые после вызова логгера уже не меняются.
+    """
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func: Callable[..., Any], *args: Any):
+        self.func = func
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args))
+
+
+# Типы аргументов, которые безопасно форматировать позже, в потоке записи
+_SAFE_ARG_TYPES = (str, int, float, bool, type(None), Deferred)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Кладёт запись в очередь без форматирования, если все аргументы неизменяемые:
+    строку собирает поток QueueListener, а не цикл событий. Изменяемые аргументы
+    (словари, списки) форматируются сразу — иначе в лог попало бы их более позднее состояние.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _SAFE_ARG_TYPES) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def attach_queued(target: logging.Logger, *handlers: logging.Handler) -> QueueListener:
+    """Подключает handlers к логгеру через очередь: запись в файл/консоль идёт в фоновом потоке."""
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    target.addHandler(LazyQueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return listener
+
+
+def setup_logging(level: str = LOG_LEVEL, log_file: str = LOG_FILE) -> None:
+    """
+    Логирование бота: корневой логгер пишет в очередь, консоль и (если задан LOG_FILE)
+    ротируемый файл обслуживает фоновый поток. Вызывается из main.py до запуска бота.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(RotatingFileHandler(log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS,
+                                            encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(level.upper())
+    attach_queued(root, *handlers)
+
+
+def shutdown_logging() -> None:
+    """Дописывает оставшиеся в очередях записи и останавливает потоки записи."""
+    while _listeners:
+        listener = _listeners.pop()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
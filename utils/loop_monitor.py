@@ -0,0 +1,158 @@
+# utils/loop_monitor.py
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Deque, Dict, Optional
+
+from config import BASE_DIR
+from config.config import LOOP_MONITOR_INTERVAL, LOOP_BLOCK_THRESHOLD, LOOP_LAG_WINDOW
+from utils.metrics import registry
+from utils.profiler import short_path
+from utils.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = registry.histogram(
+    "bot_event_loop_lag_seconds", "Опоздание таймера цикла событий",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+LOOP_BLOCKS = registry.counter("bot_event_loop_blocks_total", "Блокировки цикла событий дольше LOOP_BLOCK_THRESHOLD")
+
+# Сколько кадров стека блокирующего вызова писать в лог
+STACK_DEPTH = 20
+# Сколько мест блокировки помнить для stats()
+TOP_SITES = 10
+
+
+def _site(frame) -> str:
+    """Место в коде проекта, ближайшее к вершине стека (иначе — сама вершина)."""
+    top = frame
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(BASE_DIR) and "site-packages" not in path:
+            return f"{short_path(path)}:{frame.f_lineno}({frame.f_code.co_name})"
+        frame = frame.f_back
+    return f"{short_path(top.f_code.co_filename)}:{top.f_lineno}({top.f_code.co_name})"
+
+
+class LoopMonitor:
+    """
+    Непрерывный контроль отзывчивости цикла событий.
+
+    Задача-пульс каждые interval секунд засыпает и замеряет, на сколько позже проснулась:
+    это опоздание идёт в гистограмму bot_event_loop_lag_seconds и в окно последних
+    window замеров (percentiles()). Отдельный поток-сторож следит за пульсом: если его нет
+    дольше interval + threshold, цикл чем-то занят синхронно — сторож снимает стек потока
+    цикла событий (sys._current_frames) прямо во время блокировки и пишет его в лог.
+    Пока блокировка длится, сторож продолжает снимать место в коде каждые threshold / 2:
+    длинная блокировка часто складывается из многих коротких синхронных участков подряд,
+    и первый снимок показывает лишь один из них. sites — сколько таких снимков пришлось
+    на каждое место, то есть где цикл простоял дольше всего.
+    Так находятся синхронные open()/json.dumps, sync-клиенты и тяжёлые вычисления в хендлерах.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, threshold: float = LOOP_BLOCK_THRESHOLD,
+                 window: int = LOOP_LAG_WINDOW):
+        self.interval = interval
+        self.threshold = threshold
+        self._lags: Deque[float] = collections.deque(maxlen=window)
+        self._beat = time.monotonic()
+        self._reported_beat: Optional[float] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._stall: collections.Counter = collections.Counter()
+        self.blocks = 0
+        self.sites: collections.Counter = collections.Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        """Вызывается из потока цикла событий."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._pulse(), name="loop-monitor")
+        self._watcher = threading.Thread(target=self._watch, name="loop-monitor-watcher", daemon=True)
+        self._watcher.start()
+        logger.info("Контроль цикла событий запущен: пульс %s с, блокировка от %s мс",
+                    self.interval, round(self.threshold * 1000))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        # Пульс, не дождавшийся своей очереди до остановки, — тоже замер: иначе
+        # блокировка до самого конца окна не попадёт в перцентили
+        overdue = time.monotonic() - self._beat - self.interval
+        if overdue >= self.threshold:
+            self._lags.append(overdue)
+            LOOP_LAG.observe(overdue)
+        self._stopping.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._watcher is not None:
+            self._watcher.join(timeout=1)
+            self._watcher = None
+
+    async def _pulse(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self._beat = time.monotonic()
+            self._lags.append(lag)
+            LOOP_LAG.observe(lag)
+            if lag >= self.threshold and self._reported_beat is not None:
+                top = ", ".join(f"{site} x{count}" for site, count in self._stall.most_common(3))
+                logger.warning("Цикл событий был заблокирован %.0f мс, чаще всего в: %s", lag * 1000, top)
+                self._reported_beat = None
+
+    def _watch(self) -> None:
+        limit = self.interval + self.threshold
+        while not self._stopping.wait(self.threshold / 2):
+            beat = self._beat
+            if time.monotonic() - beat < limit:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            site = _site(frame)
+            self.sites[site] += 1
+            if beat == self._reported_beat:
+                self._stall[site] += 1
+                del frame
+                continue
+            # Новая блокировка: полный стек пишем один раз, дальше только считаем места
+            self._reported_beat = beat
+            self._stall = collections.Counter({site: 1})
+            self.blocks += 1
+            LOOP_BLOCKS.inc()
+            stack = "".join(traceback.format_stack(frame, limit=STACK_DEPTH))
+            del frame
+            logger.warning("Цикл событий заблокирован дольше %.0f мс в %s, стек:\n%s",
+                           self.threshold * 1000, site, stack)
+
+    def percentiles(self) -> Dict[str, float]:
+        """Опоздание пульса за последние window замеров, с."""
+        lags = list(self._lags)
+        return {"p50": percentile(lags, 50), "p90": percentile(lags, 90),
+                "p99": percentile(lags, 99), "max": max(lags, default=0.0)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"lag": self.percentiles(), "blocks": self.blocks, "sites": self.sites.most_common(TOP_SITES)}
+
+
+loop_monitor = LoopMonitor()
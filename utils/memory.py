@@ -0,0 +1,102 @@
+# utils/memory.py
+import logging
+import resource
+import sys
+import tracemalloc
+from typing import Optional
+
+from config.config import MEMORY_TRACE_FRAMES
+from utils.profiler import short_path
+
+logger = logging.getLogger(__name__)
+
+# Сколько мест выделения показывать в отчёте
+TOP_ALLOCATIONS = 15
+
+# Выделения самого tracemalloc и импорта не интересны
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes() -> int:
+    """Текущий RSS процесса (Linux: /proc/self/status); где его нет — пиковый из getrusage."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # в Linux ru_maxrss в КиБ
+
+
+def format_size(size: int) -> str:
+    sign = "-" if size < 0 else ""
+    size = abs(size)
+    if size >= 1024 * 1024:
+        return f"{sign}{size / 1024 / 1024:.1f} МиБ"
+    return f"{sign}{size / 1024:.0f} КиБ"
+
+
+def _location(stat) -> str:
+    frame = stat.traceback[0]
+    return f"{short_path(frame.filename)}:{frame.lineno}"
+
+
+class AllocationTracker:
+    """
+    Снимки tracemalloc по команде администратора. Первый вызов включает трассировку
+    (до этого момента выделения не видны), каждый следующий — снимает снимок, показывает
+    главные места выделения и разницу с предыдущим снимком. stop() выключает трассировку:
+    пока она включена, каждое выделение памяти заметно дороже.
+    """
+
+    def __init__(self, frames: int = MEMORY_TRACE_FRAMES, limit: int = TOP_ALLOCATIONS):
+        self.frames = frames
+        self.limit = limit
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        tracemalloc.start(self.frames)
+        self._previous = None
+        logger.info("tracemalloc включён (кадров: %s)", self.frames)
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self._previous = None
+        logger.info("tracemalloc выключен")
+
+    def snapshot_report(self) -> str:
+        """Снимок, главные места выделения и разница с прошлым снимком. Тяжёлый: вызывать через asyncio.to_thread."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"tracemalloc: отслеживается {format_size(current)}, пик {format_size(peak)}", "",
+                 "Больше всего памяти:"]
+        for stat in snapshot.statistics("lineno")[:self.limit]:
+            lines.append(f"{format_size(stat.size)} ({stat.count} блоков) {_location(stat)}")
+        if self._previous is not None:
+            lines += ["", "Рост с прошлого снимка:"]
+            diff = [stat for stat in snapshot.compare_to(self._previous, "lineno") if stat.size_diff > 0]
+            for stat in diff[:self.limit]:
+                lines.append(f"+{format_size(stat.size_diff)} (+{stat.count_diff} блоков, всего {format_size(stat.size)}) "
+                             f"{_location(stat)}")
+            if not diff:
+                lines.append("нет")
+        self._previous = snapshot
+        return "\n".join(lines)
+
+
+allocation_tracker = AllocationTracker()
@@ -0,0 +1,241 @@
+# utils/metrics.py
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+from config.config import METRICS_HOST, METRICS_PORT
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержки, с
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получено {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик."""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels: Any) -> None:
+        """Для счётчиков, которые уже ведёт другой компонент (stats()): выставить текущее значение."""
+        self._values[self._key(labels)] = value
+
+    def _samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Значение, которое может расти и уменьшаться."""
+
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными корзинами (накопительные счётчики le, сумма и количество)."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: Any):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> Iterable[str]:
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(self._sums[key])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    Метрики процесса. Коллекторы вызываются перед каждой выгрузкой — так в метрики
+    попадают счётчики, которые компоненты уже ведут сами (stats()).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> Any:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована с другим типом или метками")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error("Ошибка коллектора метрик %s: %s", collector.__name__, e)
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STORAGE_LATENCY = registry.histogram(
+    "bot_storage_operation_seconds", "Время операций чтения/записи хранилищ", ("store", "operation"),
+)
+STORAGE_ERRORS = registry.counter(
+    "bot_storage_errors_total", "Операции хранилищ, завершившиеся исключением", ("store", "operation"),
+)
+
+
+def timed_storage(store: str, operation: Optional[str] = None):
+    """
+    Декоратор асинхронной функции хранилища: время в bot_storage_operation_seconds{store, operation}
+    и участок storage.<store>.<operation> в трассировке обновления.
+    """
+    def decorator(func):
+        name = operation or func.__name__
+        span_name = f"storage.{store}.{name}"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with tracer.span(span_name):
+                    return await func(*args, **kwargs)
+            except Exception:
+                STORAGE_ERRORS.inc(store=store, operation=name)
+                raise
+            finally:
+                STORAGE_LATENCY.observe(time.perf_counter() - started, store=store, operation=name)
+        return wrapper
+    return decorator
+
+
+class MetricsServer:
+    """Локальный HTTP-сервер, отдающий GET /metrics для Prometheus."""
+
+    def __init__(self, metrics: MetricsRegistry = registry, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.metrics.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start(self) -> None:
+        if not self.port:
+            logger.info("Эндпоинт метрик отключён (METRICS_PORT=0)")
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Метрики доступны на http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
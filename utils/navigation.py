@@ -0,0 +1,53 @@
+# utils/navigation.py
+import logging
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InputMediaPhoto, Message
+
+logger = logging.getLogger(__name__)
+
+
+async def show_screen(callback: CallbackQuery, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None,
+                      parse_mode: Optional[str] = None, photo: Optional[str] = None, keep_photo: bool = False) -> None:
+    """
+    Показывает новый экран на месте сообщения, по кнопке которого нажали.
+
+    - текст -> текст: edit_message_text;
+    - фото -> фото: edit_message_media (фото и подпись меняются одним запросом);
+    - фото -> текст с keep_photo=True: edit_message_caption, фото остаётся;
+    - остальное (текст <-> фото, сообщение недоступно или слишком старое): отправка
+      нового сообщения и удаление старого, как раньше.
+    """
+    message = callback.message
+    if isinstance(message, Message):
+        try:
+            if photo and message.photo:
+                await message.edit_media(
+                    InputMediaPhoto(media=photo, caption=text, parse_mode=parse_mode), reply_markup=reply_markup
+                )
+                return
+            if not photo and message.photo and keep_photo:
+                await message.edit_caption(caption=text, parse_mode=parse_mode, reply_markup=reply_markup)
+                return
+            if not photo and not message.photo and message.text is not None:
+                await message.edit_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+                return
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                return
+            logger.info("Не удалось отредактировать сообщение %s, отправляем заново: %s", message.message_id, e)
+
+    chat_id = message.chat.id if message is not None else callback.from_user.id
+    if photo:
+        await callback.bot.send_photo(
+            chat_id=chat_id, photo=photo, caption=text, parse_mode=parse_mode, reply_markup=reply_markup
+        )
+    else:
+        await callback.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode, reply_markup=reply_markup)
+    if isinstance(message, Message):
+        try:
+            await message.delete()
+        except TelegramBadRequest as e:
+            # Сообщения старше 48 часов удалить нельзя — это не мешает показать новый экран
+            logger.info("Не удалось удалить сообщение %s: %s", message.message_id, e)
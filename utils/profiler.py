@@ -0,0 +1,123 @@
+# utils/profiler.py
+import asyncio
+import cProfile
+import logging
+import marshal
+import os
+import pstats
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from config import BASE_DIR
+from utils.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+# Как часто во время профилирования замерять опоздание цикла событий и число задач, с
+SAMPLE_INTERVAL = 0.05
+# Ожидание событий в селекторе — простой цикла, а не работа; в топ функций не попадает
+IDLE_FUNCTIONS = ("<method 'poll' of 'select.epoll' objects>", "<method 'select' of 'select.kqueue' objects>",
+                  "<method 'control' of 'select.kqueue' objects>", "<built-in method select.select>")
+
+
+def short_path(path: str) -> str:
+    """Путь без корня проекта и без site-packages — чтобы строки отчёта помещались в сообщение."""
+    if path.startswith(BASE_DIR):
+        return os.path.relpath(path, BASE_DIR)
+    marker = "site-packages" + os.sep
+    if marker in path:
+        return path.split(marker, 1)[1]
+    return os.path.basename(path)
+
+
+@dataclass
+class ProfileResult:
+    seconds: float
+    stats: pstats.Stats
+    lags: List[float] = field(default_factory=list)
+    task_counts: List[int] = field(default_factory=list)
+
+    def dump(self) -> bytes:
+        """Содержимое .prof-файла (тот же формат, что у pstats.Stats.dump_stats) для snakeviz, pstats и т.п."""
+        return marshal.dumps(self.stats.stats)
+
+    def top(self, key: str, limit: int) -> List[Tuple[str, int, float, float]]:
+        """(функция, вызовов, собственное время, время с вложенными) — первые limit по key (tottime/cumtime)."""
+        index = 2 if key == "tottime" else 3
+        rows = sorted((item for item in self.stats.stats.items() if item[0][2] not in IDLE_FUNCTIONS),
+                      key=lambda item: item[1][index], reverse=True)[:limit]
+        return [
+            (f"{short_path(filename)}:{line}({name})" if line else name, calls, own, total)
+            for (filename, line, name), (_, calls, own, total, _callers) in rows
+        ]
+
+    @property
+    def idle(self) -> float:
+        return sum(row[2] for (_, _, name), row in self.stats.stats.items() if name in IDLE_FUNCTIONS)
+
+    def summary(self, limit: int = 15) -> str:
+        lags_ms = [lag * 1000 for lag in self.lags]
+        busy = self.stats.total_tt - self.idle
+        lines = [
+            f"Профиль за {self.seconds:.1f} с: вызовов функций {self.stats.total_calls}, "
+            f"цикл занят {busy:.2f} с ({busy / self.seconds:.0%}), простой {self.idle:.2f} с",
+            f"Цикл событий: опоздание p50={percentile(lags_ms, 50):.1f} p99={percentile(lags_ms, 99):.1f} "
+            f"max={max(lags_ms, default=0):.1f} мс",
+            f"Задачи asyncio: min={min(self.task_counts, default=0)} max={max(self.task_counts, default=0)} "
+            f"в среднем {sum(self.task_counts) / max(1, len(self.task_counts)):.0f}",
+            "",
+            "Собственное время (мс, вызовов, функция):",
+        ]
+        lines += [f"{own * 1000:.1f}  {calls}  {name}" for name, calls, own, _ in self.top("tottime", limit)]
+        return "\n".join(lines)
+
+
+class LoopProfiler:
+    """
+    Профилирование работающего бота по команде администратора: на время окна включается
+    cProfile для потока цикла событий (все хендлеры, middleware и фоновые задачи) и
+    фоновая задача, которая замеряет опоздание цикла и число задач asyncio.
+    Вне окна ничего не установлено — накладных расходов нет.
+    """
+
+    def __init__(self, sample_interval: float = SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, seconds: float) -> "asyncio.Task[ProfileResult]":
+        """Запускает окно профилирования; результат — в возвращённой задаче. Одновременно — только одно окно."""
+        if self.running:
+            raise RuntimeError("профилирование уже идёт")
+        self._task = asyncio.create_task(self._profile(seconds), name="loop-profiler")
+        return self._task
+
+    async def _profile(self, seconds: float) -> ProfileResult:
+        lags: List[float] = []
+        task_counts: List[int] = []
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        deadline = started + seconds
+        logger.info("Профилирование включено на %s с", seconds)
+        profile.enable()
+        try:
+            while True:
+                tick = time.perf_counter()
+                if tick >= deadline:
+                    break
+                interval = min(self.sample_interval, deadline - tick)
+                await asyncio.sleep(interval)
+                lags.append(max(0.0, time.perf_counter() - tick - interval))
+                task_counts.append(len(asyncio.all_tasks()))
+        finally:
+            profile.disable()
+        elapsed = time.perf_counter() - started
+        logger.info("Профилирование завершено: %.1f с", elapsed)
+        return ProfileResult(seconds=elapsed, stats=pstats.Stats(profile), lags=lags, task_counts=task_counts)
+
+
+loop_profiler = LoopProfiler()
@@ -0,0 +1,55 @@
+# utils/rate_limit.py
+import time
+
+
+class TokenBucket:
+    """
+    Маркерная корзина: rate маркеров в секунду, не больше capacity про запас.
+    Время передаётся снаружи (time.monotonic()), чтобы одну проверку можно было
+    сделать сразу для нескольких корзин.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float, now: float = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float, cost: float = 1.0) -> float:
+        """Сколько секунд ждать, пока можно будет взять cost маркеров (0 — можно сейчас)."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, now: float, cost: float = 1.0) -> None:
+        self._refill(now)
+        self.tokens -= cost
+
+    def try_take(self, now: float = None, cost: float = 1.0) -> bool:
+        now = time.monotonic() if now is None else now
+        if self.delay(now, cost):
+            return False
+        self.take(now, cost)
+        return True
+
+    def block(self, now: float, seconds: float) -> None:
+        """Запрещает брать маркеры seconds секунд (например, по RetryAfter от Telegram)."""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = self.blocked_until
+
+    def idle(self, now: float) -> bool:
+        """Корзина полна и не заблокирована — её можно забыть без потери состояния."""
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
@@ -0,0 +1,10 @@
+# utils/stats.py
+from typing import Iterable
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    """q-й перцентиль (q от 0 до 100) по ближайшему рангу; для пустой выборки — 0."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,197 @@
+# utils/tracing.py
+import json
+import logging
+import time
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from config import TRACE_FILE, SLOW_UPDATES_FILE
+from config.config import TRACING_ENABLED, TRACE_SLOW_THRESHOLD, TRACE_FILE_MAX_BYTES, TRACE_FILE_BACKUPS
+from utils.logging_setup import Deferred, attach_queued
+
+logger = logging.getLogger(__name__)
+
+# Логгеры файлов трассировки; в общий лог не попадают
+trace_logger = logging.getLogger("bot.trace")
+slow_logger = logging.getLogger("bot.trace.slow")
+trace_logger.propagate = False
+slow_logger.propagate = False
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+
+class Span:
+    """Участок обработки обновления: имя, атрибуты, время начала и конца, вложенные участки."""
+
+    __slots__ = ("name", "attrs", "start", "end", "children", "error", "root")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], root: Optional["Span"] = None):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+        self.error: Optional[str] = None
+        self.root = root if root is not None else self
+
+    @property
+    def closed(self) -> bool:
+        """Дерево уже завершено и сериализуется в потоке записи — менять его нельзя."""
+        return self.root.end is not None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attrs: Any) -> None:
+        if not self.closed:
+            self.attrs.update(attrs)
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        record: Dict[str, Any] = {
+            "name": self.name,
+            "at_ms": round((self.start - origin) * 1000, 3),
+            "ms": round(self.duration * 1000, 3),
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        if self.error:
+            record["error"] = self.error
+        if self.children:
+            record["children"] = [child.to_dict(origin) for child in self.children]
+        return record
+
+    def render(self, origin: float, depth: int = 0) -> List[str]:
+        """Дерево участков в читаемом виде для журнала медленных обновлений."""
+        attrs = " ".join(f"{key}={value}" for key, value in self.attrs.items())
+        line = f"{'  ' * depth}{self.name} {self.duration * 1000:.1f} мс (+{(self.start - origin) * 1000:.1f} мс)"
+        if attrs:
+            line += f" {attrs}"
+        if self.error:
+            line += f" ошибка={self.error}"
+        lines = [line]
+        for child in self.children:
+            lines.extend(child.render(origin, depth + 1))
+        return lines
+
+
+class _NoopSpan:
+    """Заглушка вне трассируемого обновления или при выключенной трассировке."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def set(self, **attrs: Any) -> None:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _SpanScope:
+    """Открывает участок внутри текущего и делает его текущим до выхода из блока."""
+
+    __slots__ = ("span", "parent", "tracer", "token")
+
+    def __init__(self, span: Span, parent: Optional[Span], tracer: "Tracer"):
+        self.span = span
+        self.parent = parent
+        self.tracer = tracer
+        self.token = None
+
+    def __enter__(self) -> Span:
+        if self.parent is not None:
+            self.parent.children.append(self.span)
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        span = self.span
+        _current_span.reset(self.token)
+        if span.closed:
+            # Участок фоновой задачи, пережившей обновление: дерево уже ушло на запись
+            return
+        span.end = time.perf_counter()
+        if exc_type is not None:
+            span.error = exc_type.__name__
+        if self.parent is None:
+            self.tracer.finish(span)
+
+
+def _trace_json(wall_start: float, root: Span) -> str:
+    return json.dumps({"ts": round(wall_start, 3), **root.to_dict(root.start)}, ensure_ascii=False, default=str)
+
+
+def _render_tree(root: Span) -> str:
+    return "\n".join(root.render(root.start))
+
+
+class Tracer:
+    """
+    Трассировка обновлений. Корневой участок открывает TracingMiddleware, вложенные —
+    хранилища, запросы к Bot API и нейросети через tracer.span(). Текущий участок
+    хранится в contextvar, поэтому в задачах, не относящихся к обновлению, span() — пустышка.
+    Задачи, запущенные из обновления, наследуют contextvar; после завершения корня
+    их span() тоже пустышка, а set() не меняет дерево, которое уже сериализуется.
+
+    Каждое завершённое дерево пишется одной JSON-строкой в ротируемый TRACE_FILE,
+    обновления дольше slow_threshold — ещё и деревом в SLOW_UPDATES_FILE.
+    При выключенной трассировке span() сводится к чтению contextvar.
+    """
+
+    def __init__(self, enabled: bool = TRACING_ENABLED, slow_threshold: float = TRACE_SLOW_THRESHOLD):
+        self.enabled = enabled
+        self.slow_threshold = slow_threshold
+        self.traced = 0
+        self.slow = 0
+
+    def setup(self, trace_file: str = TRACE_FILE, slow_file: str = SLOW_UPDATES_FILE,
+              max_bytes: int = TRACE_FILE_MAX_BYTES, backups: int = TRACE_FILE_BACKUPS) -> None:
+        """
+        Подключает ротируемые файлы трассировки (вызывается при запуске бота).
+        Запись и сериализация деревьев идут в фоновом потоке логирования.
+        """
+        if not self.enabled:
+            return
+        for target, path in ((trace_logger, trace_file), (slow_logger, slow_file)):
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            target.setLevel(logging.INFO)
+            attach_queued(target, handler)
+        logger.info("Трассировка включена, медленные обновления (от %s с) пишутся в %s", self.slow_threshold, slow_file)
+
+    def trace(self, name: str, **attrs: Any):
+        """Корневой участок обновления."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return _SpanScope(Span(name, attrs), None, self)
+
+    def span(self, name: str, **attrs: Any):
+        """Вложенный участок текущего обновления."""
+        parent = _current_span.get()
+        if parent is None or parent.closed:
+            return NOOP_SPAN
+        return _SpanScope(Span(name, attrs, parent.root), parent, self)
+
+    def finish(self, root: Span) -> None:
+        self.traced += 1
+        wall_start = time.time() - root.duration
+        # Дерево после завершения корня не меняется, поэтому сериализуется уже в потоке записи
+        trace_logger.info("%s", Deferred(_trace_json, wall_start, root))
+        if root.duration >= self.slow_threshold:
+            self.slow += 1
+            logger.warning("Медленное обновление %s: %.0f мс", root.attrs.get('update_id'), root.duration * 1000)
+            started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(wall_start))
+            slow_logger.info("%s медленное обновление\n%s\n", started, Deferred(_render_tree, root))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "traced": self.traced, "slow": self.slow}
+
+
+tracer = Tracer()
@@ -0,0 +1,127 @@
+# utils/webhook_server.py
+import asyncio
+import hmac
+import logging
+import signal
+from typing import Optional, Set
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from config.config import WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT, WEBHOOK_DRAIN_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def check_webhook_config(base_url: str = WEBHOOK_BASE_URL, secret: Optional[str] = WEBHOOK_SECRET) -> None:
+    """Без секрета вебхук принял бы поддельные обновления от кого угодно, без адреса — не зарегистрировался бы."""
+    if not secret:
+        raise ValueError("не задан WEBHOOK_SECRET")
+    if not base_url:
+        raise ValueError("не задан WEBHOOK_BASE_URL")
+
+
+class WebhookServer:
+    """
+    Приём обновлений через вебхук на встроенном aiohttp-сервере.
+
+    Запрос проверяется по секретному токену и сразу получает 200, а обновление
+    обрабатывается в фоновой задаче. При остановке сервер перестаёт принимать
+    запросы и ждёт (не дольше drain_timeout), пока доработают уже принятые обновления.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, base_url: str = WEBHOOK_BASE_URL, path: str = WEBHOOK_PATH,
+                 secret: Optional[str] = WEBHOOK_SECRET, host: str = WEBAPP_HOST, port: int = WEBAPP_PORT,
+                 drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        check_webhook_config(base_url, secret)
+        self.dp = dp
+        self.bot = bot
+        self.base_url = base_url.rstrip("/")
+        self.path = path
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.drain_timeout = drain_timeout
+        self._in_flight: Set[asyncio.Task] = set()
+        self._runner: Optional[web.AppRunner] = None
+        self._accepting = False
+
+    def _check_secret(self, request: web.Request) -> bool:
+        return hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self._check_secret(request):
+            logger.warning("Запрос на вебхук с неверным секретом от %s", request.remote)
+            return web.Response(status=401)
+        if not self._accepting:
+            # Telegram повторит доставку обновления после перезапуска
+            return web.Response(status=503)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.error("Не удалось разобрать обновление из вебхука: %s", e)
+            return web.Response(status=400)
+
+        task = asyncio.create_task(self._process(update))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+        return web.Response(status=200)
+
+    async def _process(self, update: Update) -> None:
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.exception("Ошибка при обработке обновления %s: %s", update.update_id, e)
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def start(self, set_webhook: bool = True) -> None:
+        """Поднимает сервер и регистрирует вебхук в Telegram."""
+        await self.dp.emit_startup(bot=self.bot, dispatcher=self.dp)
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._accepting = True
+        if set_webhook:
+            await self.bot.set_webhook(
+                url=f"{self.base_url}{self.path}",
+                secret_token=self.secret,
+                allowed_updates=self.dp.resolve_used_update_types(),
+            )
+        logger.info("Вебхук слушает %s:%s%s", self.host, self.port, self.path)
+
+    async def stop(self) -> None:
+        """Перестаёт принимать обновления, дожидается обработки принятых и останавливает сервер."""
+        self._accepting = False
+        if self._in_flight:
+            logger.info("Ожидаем обработки %s обновлений перед остановкой", len(self._in_flight))
+            _, pending = await asyncio.wait(set(self._in_flight), timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning("Не дождались %s обновлений за %s с", len(pending), self.drain_timeout)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        await self.dp.emit_shutdown(bot=self.bot, dispatcher=self.dp)
+        logger.info("Вебхук остановлен")
+
+    async def serve(self) -> None:
+        """Работает до SIGINT/SIGTERM, затем корректно останавливается."""
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: остановка по KeyboardInterrupt через отмену задачи
+        await self.start()
+        try:
+            await stop_event.wait()
+        finally:
+            await self.stop()